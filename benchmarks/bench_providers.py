@@ -0,0 +1,286 @@
+"""
+End-to-end benchmarks against local mock provider servers (benchmarks/mock_servers.py).
+
+Measures, per provider:
+  overhead  per-call wrapper cost over calling the SDK / HTTP API directly
+  ttft      time to first streamed token through Wrapper.stream vs the raw stream
+  batch     generate_batch / agenerate_batch throughput at several concurrency levels
+  memory    traced Python memory per in-flight async request
+
+Results go to a JSON file. Pass an older file as --baseline to flag regressions.
+
+    python benchmarks/bench_providers.py --providers openai,anthropic,ollama --out bench.json
+    python benchmarks/bench_providers.py --baseline bench-0.1.16.json --tolerance 0.2
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mock_servers import MockServer
+
+MODELS = {"openai": "gpt-4o-mini", "anthropic": "claude-sonnet-4-5", "ollama": "llama3"}
+PROMPT = "Summarize the plot of Hamlet in one sentence."
+
+
+def _point_env_at(url: str):
+    os.environ.update({
+        "OPENAI_API_KEY": "mock", "OPENAI_BASE_URL": f"{url}/v1",
+        "ANTHROPIC_API_KEY": "mock", "ANTHROPIC_BASE_URL": url,
+        "OLLAMA_BASE_URL": url,
+    })
+
+
+def _summary(samples: list) -> dict:
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[int(0.95 * (len(ordered) - 1))] * 1000,
+        "mean_ms": statistics.fmean(ordered) * 1000,
+    }
+
+
+class RawClient:
+    """The same calls without the wrapper, the baseline for overhead and TTFT"""
+
+    def __init__(self, provider: str, url: str):
+        self.provider = provider
+        self.url = url
+        if provider == "openai":
+            from openai import OpenAI
+            self.client = OpenAI(api_key="mock", base_url=f"{url}/v1")
+        elif provider == "anthropic":
+            from anthropic import Anthropic
+            self.client = Anthropic(api_key="mock", base_url=url)
+        else:
+            import requests
+            self.client = requests.Session()
+
+    def generate(self, model: str):
+        if self.provider == "openai":
+            response = self.client.chat.completions.create(model=model, messages=[{"role": "user", "content": PROMPT}])
+            return response.choices[0].message.content
+        if self.provider == "anthropic":
+            response = self.client.messages.create(model=model, max_tokens=256, messages=[{"role": "user", "content": PROMPT}])
+            return response.content[0].text
+        return "".join(self.stream(model))
+
+    def stream(self, model: str):
+        if self.provider == "openai":
+            for chunk in self.client.chat.completions.create(model=model, messages=[{"role": "user", "content": PROMPT}], stream=True):
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        elif self.provider == "anthropic":
+            with self.client.messages.stream(model=model, max_tokens=256, messages=[{"role": "user", "content": PROMPT}]) as events:
+                for text in events.text_stream:
+                    yield text
+        else:
+            payload = {"model": model, "messages": [{"role": "user", "content": PROMPT}], "stream": True}
+            with self.client.post(f"{self.url}/api/chat", json=payload, stream=True) as response:
+                for line in response.iter_lines():
+                    if line:
+                        piece = json.loads(line).get("message", {}).get("content")
+                        if piece:
+                            yield piece
+
+
+def _time_calls(fn, calls: int, warmup: int = 5) -> list:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _time_first_chunk(open_stream, calls: int, warmup: int = 3) -> list:
+    samples = []
+    for i in range(warmup + calls):
+        start = time.perf_counter()
+        chunks = iter(open_stream())
+        for chunk in chunks:
+            if str(chunk):
+                break
+        elapsed = time.perf_counter() - start
+        for _ in chunks:
+            pass
+        if i >= warmup:
+            samples.append(elapsed)
+    return samples
+
+
+def bench_overhead(client, raw: RawClient, model: str, server: MockServer, calls: int) -> dict:
+    server.configure(delay=0.0, chunk_delay=0.0)
+    wrapped = _time_calls(lambda: client.generate(model=model, prompt=PROMPT), calls)
+    direct = _time_calls(lambda: raw.generate(model), calls)
+    wrapped, direct = _summary(wrapped), _summary(direct)
+    return {"wrapper": wrapped, "raw": direct, "overhead_us": (wrapped["p50_ms"] - direct["p50_ms"]) * 1000}
+
+
+def bench_ttft(client, raw: RawClient, model: str, server: MockServer, calls: int) -> dict:
+    # a gap between tokens so "first token" is clearly separated from "whole response"
+    server.configure(delay=0.0, chunk_delay=0.002)
+    wrapped = _summary(_time_first_chunk(lambda: client.stream(model=model, prompt=PROMPT), calls))
+    direct = _summary(_time_first_chunk(lambda: raw.stream(model), calls))
+    return {"wrapper": wrapped, "raw": direct, "overhead_us": (wrapped["p50_ms"] - direct["p50_ms"]) * 1000}
+
+
+def bench_batch(client, model: str, server: MockServer, levels: list, latency: float) -> dict:
+    server.configure(delay=latency, chunk_delay=0.0)
+    results = {}
+    for level in levels:
+        requests = [{"prompt": f"{PROMPT} #{i}"} for i in range(max(16, level * 4))]
+        sync_report = client.generate_batch(requests, max_concurrency=level, model=model)
+        async_report = asyncio.run(client.agenerate_batch(requests, max_concurrency=level, model=model))
+        ideal = level / latency
+        results[str(level)] = {
+            "requests": len(requests),
+            "threads_rps": sync_report.throughput,
+            "async_rps": async_report.throughput,
+            "threads_efficiency": sync_report.throughput / ideal,
+            "async_efficiency": async_report.throughput / ideal,
+            "failed": sync_report.failed + async_report.failed,
+        }
+    return results
+
+
+def bench_memory(client, model: str, server: MockServer, in_flight: int) -> dict:
+    server.configure(delay=1.0, chunk_delay=0.0)
+
+    async def measure():
+        # one call first so per-loop SDK clients and pools exist before the baseline
+        await client.agenerate(model=model, prompt=PROMPT)
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        arrived = server.requests + in_flight
+        tasks = [asyncio.ensure_future(client.agenerate(model=model, prompt=f"{PROMPT} #{i}")) for i in range(in_flight)]
+        # measure while every request is parked in the mock's delay
+        deadline = time.monotonic() + 5
+        while server.requests < arrived and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        current = tracemalloc.get_traced_memory()[0]
+        observed = server.in_flight
+        await asyncio.gather(*tasks)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return {
+            "in_flight": observed,
+            "bytes_per_request": (current - baseline) / max(1, observed),
+            "peak_bytes": peak - baseline,
+        }
+
+    return asyncio.run(measure())
+
+
+def run_provider(name: str, server: MockServer, args) -> dict:
+    from wrapper import Wrapper
+
+    model = MODELS[name]
+    try:
+        client = Wrapper(name)
+        raw = RawClient(name, server.url)
+    except ImportError as e:
+        return {"skipped": str(e)}
+
+    result = {}
+    result["overhead"] = bench_overhead(client, raw, model, server, args.calls)
+    result["ttft"] = bench_ttft(client, raw, model, server, args.calls)
+    result["batch"] = bench_batch(client, model, server, args.concurrency, args.latency)
+    result["memory"] = bench_memory(client, model, server, args.in_flight)
+    return result
+
+
+# (path into the results, True when higher is better)
+TRACKED = (
+    (("overhead", "overhead_us"), False),
+    (("ttft", "wrapper", "p50_ms"), False),
+    (("memory", "bytes_per_request"), False),
+)
+
+
+def _dig(tree: dict, path: tuple):
+    for key in path:
+        if not isinstance(tree, dict) or key not in tree:
+            return None
+        tree = tree[key]
+    return tree
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """Human readable regressions beyond tolerance (0.2 = 20% worse)"""
+    regressions = []
+    for provider, result in current["results"].items():
+        old = baseline.get("results", {}).get(provider)
+        if not old or "skipped" in result or "skipped" in old:
+            continue
+        tracked = list(TRACKED) + [(("batch", level, "async_rps"), True) for level in result.get("batch", {})]
+        for path, higher_is_better in tracked:
+            now, before = _dig(result, path), _dig(old, path)
+            if now is None or before is None or before <= 0:
+                continue
+            change = (before - now) / before if higher_is_better else (now - before) / before
+            if change > tolerance:
+                regressions.append(f"{provider} {'.'.join(path)}: {before:.1f} -> {now:.1f} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--providers", default="openai,anthropic,ollama")
+    parser.add_argument("--calls", type=int, default=200, help="timed calls for overhead and TTFT")
+    parser.add_argument("--concurrency", default="1,4,16,64", help="batch concurrency levels")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock latency per call in the batch phase")
+    parser.add_argument("--in-flight", type=int, default=64, help="concurrent requests for the memory phase")
+    parser.add_argument("--chunks", type=int, default=16, help="tokens per mock response")
+    parser.add_argument("--lines-per-write", type=int, default=1, help="Ollama NDJSON lines per network write")
+    parser.add_argument("--out", default=None, help="JSON output, defaults to bench-<version>.json")
+    parser.add_argument("--baseline", default=None, help="earlier JSON output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    args.concurrency = [int(level) for level in args.concurrency.split(",")]
+
+    with MockServer(chunks=args.chunks, lines_per_write=args.lines_per_write) as server:
+        _point_env_at(server.url)
+        import wrapper
+
+        report = {
+            "version": wrapper.__version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+            "results": {},
+        }
+        for name in args.providers.split(","):
+            name = name.strip().lower()
+            print(f"== {name}", file=sys.stderr)
+            report["results"][name] = run_provider(name, server, args)
+
+    out = Path(args.out or f"bench-{report['version']}.json")
+    out.write_text(json.dumps(report, indent=2))
+    print(json.dumps(report["results"], indent=2))
+    print(f"wrote {out}")
+
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION: {line}")
+        if regressions:
+            sys.exit(1)
+        print("OK, no regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Micro-benchmark for message sanitization on long conversations.
+
+Compares the old per-call path (uncompiled re.sub over every message, a
+validation walk and a full copy) with wrapper.utils.sanitize_messages, both
+on a fresh list every turn and on a CleanMessages conversation that only
+scans the newly appended turn.
+
+    python benchmarks/bench_sanitize.py --tokens 100000 --turns 50
+"""
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from wrapper.utils import sanitize_messages, CleanMessages
+
+
+def legacy_prepare(messages: list) -> list:
+    """What AnthropicProvider/AzureProvider did before the shared fast path"""
+    def sanitize(text):
+        if not isinstance(text, str):
+            return str(text)
+        return re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text).strip()
+
+    for msg in messages:
+        if not isinstance(msg, dict) or "role" not in msg or "content" not in msg:
+            raise ValueError("Invalid message format")
+        if msg["role"] not in ["system", "user", "assistant"]:
+            raise ValueError("Invalid message format")
+    return [{"role": msg["role"], "content": sanitize(msg["content"])} for msg in messages]
+
+
+def build_conversation(tokens: int, turns: int, dirty: bool, non_ascii: bool = False) -> list:
+    # ~4 chars per token, spread over alternating user/assistant turns
+    per_turn = max(1, tokens * 4 // turns)
+    sentence = "lorem ipsum dolor sit amet, café naïve résumé\n" if non_ascii else "lorem ipsum dolor sit amet consectetur\n"
+    words = (sentence * (per_turn // len(sentence) + 1))[:per_turn]
+    messages = [{"role": "system", "content": "You are a helpful AI assistant."}]
+    for i in range(turns):
+        content = words + ("\x07" if dirty and i % 10 == 0 else "")
+        messages.append({"role": "user" if i % 2 == 0 else "assistant", "content": content})
+    return messages
+
+
+def time_per_turn(fn, conversation: list, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(conversation)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def time_incremental(conversation: list, repeats: int) -> float:
+    """Conversation grows by one turn per call, as in a chat loop"""
+    samples = []
+    for _ in range(repeats):
+        clean = CleanMessages(conversation[:-1])
+        sanitize_messages(clean)
+        clean.append(dict(conversation[-1]))
+        start = time.perf_counter()
+        sanitize_messages(clean)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=100_000, help="approximate conversation size")
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=30)
+    args = parser.parse_args()
+
+    results = {}
+    # non-ASCII text misses the str.translate fast path and falls back to the compiled regex
+    cases = (("clean", False, False), ("with_control_chars", True, False), ("non_ascii", False, True))
+    for label, dirty, non_ascii in cases:
+        conversation = build_conversation(args.tokens, args.turns, dirty, non_ascii)
+        assert legacy_prepare(conversation) == list(sanitize_messages(conversation))
+        legacy = time_per_turn(legacy_prepare, conversation, args.repeats)
+        fast = time_per_turn(sanitize_messages, conversation, args.repeats)
+        incremental = time_incremental(conversation, args.repeats)
+        results[label] = {
+            "legacy_ms": legacy,
+            "sanitize_messages_ms": fast,
+            "incremental_ms": incremental,
+            "speedup": legacy / fast if fast else None,
+            "incremental_speedup": legacy / incremental if incremental else None,
+        }
+
+    print(json.dumps({"tokens": args.tokens, "turns": args.turns, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Cold-start benchmark for `import wrapper`.
+
+Runs the import in fresh interpreters, reports the median and fails (exit 1)
+if it goes over the budget or if any provider SDK got imported eagerly.
+
+    python benchmarks/bench_startup.py --runs 10 --budget-ms 100
+"""
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+HEAVY_MODULES = ("openai", "anthropic", "groq", "boto3", "botocore", "requests", "httpx")
+
+PROBE = """
+import sys, time, json
+t0 = time.perf_counter()
+import wrapper
+elapsed = (time.perf_counter() - t0) * 1000
+print(json.dumps({"ms": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def measure(runs: int) -> dict:
+    timings, loaded = [], set()
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, check=True)
+        sample = json.loads(out.stdout.strip().splitlines()[-1])
+        timings.append(sample["ms"])
+        loaded.update(sample["loaded"])
+    return {
+        "runs": runs,
+        "median_ms": statistics.median(timings),
+        "min_ms": min(timings),
+        "max_ms": max(timings),
+        "heavy_modules_loaded": sorted(loaded),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    result = measure(args.runs)
+    result["budget_ms"] = args.budget_ms
+    print(json.dumps(result, indent=2))
+
+    if result["heavy_modules_loaded"]:
+        print(f"FAIL: provider SDKs imported eagerly: {', '.join(result['heavy_modules_loaded'])}")
+        sys.exit(1)
+    if result["median_ms"] > args.budget_ms:
+        print(f"FAIL: median import time {result['median_ms']:.1f}ms is over the {args.budget_ms:.0f}ms budget")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
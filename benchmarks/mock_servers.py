@@ -0,0 +1,266 @@
+"""
+Local stand-ins for the provider APIs, used by the benchmarks.
+
+One threaded HTTP server answers the OpenAI-compatible chat completions route,
+Anthropic /v1/messages and Ollama /api/generate and /api/chat, streaming and not. Latency,
+time to first token and chunking are configurable so the numbers measure the
+wrapper rather than a real backend.
+
+    with MockServer(delay=0.05, chunks=20, chunk_delay=0.002) as server:
+        os.environ["OPENAI_BASE_URL"] = server.url + "/v1"
+"""
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class MockConfig:
+    """
+    delay:          seconds before a non-streaming response, and before the first streamed chunk
+    chunks:         streamed tokens per response
+    chunk_delay:    seconds between streamed tokens
+    lines_per_write: Ollama NDJSON lines flushed per write, >1 simulates batched chunking
+    """
+
+    def __init__(self, delay: float = 0.0, chunks: int = 16, chunk_delay: float = 0.0, lines_per_write: int = 1):
+        self.delay = delay
+        self.chunks = chunks
+        self.chunk_delay = chunk_delay
+        self.lines_per_write = max(1, lines_per_write)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes, without TCP_NODELAY every call eats a ~40ms delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def config(self) -> MockConfig:
+        return self.server.config
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, obj: dict, status: int = 200):
+        body = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_chunked(self, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _end_chunked(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _tokens(self):
+        for i in range(self.config.chunks):
+            if i and self.config.chunk_delay:
+                time.sleep(self.config.chunk_delay)
+            yield f"tok{i} "
+
+    def _text(self) -> str:
+        return "".join(f"tok{i} " for i in range(self.config.chunks))
+
+    def do_GET(self):
+        if self.path.startswith("/api/tags"):
+            return self._send_json({"models": [{"name": "mock", "model": "mock", "size": 0}]})
+        if self.path.startswith("/api/ps"):
+            return self._send_json({"models": []})
+        if self.path.endswith("/models"):
+            return self._send_json({"object": "list", "data": [{"id": "mock", "object": "model", "created": 0, "owned_by": "mock"}]})
+        self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        body = self._read_json()
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.requests += 1
+        try:
+            if self.config.delay:
+                time.sleep(self.config.delay)
+            if self.path.endswith("/chat/completions"):
+                return self._openai(body)
+            if self.path.endswith("/messages"):
+                return self._anthropic(body)
+            if self.path == "/api/generate":
+                return self._ollama(body, chat=False)
+            if self.path == "/api/chat":
+                return self._ollama(body, chat=True)
+            self._send_json({"error": "not found"}, 404)
+        finally:
+            with self.server.lock:
+                self.server.in_flight -= 1
+
+    def _openai(self, body: dict):
+        model = body.get("model", "mock")
+        usage = {"prompt_tokens": 8, "completion_tokens": self.config.chunks, "total_tokens": 8 + self.config.chunks}
+        if not body.get("stream"):
+            return self._send_json({
+                "id": "chatcmpl-mock", "object": "chat.completion", "created": 0, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": self._text()}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        def event(payload: dict) -> bytes:
+            return f"data: {json.dumps(payload)}\n\n".encode()
+
+        base = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": 0, "model": model}
+        self._start_chunked("text/event-stream")
+        for token in self._tokens():
+            self._write_chunk(event({**base, "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}))
+        self._write_chunk(event({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self._write_chunk(event({**base, "choices": [], "usage": usage}))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._end_chunked()
+
+    def _anthropic(self, body: dict):
+        model = body.get("model", "mock")
+        message = {
+            "id": "msg_mock", "type": "message", "role": "assistant", "model": model,
+            "content": [], "stop_reason": None, "stop_sequence": None,
+            "usage": {"input_tokens": 8, "output_tokens": 0},
+        }
+        if not body.get("stream"):
+            message.update({
+                "content": [{"type": "text", "text": self._text()}],
+                "stop_reason": "end_turn",
+                "usage": {"input_tokens": 8, "output_tokens": self.config.chunks},
+            })
+            return self._send_json(message)
+
+        def event(name: str, payload: dict) -> bytes:
+            return f"event: {name}\ndata: {json.dumps(payload)}\n\n".encode()
+
+        self._start_chunked("text/event-stream")
+        self._write_chunk(event("message_start", {"type": "message_start", "message": message}))
+        self._write_chunk(event("content_block_start", {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}))
+        for token in self._tokens():
+            self._write_chunk(event("content_block_delta", {
+                "type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": token}
+            }))
+        self._write_chunk(event("content_block_stop", {"type": "content_block_stop", "index": 0}))
+        self._write_chunk(event("message_delta", {
+            "type": "message_delta",
+            "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+            "usage": {"output_tokens": self.config.chunks},
+        }))
+        self._write_chunk(event("message_stop", {"type": "message_stop"}))
+        self._end_chunked()
+
+    def _ollama(self, body: dict, chat: bool):
+        model = body.get("model", "mock")
+
+        def piece(text: str) -> dict:
+            return {"message": {"role": "assistant", "content": text}} if chat else {"response": text}
+
+        done = {
+            "model": model, **piece(""), "done": True, "done_reason": "stop",
+            "prompt_eval_count": 8, "eval_count": self.config.chunks,
+        }
+        if not body.get("stream", True):
+            return self._send_json({**done, **piece(self._text())})
+
+        self._start_chunked("application/x-ndjson")
+        pending = []
+        for token in self._tokens():
+            pending.append(json.dumps({"model": model, **piece(token), "done": False}) + "\n")
+            if len(pending) >= self.config.lines_per_write:
+                self._write_chunk("".join(pending).encode())
+                pending = []
+        pending.append(json.dumps(done) + "\n")
+        self._write_chunk("".join(pending).encode())
+        self._end_chunked()
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class MockServer:
+    """Threaded mock provider API on a free localhost port, use as a context manager"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, **config):
+        self.httpd = _Server((host, port), _Handler)
+        self.httpd.config = MockConfig(**config)
+        self.httpd.lock = threading.Lock()
+        self.httpd.in_flight = 0
+        self.httpd.requests = 0
+        self._thread = None
+
+    @property
+    def config(self) -> MockConfig:
+        return self.httpd.config
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def in_flight(self) -> int:
+        return self.httpd.in_flight
+
+    @property
+    def requests(self) -> int:
+        return self.httpd.requests
+
+    def configure(self, **config):
+        """Change latency/chunking between benchmark phases"""
+        for name, value in config.items():
+            if not hasattr(self.httpd.config, name):
+                raise ValueError(f"Unknown mock setting '{name}'")
+            setattr(self.httpd.config, name, value)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-provider", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the mock provider server in the foreground")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--delay", type=float, default=0.0)
+    parser.add_argument("--chunks", type=int, default=16)
+    parser.add_argument("--chunk-delay", type=float, default=0.0)
+    parser.add_argument("--lines-per-write", type=int, default=1)
+    args = parser.parse_args()
+
+    server = MockServer(port=args.port, delay=args.delay, chunks=args.chunks,
+                        chunk_delay=args.chunk_delay, lines_per_write=args.lines_per_write)
+    print(f"mock providers listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
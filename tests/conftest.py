@@ -0,0 +1,67 @@
+import time
+import pytest
+from wrapper.base import BaseLLM
+from wrapper.types import StreamChunk, GenerationResult
+
+
+class FakeProvider(BaseLLM):
+    """
+    In-memory backend for tests. Answers with `text`, or raises `error` on every call.
+    stream() yields `chunks` and raises `stream_error` after `fail_after` of them.
+    """
+
+    def __init__(self, text="ok", error=None, chunks=("a", "b"), stream_error=None, fail_after=0, delay=0.0, retryable=None):
+        self.text = text
+        self.error = error
+        self.chunks = chunks
+        self.stream_error = stream_error
+        self.fail_after = fail_after
+        self.delay = delay
+        self.retryable = retryable
+        self.calls = []
+
+    def generate(self, model=None, **kwargs):
+        return self.complete(model=model, **kwargs).text
+
+    async def agenerate(self, model=None, **kwargs):
+        return self.complete(model=model, **kwargs).text
+
+    def complete(self, model=None, **kwargs):
+        self.calls.append({"model": model, **kwargs})
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return GenerationResult(self.text, model=model, prompt_tokens=3, completion_tokens=2)
+
+    async def acomplete(self, model=None, **kwargs):
+        return self.complete(model=model, **kwargs)
+
+    def stream(self, model=None, **kwargs):
+        self.calls.append({"model": model, **kwargs})
+        if self.delay:
+            time.sleep(self.delay)
+        for i, text in enumerate(self.chunks):
+            if self.stream_error is not None and i == self.fail_after:
+                raise self.stream_error
+            yield StreamChunk(text)
+        if self.stream_error is not None and self.fail_after >= len(self.chunks):
+            raise self.stream_error
+
+    def classify_error(self, exc):
+        if self.retryable is not None:
+            return self.retryable, None
+        return super().classify_error(exc)
+
+
+@pytest.fixture
+def fake_providers(monkeypatch):
+    """Route get_provider in wrapper.router/wrapper.core to the FakeProviders put in the returned dict"""
+    providers = {}
+
+    def get_provider(name, **kwargs):
+        return providers[name.lower()]
+
+    monkeypatch.setattr("wrapper.router.get_provider", get_provider)
+    monkeypatch.setattr("wrapper.core.get_provider", get_provider)
+    return providers
@@ -0,0 +1,62 @@
+import pytest
+from wrapper.cache import make_cache_key, MemoryCache, SQLiteCache, EmbeddingCache
+
+
+def test_cache_key_ignores_dict_order():
+    a = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0}
+    b = {"temperature": 0, "messages": [{"content": "hi", "role": "user"}], "model": "m"}
+    assert make_cache_key("openai", a) == make_cache_key("openai", b)
+
+
+def test_cache_key_is_stable_across_runs():
+    # keys end up in on-disk caches, so they must not depend on hash seeds or object ids
+    key = make_cache_key("openai", {"model": "m", "temperature": 0})
+    assert key == "openai:5ea0bd3062f3367622f9db5beb24c92616972474713a12dc2db70d63c9e08824"
+
+
+@pytest.mark.parametrize("change", [
+    {"model": "other"},
+    {"temperature": 0.5},
+    {"messages": [{"role": "user", "content": "bye"}]},
+    {"max_tokens": 10},
+])
+def test_cache_key_changes_with_params(change):
+    base = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0}
+    assert make_cache_key("openai", base) != make_cache_key("openai", {**base, **change})
+
+
+def test_cache_key_includes_provider():
+    params = {"model": "m"}
+    assert make_cache_key("openai", params) != make_cache_key("azure", params)
+
+
+def test_memory_cache_lru_and_stats():
+    cache = MemoryCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats() == {"hits": 2, "misses": 1, "hit_rate": pytest.approx(2 / 3), "size": 2}
+
+
+def test_sqlite_cache_roundtrip(tmp_path):
+    cache = SQLiteCache(path=str(tmp_path / "cache.db"), max_size=1)
+    cache.set("a", {"text": "x"})
+    assert cache.get("a") == {"text": "x"}
+    cache.set("b", "y")
+    assert len(cache) == 1
+    cache.close()
+
+
+def test_embedding_cache(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "embeddings.db"))
+    key = cache.key("model", "text")
+    assert key == EmbeddingCache.key("model", "text")
+    assert key != cache.key("other-model", "text")
+    cache.set_many([(key, b"\x00" * 8)])
+    found = cache.get_many([key, cache.key("model", "missing")])
+    assert found == {key: b"\x00" * 8}
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "size": 1}
+    cache.close()
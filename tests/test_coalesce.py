@@ -0,0 +1,145 @@
+import gc
+import time
+import asyncio
+import threading
+import pytest
+from wrapper.coalesce import SingleFlight
+from wrapper.types import GenerationResult, StreamChunk
+
+
+def test_call_joins_identical_call_in_flight():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def leader_fn():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return GenerationResult("shared")
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.call("k", leader_fn)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(flight.call("k", leader_fn)))
+    follower.start()
+    # the follower is parked on the leader's flight before it finishes
+    deadline = time.monotonic() + 5
+    while flight.joined == 0 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert len(calls) == 1
+    assert [r.text for r in results] == ["shared", "shared"]
+    assert results[0] is not results[1]
+    assert flight.stats() == {"calls": 1, "joined": 1, "in_flight": 0}
+
+
+def test_call_shares_errors():
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.call("k", lambda: (_ for _ in ()).throw(ValueError("bad")))
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_deterministic_only_key():
+    flight = SingleFlight(deterministic_only=True)
+    assert flight.key("openai", {"temperature": 0.7}) is None
+    assert flight.key("openai", {"temperature": 0}) is not None
+
+
+def test_acall_joins_on_same_loop():
+    flight = SingleFlight()
+    calls = []
+
+    async def afn():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return GenerationResult("shared")
+
+    async def main():
+        return await asyncio.gather(flight.acall("k", afn), flight.acall("k", afn))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert [r.text for r in results] == ["shared", "shared"]
+
+
+def chunks(opened, closed, texts=("a", "b", "c")):
+    def open_stream():
+        opened.append(1)
+        try:
+            for text in texts:
+                yield StreamChunk(text)
+        finally:
+            closed.append(1)
+    return open_stream
+
+
+def test_stream_follower_replays_from_start():
+    flight = SingleFlight()
+    opened, closed = [], []
+    leader = flight.stream("k", chunks(opened, closed))
+    assert next(leader).text == "a"
+    follower = flight.stream("k", chunks(opened, closed))
+    assert [c.text for c in follower] == ["a", "b", "c"]
+    assert [c.text for c in leader] == ["b", "c"]
+    assert len(opened) == 1
+    assert flight.stats() == {"calls": 1, "joined": 1, "in_flight": 0}
+
+
+def test_unused_stream_generator_holds_no_subscriber():
+    flight = SingleFlight()
+    opened, closed = [], []
+    unused = flight.stream("k", chunks(opened, closed))
+    del unused
+    gc.collect()
+    assert flight.stats()["in_flight"] == 0
+
+    reader = flight.stream("k", chunks(opened, closed))
+    assert [c.text for c in reader] == ["a", "b", "c"]
+    assert flight.stats() == {"calls": 1, "joined": 0, "in_flight": 0}
+
+
+def test_abandoned_stream_closes_source():
+    flight = SingleFlight()
+    opened, closed = [], []
+    first = flight.stream("k", chunks(opened, closed))
+    second = flight.stream("k", chunks(opened, closed))
+    next(first)
+    next(second)
+    first.close()
+    assert closed == []
+    second.close()
+    assert closed == [1]
+    assert flight.stats()["in_flight"] == 0
+
+    # the next identical stream starts over instead of joining the dead one
+    assert [c.text for c in flight.stream("k", chunks(opened, closed))] == ["a", "b", "c"]
+    assert len(opened) == 2
+
+
+def test_astream_shares_one_source():
+    flight = SingleFlight()
+    opened = []
+
+    def open_stream():
+        async def gen():
+            opened.append(1)
+            for text in ("a", "b"):
+                await asyncio.sleep(0)
+                yield StreamChunk(text)
+        return gen()
+
+    async def read():
+        return [c.text async for c in flight.astream("k", open_stream)]
+
+    async def main():
+        return await asyncio.gather(read(), read())
+
+    assert asyncio.run(main()) == [["a", "b"], ["a", "b"]]
+    assert len(opened) == 1
+    assert flight.stats()["in_flight"] == 0
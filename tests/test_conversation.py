@@ -0,0 +1,113 @@
+import asyncio
+import pytest
+from wrapper.core import Wrapper
+from wrapper.conversation import Conversation
+from wrapper.utils import CleanMessages, sanitize_messages, split_system
+from tests.conftest import FakeProvider
+
+
+def turns(messages) -> list:
+    return [m["content"] for m in split_system(messages)[1]]
+
+
+def test_clean_messages_only_scan_new_turns():
+    history = sanitize_messages([{"role": "system", "content": "s"}, {"role": "user", "content": "q1"}])
+    assert isinstance(history, CleanMessages)
+    assert split_system(history) == ("s", [{"role": "user", "content": "q1"}])
+    history.append({"role": "assistant", "content": "a1\x00"})
+    history = sanitize_messages(history)
+    assert turns(history) == ["q1", "a1"]
+
+
+def test_clean_messages_pop_then_append():
+    history = sanitize_messages([{"role": "system", "content": "s"}, {"role": "user", "content": "q1"}])
+    split_system(history)
+    history.pop()
+    history.append({"role": "user", "content": "q2\x00"})
+    history = sanitize_messages(history)
+    assert turns(history) == ["q2"]
+
+
+@pytest.mark.parametrize("edit", [
+    lambda h: h.__setitem__(1, {"role": "user", "content": "q2"}),
+    lambda h: h.insert(1, {"role": "user", "content": "q0"}),
+    lambda h: h.remove(h[1]),
+    lambda h: h.__delitem__(slice(1, 2)),
+    lambda h: h.__setitem__(slice(1, None), [{"role": "user", "content": "q2"}]),
+])
+def test_clean_messages_edits_reset_the_cache(edit):
+    history = sanitize_messages([{"role": "system", "content": "s"}, {"role": "user", "content": "q1"}])
+    split_system(history)
+    edit(history)
+    history = sanitize_messages(history)
+    assert turns(history) == [m["content"] for m in history if m["role"] != "system"]
+
+
+def test_trim_keeps_system_and_newest_turn():
+    chat = Conversation(system="sys", max_context_tokens=40, trim_to=0.5)
+    for i in range(6):
+        chat.user(f"question {i} " + "x" * 30)
+        chat.assistant(f"answer {i} " + "y" * 30)
+    assert chat[0] == {"role": "system", "content": "sys"}
+    assert chat[-1]["content"].startswith("answer 5")
+    assert chat.token_count <= 40
+    # the history after the system prompt only opens with an assistant turn when that's all that's left
+    rest = list(chat)[1:]
+    assert rest[0]["role"] == "user" or len(rest) == 1
+
+
+def test_token_count_matches_messages():
+    chat = Conversation(system="sys", max_context_tokens=100)
+    for i in range(20):
+        chat.user("q" * 40)
+        chat.assistant("a" * 40)
+    assert chat.token_count == sum(chat._tokens)
+    assert len(chat._tokens) == len(chat)
+
+
+def test_pop_and_rollback():
+    chat = Conversation(system="sys", max_context_tokens=40)
+    chat.user("a" * 40)
+    chat.assistant("b" * 40)
+    split_system(chat.messages)
+    saved = (list(chat), chat.token_count)
+
+    state = chat.checkpoint()
+    chat.user("q" * 60)  # over budget, trims older turns
+    assert list(chat) != saved[0]
+    chat.rollback(state)
+    assert (list(chat), chat.token_count) == saved
+    assert turns(chat.messages) == ["a" * 40, "b" * 40]
+
+    chat.user("next")
+    assert chat.pop() == {"role": "user", "content": "next"}
+    assert (list(chat), chat.token_count) == saved
+
+
+def test_invalid_role_is_rejected():
+    with pytest.raises(ValueError):
+        Conversation().add("tool", "x")
+
+
+def test_chat_adds_both_turns(fake_providers):
+    fake_providers["fake"] = FakeProvider(text="hello")
+    client = Wrapper("fake")
+    chat = Conversation(system="sys")
+    assert client.chat(chat, "hi") == "hello"
+    assert [m["role"] for m in chat] == ["system", "user", "assistant"]
+
+
+def test_failed_chat_leaves_conversation_untouched(fake_providers):
+    fake_providers["fake"] = FakeProvider(error=ConnectionError("down"))
+    client = Wrapper("fake")
+    chat = Conversation(system="sys", max_context_tokens=40)
+    chat.user("a" * 40)
+    chat.assistant("b" * 40)
+    saved = (list(chat), chat.token_count)
+
+    with pytest.raises(ConnectionError):
+        client.chat(chat, "q" * 60)
+    assert (list(chat), chat.token_count) == saved
+    with pytest.raises(ConnectionError):
+        asyncio.run(client.achat(chat, "q" * 60))
+    assert (list(chat), chat.token_count) == saved
@@ -0,0 +1,73 @@
+import pytest
+from wrapper.ratelimit import TokenBucket, RateLimiter, SQLiteRateLimiter, estimate_tokens, DEFAULT_COMPLETION_TOKENS
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("wrapper.ratelimit.time.monotonic", lambda: now[0])
+    return now
+
+
+def test_bucket_serves_capacity_then_queues(clock):
+    bucket = TokenBucket(rate=1.0, capacity=2)
+    assert bucket.reserve(1) == 0.0
+    assert bucket.reserve(1) == 0.0
+    # reservations go negative, so queued callers wait in arrival order
+    assert bucket.reserve(1) == pytest.approx(1.0)
+    assert bucket.reserve(1) == pytest.approx(2.0)
+
+
+def test_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(rate=2.0, capacity=4)
+    bucket.reserve(4)
+    clock[0] += 1.0
+    assert bucket.reserve(2) == 0.0
+    clock[0] += 100.0
+    assert bucket.reserve(4) == 0.0
+    assert bucket.reserve(1) == pytest.approx(0.5)
+
+
+def test_limiter_keeps_models_apart(clock):
+    limiter = RateLimiter(rpm=60)
+    assert limiter.reserve("openai", "a") == 0.0
+    assert limiter.reserve("openai", "b") == 0.0
+    assert sorted(limiter._buckets) == ["openai:a:rpm", "openai:b:rpm"]
+
+
+def test_limiter_model_overrides(clock):
+    limiter = RateLimiter(rpm=1, limits={"fast": {"rpm": 600}})
+    assert limiter.reserve("openai", "fast") == 0.0
+    assert limiter.reserve("openai", "fast") == 0.0
+    assert limiter.reserve("openai", "slow") == 0.0
+    assert limiter.reserve("openai", "slow") == pytest.approx(60.0)
+
+
+def test_shared_bucket_uses_lowest_limits(clock):
+    limiter = RateLimiter(rpm=100, limits={"a": {"rpm": 500, "tpm": 30000}, "b": {"rpm": 60}}, per_model=False)
+    assert limiter._limits_for("a") == (60, 30000)
+    assert limiter._limits_for("unknown") == (60, 30000)
+    limiter.reserve("openai", "a")
+    limiter.reserve("openai", "b")
+    assert sorted(limiter._buckets) == ["openai:rpm"]
+
+
+def test_tpm_limit_and_stats(clock):
+    limiter = RateLimiter(tpm=600)
+    assert limiter.reserve("openai", "m", tokens=600) == 0.0
+    assert limiter.reserve("openai", "m", tokens=60) == pytest.approx(6.0)
+    assert limiter.stats() == {"throttled": 1, "waited_seconds": pytest.approx(6.0)}
+
+
+def test_estimate_tokens():
+    params = {"messages": [{"role": "user", "content": "x" * 40}], "max_tokens": 10}
+    assert estimate_tokens(params) == 20
+    assert estimate_tokens({"prompt": "abcd"}) == 1 + DEFAULT_COMPLETION_TOKENS
+
+
+def test_sqlite_limiter_shares_state_between_instances(tmp_path):
+    path = tmp_path / "limits.db"
+    first = SQLiteRateLimiter(path=str(path), rpm=1)
+    second = SQLiteRateLimiter(path=str(path), rpm=1)
+    assert first.reserve("openai", "m") == 0.0
+    assert second.reserve("openai", "m") > 0.0
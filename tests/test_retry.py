@@ -0,0 +1,133 @@
+import asyncio
+import pytest
+from wrapper.retry import RetryPolicy, classify_error, parse_retry_after
+from wrapper.types import StreamChunk
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"status_code": status_code, "headers": headers or {}})()
+
+
+def policy(**kwargs):
+    return RetryPolicy(base_delay=0, max_delay=0, **kwargs)
+
+
+def test_classify_status_codes():
+    assert classify_error(StatusError(429)) == (True, None)
+    assert classify_error(StatusError(503)) == (True, None)
+    assert classify_error(StatusError(400)) == (False, None)
+    assert classify_error(StatusError(429, {"retry-after": "7"})) == (True, 7.0)
+
+
+def test_classify_follows_cause_not_context():
+    try:
+        try:
+            raise StatusError(429)
+        except StatusError as e:
+            raise RuntimeError("wrapped") from e
+    except RuntimeError as wrapped:
+        assert classify_error(wrapped)[0] is True
+
+    # a bug hit while handling a 429 is not a 429
+    try:
+        try:
+            raise StatusError(429)
+        except StatusError:
+            raise KeyError("bug")
+    except KeyError as bug:
+        assert classify_error(bug)[0] is False
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("2.5") == 2.5
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("not a date") is None
+
+
+def test_call_retries_until_success():
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise StatusError(503)
+        return "done"
+
+    retry = policy(max_retries=3)
+    assert retry.call(fn) == "done"
+    assert len(attempts) == 3
+    assert retry.stats() == {"calls": 1, "retries": 2, "gave_up": 0}
+
+
+def test_call_raises_non_retryable_at_once():
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        raise StatusError(400)
+
+    with pytest.raises(StatusError):
+        policy().call(fn)
+    assert len(attempts) == 1
+
+
+def test_call_gives_up():
+    retry = policy(max_retries=2)
+    with pytest.raises(StatusError):
+        retry.call(lambda: (_ for _ in ()).throw(StatusError(429)))
+    assert retry.stats() == {"calls": 1, "retries": 2, "gave_up": 1}
+
+
+def test_stream_retries_before_first_chunk():
+    attempts = []
+
+    def make_stream():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise StatusError(503)
+        yield StreamChunk("a")
+        yield StreamChunk("b")
+
+    chunks = list(policy().stream(make_stream))
+    assert [c.text for c in chunks] == ["a", "b"]
+    assert len(attempts) == 2
+
+
+def test_stream_does_not_retry_after_first_chunk():
+    attempts = []
+
+    def make_stream():
+        attempts.append(1)
+        yield StreamChunk("a")
+        raise StatusError(503)
+
+    seen = []
+    with pytest.raises(StatusError):
+        for chunk in policy().stream(make_stream):
+            seen.append(chunk.text)
+    assert seen == ["a"]
+    assert len(attempts) == 1
+
+
+def test_astream_does_not_retry_after_first_chunk():
+    attempts = []
+
+    async def make_stream():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise StatusError(503)
+        yield StreamChunk("a")
+        raise StatusError(503)
+
+    async def main():
+        seen = []
+        with pytest.raises(StatusError):
+            async for chunk in policy().astream(make_stream):
+                seen.append(chunk.text)
+        return seen
+
+    assert asyncio.run(main()) == ["a"]
+    assert len(attempts) == 2
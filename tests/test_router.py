@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+from wrapper.core import Wrapper
+from wrapper.metrics import Metrics
+from wrapper.ratelimit import RateLimiter
+from wrapper.router import Router
+from tests.conftest import FakeProvider
+
+
+class Throttled(Exception):
+    pass
+
+
+def test_fails_over_to_next_provider(fake_providers):
+    fake_providers["a"] = FakeProvider(error=ConnectionError("down"))
+    fake_providers["b"] = FakeProvider(text="from b")
+    router = Router(["a", "b"], models={"a": "model-a", "b": "model-b"})
+
+    result = router.complete(prompt="hi")
+    assert (result.text, result.provider) == ("from b", "b")
+    assert fake_providers["b"].calls[0]["model"] == "model-b"
+    stats = router.stats()
+    assert (stats["a"]["failures"], stats["b"]["failures"]) == (1, 0)
+
+
+def test_all_failing_raises_with_last_error(fake_providers):
+    fake_providers["a"] = FakeProvider(error=ConnectionError("a down"))
+    fake_providers["b"] = FakeProvider(error=ConnectionError("b down"))
+    with pytest.raises(RuntimeError) as info:
+        Router(["a", "b"]).complete(prompt="hi")
+    assert isinstance(info.value.__cause__, ConnectionError)
+
+
+def test_caller_errors_are_not_provider_failures(fake_providers):
+    fake_providers["a"] = FakeProvider(error=ValueError("bad argument"))
+    fake_providers["b"] = FakeProvider()
+    router = Router(["a", "b"])
+    with pytest.raises(ValueError):
+        router.complete(prompt="hi")
+    assert fake_providers["b"].calls == []
+    assert router.stats()["a"]["failures"] == 0
+
+
+def test_benched_provider_goes_last(fake_providers):
+    fake_providers["a"] = FakeProvider(error=ConnectionError("down"))
+    fake_providers["b"] = FakeProvider()
+    router = Router(["a", "b"], max_failures=2, cooldown=60)
+    for _ in range(2):
+        router.complete(prompt="hi")
+    assert router._order() == ["b", "a"]
+    router.complete(prompt="hi")
+    assert len(fake_providers["a"].calls) == 2
+
+
+def test_classify_uses_failing_providers_rules(fake_providers):
+    # a calls every error fatal, b calls every error retryable
+    fake_providers["a"] = FakeProvider(error=ConnectionError("down"), retryable=False)
+    fake_providers["b"] = FakeProvider(error=Throttled(), retryable=True)
+
+    for order, verdict in ((["a", "b"], True), (["b", "a"], False)):
+        router = Router(order)
+        with pytest.raises(RuntimeError) as info:
+            router.complete(prompt="hi")
+        # the last backend tried decides, whatever the list order
+        assert router.classify_error(info.value) == (verdict, None)
+
+
+def test_stream_fails_over_before_first_chunk(fake_providers):
+    fake_providers["a"] = FakeProvider(stream_error=ConnectionError("down"), fail_after=0)
+    fake_providers["b"] = FakeProvider(chunks=("x", "y"))
+    router = Router(["a", "b"])
+    assert [c.text for c in router.stream(prompt="hi")] == ["x", "y"]
+    assert router.stats()["a"]["failures"] == 1
+
+
+def test_stream_error_after_first_chunk_is_raised(fake_providers):
+    fake_providers["a"] = FakeProvider(chunks=("x", "y"), stream_error=ConnectionError("cut"), fail_after=1)
+    fake_providers["b"] = FakeProvider()
+    seen = []
+    with pytest.raises(ConnectionError):
+        for chunk in Router(["a", "b"]).stream(prompt="hi"):
+            seen.append(chunk.text)
+    assert seen == ["x"]
+    assert fake_providers["b"].calls == []
+
+
+def test_stream_first_chunk_timeout_fails_over(fake_providers):
+    fake_providers["a"] = FakeProvider(chunks=("slow",), delay=0.5)
+    fake_providers["b"] = FakeProvider(chunks=("fast",))
+    router = Router(["a", "b"], timeout=0.05)
+    assert [c.text for c in router.stream(prompt="hi")] == ["fast"]
+
+
+def test_astream_fails_over_before_first_chunk(fake_providers):
+    fake_providers["a"] = FakeProvider(stream_error=ConnectionError("down"), fail_after=0)
+    fake_providers["b"] = FakeProvider(chunks=("x", "y"))
+    router = Router(["a", "b"])
+
+    async def main():
+        return [c.text async for c in router.astream(prompt="hi")]
+
+    assert asyncio.run(main()) == ["x", "y"]
+
+
+def test_wrapper_keys_limits_and_metrics_on_backend(fake_providers):
+    fake_providers["a"] = FakeProvider(error=ConnectionError("down"), stream_error=ConnectionError("down"))
+    fake_providers["b"] = FakeProvider()
+    client = Wrapper(["a", "b"], models={"a": "model-a", "b": "model-b"}, rate_limit=RateLimiter(rpm=600), metrics=Metrics())
+
+    assert client.generate(prompt="hi") == "ok"
+    assert "".join(c.text for c in client.stream(prompt="hi")) == "ab"
+
+    snapshot = client.metrics.snapshot()
+    assert snapshot["a:model-a"]["errors"] == 2
+    assert snapshot["b:model-b"]["calls"] == 2
+    assert snapshot["b:model-b"]["completion_tokens"] == 2
+    assert sorted(client.rate_limit._buckets) == ["a:model-a:rpm", "b:model-b:rpm"]
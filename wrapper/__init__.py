@@ -1,5 +1,15 @@
 __version__ = "0.1.16"
 
-from .core import Wrapper
+from .core import Wrapper, WrapperEmbed
+from .types import StreamChunk, GenerationResult
+from .conversation import Conversation
+from .batch import BatchJob
+from .cache import MemoryCache, SQLiteCache, EmbeddingCache
+from .semantic import SemanticCache
+from .retry import RetryPolicy
+from .hedge import HedgePolicy
+from .coalesce import SingleFlight
+from .metrics import Metrics
+from .ratelimit import RateLimiter, SQLiteRateLimiter
 from .utils import *
 from .providers import *
\ No newline at end of file
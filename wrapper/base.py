@@ -1,6 +1,130 @@
+import sys
+import asyncio
+import functools
+import threading
+import weakref
 from abc import ABC, abstractmethod
+from wrapper.types import StreamChunk, GenerationResult
 
 class BaseLLM(ABC):
+    # inputs per embeddings request and the model used when WrapperEmbed is given none
+    EMBED_BATCH_SIZE = 256
+    DEFAULT_EMBED_MODEL = None
+    # extra submit_batch kwargs for providers with an offline batch API
+    BATCH_OPTIONS = ()
+    # the constructor takes max_retries for the SDK client's own retries, Wrapper sets it to 0 with a RetryPolicy
+    SDK_RETRIES = False
+
     @abstractmethod
     def generate(self, prompt: str, **kwargs) -> str:
-        pass
\ No newline at end of file
+        pass
+
+    def embed(self, texts: list[str], model: str, **kwargs):
+        """float32 matrix of shape (len(texts), dim) from one request, WrapperEmbed does the batching"""
+        raise NotImplementedError(f"{type(self).__name__} has no embeddings API")
+
+    async def aembed(self, texts: list[str], model: str, **kwargs):
+        """Fallback async embed, runs the blocking call in the default executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.embed, texts, model, **kwargs))
+
+    def embed_batch_size(self, model: str) -> int:
+        return self.EMBED_BATCH_SIZE
+
+    def classify_error(self, exc: Exception) -> tuple:
+        """(retryable, retry_after) for a failed call, providers override for SDK specific errors"""
+        from wrapper.retry import classify_error
+        return classify_error(exc)
+
+    def _loop_client(self, factory):
+        """Async SDK clients are bound to the event loop that created them, keep one per running loop"""
+        loop = asyncio.get_running_loop()
+        clients = self.__dict__.setdefault("_async_clients", weakref.WeakKeyDictionary())
+        client = clients.get(loop)
+        if client is None:
+            client = clients[loop] = factory()
+        return client
+
+    async def agenerate(self, **kwargs) -> str:
+        """Fallback async generate, runs the blocking call in the default executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.generate, **kwargs))
+
+    def complete(self, **kwargs) -> GenerationResult:
+        """Fallback for providers that only return text, usage stays empty"""
+        kwargs.pop("stream", None)
+        return GenerationResult(self.generate(stream=False, **kwargs), model=kwargs.get("model"))
+
+    async def acomplete(self, **kwargs) -> GenerationResult:
+        """Fallback async complete, runs the blocking one in the default executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.complete, **kwargs))
+
+    def stream(self, **kwargs):
+        """Fallback stream, yields the whole generation as a single chunk"""
+        kwargs.pop("stream", None)
+        yield StreamChunk(self.generate(stream=False, **kwargs), finish_reason="stop")
+
+    async def astream(self, **kwargs):
+        """Fallback async stream, drives the blocking stream() from a worker thread"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        done = object()
+        stop = threading.Event()
+
+        def put(item):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                # the loop is gone, nobody is reading anymore
+                stop.set()
+
+        def pump():
+            chunks = self.stream(**kwargs)
+            try:
+                for chunk in chunks:
+                    if stop.is_set():
+                        break
+                    put(chunk)
+            except Exception as e:
+                put(e)
+            finally:
+                # closed from this thread, a running generator can't be closed from another one
+                chunks.close()
+                put(done)
+
+        worker = loop.run_in_executor(None, pump)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+            await worker
+        finally:
+            # closed or cancelled early, the pump stops at its next chunk
+            stop.set()
+
+    @staticmethod
+    def _print_stream(chunks) -> str:
+        """Echo streamed text to stdout and return the joined result"""
+        output = []
+        for chunk in chunks:
+            if chunk.text:
+                sys.stdout.write(chunk.text)
+                sys.stdout.flush()
+                output.append(chunk.text)
+        return "".join(output).strip()
+
+    @staticmethod
+    async def _aprint_stream(chunks) -> str:
+        """Async twin of _print_stream"""
+        output = []
+        async for chunk in chunks:
+            if chunk.text:
+                sys.stdout.write(chunk.text)
+                sys.stdout.flush()
+                output.append(chunk.text)
+        return "".join(output).strip()
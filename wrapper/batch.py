@@ -0,0 +1,172 @@
+import time
+
+
+class BatchItem:
+    """Outcome of one request inside a batch, either output or error is set"""
+    __slots__ = ("index", "request", "output", "error", "latency")
+
+    def __init__(self, index: int, request: dict, output=None, error: Exception = None, latency: float = 0.0):
+        self.index = index
+        self.request = request
+        self.output = output
+        self.error = error
+        self.latency = latency
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        status = "ok" if self.ok else f"error={self.error!r}"
+        return f"BatchItem(index={self.index}, {status}, latency={self.latency:.3f}s)"
+
+
+class BatchReport:
+    """Ordered batch results plus throughput numbers"""
+
+    def __init__(self, items: list, elapsed: float, max_concurrency: int):
+        self.items = items
+        self.elapsed = elapsed
+        self.max_concurrency = max_concurrency
+
+    @property
+    def outputs(self) -> list:
+        return [item.output for item in self.items]
+
+    @property
+    def errors(self) -> list:
+        return [item for item in self.items if not item.ok]
+
+    @property
+    def succeeded(self) -> int:
+        return sum(1 for item in self.items if item.ok)
+
+    @property
+    def failed(self) -> int:
+        return len(self.items) - self.succeeded
+
+    @property
+    def throughput(self) -> float:
+        """Successful requests per second, failures that return fast don't inflate it"""
+        return self.succeeded / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def request_rate(self) -> float:
+        """Finished requests per second, failed ones included"""
+        return len(self.items) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def __repr__(self):
+        return (
+            f"BatchReport(total={len(self.items)}, succeeded={self.succeeded}, failed={self.failed}, "
+            f"elapsed={self.elapsed:.2f}s, throughput={self.throughput:.2f} ok/s, "
+            f"request_rate={self.request_rate:.2f} req/s)"
+        )
+
+
+def _run_one(fn, index: int, request: dict) -> BatchItem:
+    start = time.perf_counter()
+    try:
+        output = fn(**request)
+        return BatchItem(index, request, output=output, latency=time.perf_counter() - start)
+    except Exception as e:
+        return BatchItem(index, request, error=e, latency=time.perf_counter() - start)
+
+
+def run_batch(fn, requests: list[dict], max_concurrency: int = 8) -> BatchReport:
+    """Call fn(**request) for every request on a thread pool, keeping input order"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    requests = list(requests)
+    start = time.perf_counter()
+    if not requests:
+        return BatchReport([], 0.0, max_concurrency)
+
+    workers = max(1, min(max_concurrency, len(requests)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wrapper-batch") as pool:
+        futures = [pool.submit(_run_one, fn, i, req) for i, req in enumerate(requests)]
+        items = [f.result() for f in futures]
+    return BatchReport(items, time.perf_counter() - start, max_concurrency)
+
+
+async def arun_batch(afn, requests: list[dict], max_concurrency: int = 8) -> BatchReport:
+    """Await afn(**request) for every request with at most max_concurrency in flight"""
+    import asyncio
+
+    requests = list(requests)
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    start = time.perf_counter()
+
+    async def run_one(index: int, request: dict) -> BatchItem:
+        async with semaphore:
+            t0 = time.perf_counter()
+            try:
+                output = await afn(**request)
+                return BatchItem(index, request, output=output, latency=time.perf_counter() - t0)
+            except Exception as e:
+                return BatchItem(index, request, error=e, latency=time.perf_counter() - t0)
+
+    items = await asyncio.gather(*[run_one(i, req) for i, req in enumerate(requests)])
+    return BatchReport(list(items), time.perf_counter() - start, max_concurrency)
+
+
+# provider batch states after which nothing changes anymore
+BATCH_DONE = frozenset({"completed", "failed", "expired", "cancelled"})
+
+
+class BatchJob:
+    """
+    Handle for work submitted to a provider's offline batch API with Wrapper.submit_batch.
+    Big jobs are split over several provider batches, ids lists all of them.
+    Keep to_dict() somewhere to collect the results from another process later.
+    """
+
+    def __init__(self, provider: str, ids: list, total: int = None):
+        self.provider = provider
+        self.ids = list(ids)
+        self.total = total
+        self.statuses = {}
+
+    def update(self, status: dict):
+        self.statuses[status["id"]] = status
+
+    @property
+    def status(self) -> str:
+        states = [self.statuses.get(batch_id, {}).get("status") for batch_id in self.ids]
+        if states and all(state in BATCH_DONE for state in states):
+            # completed only when every part is, otherwise the first part that wasn't
+            return next((state for state in states if state != "completed"), "completed")
+        return "in_progress" if any(states) else "submitted"
+
+    @property
+    def done(self) -> bool:
+        return self.status in BATCH_DONE
+
+    @property
+    def completed(self) -> int:
+        return sum(s.get("completed") or 0 for s in self.statuses.values())
+
+    @property
+    def failed(self) -> int:
+        return sum(s.get("failed") or 0 for s in self.statuses.values())
+
+    def to_dict(self) -> dict:
+        return {"provider": self.provider, "ids": self.ids, "total": self.total}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(data["provider"], data["ids"], data.get("total"))
+
+    def __repr__(self):
+        return (
+            f"BatchJob({self.provider}, {len(self.ids)} batches, status={self.status}, "
+            f"completed={self.completed}/{self.total}, failed={self.failed})"
+        )
@@ -0,0 +1,291 @@
+import asyncio
+import threading
+from wrapper.cache import make_cache_key
+from wrapper.types import GenerationResult
+from wrapper.utils import ColorLogger
+from wrapper.config import SHOW_LOGS
+
+log = ColorLogger(enable_debug=SHOW_LOGS)
+
+
+def _copy(result: GenerationResult) -> GenerationResult:
+    # every caller gets its own result object, the leader may still be touching its copy
+    return GenerationResult(**result.to_dict())
+
+
+class _Flight:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _SharedStream:
+    """
+    One provider stream read by several callers. Chunks are kept so late joiners replay
+    from the start, and whichever subscriber runs out of buffered chunks pulls the next one,
+    so there is no pump thread and an abandoned consumer doesn't stall the others.
+    """
+
+    def __init__(self, open_stream, on_done):
+        self.open_stream = open_stream
+        self.on_done = on_done
+        self.source = None
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.pulling = False
+        self.subscribers = 0
+        self.cond = threading.Condition()
+
+    def add_subscriber(self):
+        with self.cond:
+            self.subscribers += 1
+
+    def _pull(self):
+        try:
+            if self.source is None:
+                self.source = self.open_stream()
+            chunk, done, error = next(self.source), False, None
+        except StopIteration:
+            chunk, done, error = None, True, None
+        except BaseException as e:
+            chunk, done, error = None, True, e
+        with self.cond:
+            if done:
+                self.done, self.error = True, error
+            else:
+                self.chunks.append(chunk)
+            self.pulling = False
+            self.cond.notify_all()
+        if done:
+            self.on_done(self)
+
+    def subscribe(self):
+        i = 0
+        try:
+            while True:
+                with self.cond:
+                    while i >= len(self.chunks) and not self.done and self.pulling:
+                        self.cond.wait()
+                    if i < len(self.chunks):
+                        chunk = self.chunks[i]
+                    elif self.done:
+                        if self.error is not None:
+                            raise self.error
+                        return
+                    else:
+                        self.pulling = True
+                        chunk = None
+                if chunk is None:
+                    self._pull()
+                    continue
+                i += 1
+                yield chunk
+        finally:
+            with self.cond:
+                self.subscribers -= 1
+                abandoned = self.subscribers == 0 and not self.done
+                if abandoned:
+                    self.done, self.error = True, RuntimeError("Shared stream was closed by every reader")
+            if abandoned:
+                # nobody is inside next() now, so the provider stream can be closed
+                if self.source is not None:
+                    self.source.close()
+                self.on_done(self)
+
+
+class _ASharedStream:
+    """asyncio version of _SharedStream, used from the loop it was opened on only"""
+
+    def __init__(self, open_stream, on_done):
+        self.open_stream = open_stream
+        self.on_done = on_done
+        self.source = None
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.pulling = False
+        self.subscribers = 0
+        self.cond = asyncio.Condition()
+
+    def add_subscriber(self):
+        self.subscribers += 1
+
+    async def _pull(self):
+        try:
+            if self.source is None:
+                self.source = self.open_stream()
+            chunk, done, error = await self.source.__anext__(), False, None
+        except StopAsyncIteration:
+            chunk, done, error = None, True, None
+        except BaseException as e:
+            chunk, done, error = None, True, e
+        async with self.cond:
+            if done:
+                self.done, self.error = True, error
+            else:
+                self.chunks.append(chunk)
+            self.pulling = False
+            self.cond.notify_all()
+        if done:
+            self.on_done(self)
+
+    async def subscribe(self):
+        i = 0
+        try:
+            while True:
+                async with self.cond:
+                    while i >= len(self.chunks) and not self.done and self.pulling:
+                        await self.cond.wait()
+                    if i < len(self.chunks):
+                        chunk = self.chunks[i]
+                    elif self.done:
+                        if self.error is not None:
+                            raise self.error
+                        return
+                    else:
+                        self.pulling = True
+                        chunk = None
+                if chunk is None:
+                    await self._pull()
+                    continue
+                i += 1
+                yield chunk
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                self.done, self.error = True, RuntimeError("Shared stream was closed by every reader")
+                if self.source is not None:
+                    await self.source.aclose()
+                self.on_done(self)
+
+
+class SingleFlight:
+    """
+    Coalesce identical requests that are in flight at the same time into one provider call.
+    Late callers wait for the leader's result (or replay and follow its stream) instead of
+    sending their own request, so N duplicate concurrent calls cost one round trip.
+    Requests are matched by the same canonical params hash the response cache uses.
+
+    deterministic_only: only share calls made with temperature=0, sampled answers stay independent.
+
+    Errors are shared too, every waiting caller gets the leader's exception.
+    Async calls are only coalesced with calls on the same event loop.
+    """
+
+    def __init__(self, deterministic_only: bool = False):
+        self.deterministic_only = deterministic_only
+        self.calls = 0
+        self.joined = 0
+        self._flights = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def key(self, provider: str, params: dict):
+        """Flight key for these params, None when the call should not be shared"""
+        if self.deterministic_only and params.get("temperature") != 0:
+            return None
+        return make_cache_key(provider, params)
+
+    def _join(self, table: dict, key, make):
+        """(entry, leader) for key, a new entry from make() when nothing matching is in flight"""
+        with self._lock:
+            entry = table.get(key)
+            shared = isinstance(entry, (_SharedStream, _ASharedStream))
+            leader = entry is None or (shared and entry.done)
+            if leader:
+                entry = table[key] = make()
+                shared = isinstance(entry, (_SharedStream, _ASharedStream))
+                self.calls += 1
+            else:
+                self.joined += 1
+            if shared:
+                # counted under the table lock so a joiner never picks up a stream being torn down,
+                # stream() and astream() only join on their first iteration so an unused generator holds no count
+                entry.add_subscriber()
+            return entry, leader
+
+    def _drop(self, table: dict, key, entry):
+        with self._lock:
+            if table.get(key) is entry:
+                del table[key]
+
+    def call(self, key, fn):
+        """fn(), or the result of the identical call already running in another thread"""
+        flight, leader = self._join(self._flights, key, _Flight)
+        if not leader:
+            log.debug("coalesced with an identical request in flight")
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return _copy(flight.result)
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._drop(self._flights, key, flight)
+            flight.event.set()
+
+    async def acall(self, key, afn):
+        # futures belong to one event loop, so async flights are keyed per loop
+        loop = asyncio.get_running_loop()
+        key = (loop, key)
+        flight, leader = self._join(self._flights, key, lambda: loop.create_future())
+        if not leader:
+            log.debug("coalesced with an identical request in flight")
+            try:
+                return _copy(await asyncio.shield(flight))
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+            # the leader was cancelled, take over
+            return await self.acall(key[1], afn)
+        try:
+            result = await afn()
+            flight.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as e:
+            flight.set_exception(e)
+            # marks the exception as retrieved when nobody joined
+            flight.exception()
+            raise
+        finally:
+            self._drop(self._flights, key, flight)
+
+    def stream(self, key, open_stream):
+        """Chunks of open_stream(), shared with identical streams already running"""
+        shared, leader = self._join(
+            self._streams, key, lambda: _SharedStream(open_stream, lambda s: self._drop(self._streams, key, s))
+        )
+        if not leader:
+            log.debug("following an identical stream in flight")
+        # yield from starts subscribe() right away, so closing this generator always reaches its finally
+        yield from shared.subscribe()
+
+    async def astream(self, key, open_stream):
+        # joined on first iteration, Wrapper.astream may be called before the loop runs
+        key = (asyncio.get_running_loop(), key)
+        shared, leader = self._join(
+            self._streams, key, lambda: _ASharedStream(open_stream, lambda s: self._drop(self._streams, key, s))
+        )
+        if not leader:
+            log.debug("following an identical stream in flight")
+        chunks = shared.subscribe()
+        try:
+            # the first __anext__ enters subscribe()'s try before it awaits anything
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "joined": self.joined, "in_flight": len(self._flights) + len(self._streams)}
@@ -1 +1,26 @@
-SHOW_LOGS = False
\ No newline at end of file
+SHOW_LOGS = False
+
+# Connection pool used by the raw HTTP paths (Ollama, model listing)
+HTTP_POOL_SIZE = 32
+HTTP_MAX_RETRIES = 3
+
+# Threads that run sync hedged requests (each in-flight hedge holds one)
+HEDGE_MAX_WORKERS = 32
+
+# How long Ollama keeps a model loaded after a call ("30m", seconds, -1 = forever), None = server default
+OLLAMA_KEEP_ALIVE = None
+
+# Anthropic/Bedrock prompt caching default: False, True (5 minute cache) or a TTL like "1h"
+PROMPT_CACHE = False
+
+# WrapperEmbed: batch requests in flight at once, and a size cap per request (~4 chars per token)
+EMBED_MAX_CONCURRENCY = 4
+EMBED_MAX_BATCH_CHARS = 1_000_000
+
+# Offline batch APIs: first wait between status polls, doubled up to the max (seconds)
+BATCH_POLL_INTERVAL = 10
+BATCH_MAX_POLL_INTERVAL = 300
+
+# SemanticCache: Ollama embedding model for prompts and the cosine similarity a match needs
+SEMANTIC_CACHE_MODEL = "nomic-embed-text"
+SEMANTIC_CACHE_THRESHOLD = 0.92
@@ -0,0 +1,143 @@
+from wrapper.utils import CleanMessages, _clean_message, ColorLogger
+from wrapper.config import SHOW_LOGS
+
+log = ColorLogger(enable_debug=SHOW_LOGS)
+
+
+def _estimate(msg: dict) -> int:
+    # ~4 chars per token plus a few for the role/turn framing
+    return len(msg["content"]) // 4 + 4
+
+
+class Conversation:
+    """
+    A chat session that grows one message at a time.
+
+    Each message is validated and sanitized once when it's added, and providers
+    reuse the cached system/turn split, so a new turn costs O(new message)
+    instead of reprocessing the whole history.
+
+    system:             optional system prompt, kept through trimming
+    max_context_tokens: drop the oldest turns when the estimated size goes over this
+    trim_to:            fraction of max_context_tokens to trim down to, so trimming doesn't run every turn
+
+        chat = Conversation(system="You are terse.", max_context_tokens=8000)
+        reply = client.chat(chat, "Hi!", model="gpt-4o-mini")
+    """
+
+    def __init__(
+        self,
+        system: str = None,
+        messages: list[dict] = None,
+        max_context_tokens: int = None,
+        trim_to: float = 0.75,
+    ):
+        if not 0 < trim_to <= 1:
+            raise ValueError("trim_to must be between 0 and 1")
+        self.max_context_tokens = max_context_tokens
+        self.trim_to = trim_to
+        self.messages = CleanMessages()
+        self._tokens = []
+        self.token_count = 0
+        if system:
+            self.add("system", system)
+        for msg in messages or []:
+            self.add(msg["role"], msg["content"])
+
+    def add(self, role: str, content: str) -> dict:
+        """Append a message, raises ValueError on an unknown role"""
+        msg = _clean_message({"role": role, "content": content})
+        tokens = _estimate(msg)
+        self.messages.append(msg)
+        self.messages.clean = len(self.messages)
+        self._tokens.append(tokens)
+        self.token_count += tokens
+        if self.max_context_tokens and self.token_count > self.max_context_tokens:
+            self.trim()
+        return msg
+
+    def user(self, content: str) -> dict:
+        return self.add("user", content)
+
+    def assistant(self, content: str) -> dict:
+        return self.add("assistant", content)
+
+    def pop(self) -> dict:
+        """Remove and return the newest message, e.g. a question whose reply failed"""
+        msg = self.messages.pop()
+        self.token_count -= self._tokens.pop()
+        self.messages.clean = len(self.messages)
+        # the cached split already counted the removed message
+        self.messages._split = None
+        return msg
+
+    def checkpoint(self) -> tuple:
+        """State to pass to rollback(), copies the message list but not the messages"""
+        return list(self.messages), list(self._tokens), self.token_count
+
+    def rollback(self, state: tuple):
+        """Go back to a checkpoint(), turns trimmed since then come back too"""
+        messages, tokens, token_count = state
+        self.messages[:] = messages
+        # every restored message was cleaned before, only the cached split has to be rebuilt
+        self.messages.clean = len(self.messages)
+        self._tokens = tokens
+        self.token_count = token_count
+
+    def trim(self, budget: int = None) -> int:
+        """
+        Drop the oldest non-system messages until the conversation fits in trim_to * budget
+        (max_context_tokens by default). The newest message is always kept. Returns how many were dropped.
+        """
+        budget = budget or self.max_context_tokens
+        if not budget:
+            return 0
+        target = int(budget * self.trim_to)
+        keep = [msg["role"] == "system" for msg in self.messages]
+        total = self.token_count
+        last = len(self.messages) - 1
+        for i, msg in enumerate(self.messages):
+            if total <= target:
+                break
+            if keep[i] or i == last:
+                continue
+            total -= self._tokens[i]
+            keep[i] = None
+
+        # the history shouldn't open with an assistant turn, drop it along with its question
+        first_turn = next((i for i, k in enumerate(keep) if k is not None and not k), None)
+        while first_turn is not None and first_turn != last and self.messages[first_turn]["role"] == "assistant":
+            total -= self._tokens[first_turn]
+            keep[first_turn] = None
+            first_turn = next((i for i in range(first_turn + 1, len(keep)) if keep[i] is False), None)
+
+        dropped = keep.count(None)
+        if dropped:
+            self.messages[:] = [m for m, k in zip(self.messages, keep) if k is not None]
+            self._tokens = [t for t, k in zip(self._tokens, keep) if k is not None]
+            self.token_count = total
+            # everything left is still clean, only the cached system split is stale
+            self.messages.clean = len(self.messages)
+            self.messages._split = None
+            log.debug(f"conversation: dropped {dropped} old messages, ~{total} tokens left")
+        return dropped
+
+    def clear(self):
+        """Forget every turn but keep the system prompt"""
+        self.messages.mark_dirty()
+        self._tokens = [t for t, m in zip(self._tokens, self.messages) if m["role"] == "system"]
+        self.messages[:] = [m for m in self.messages if m["role"] == "system"]
+        self.messages.clean = len(self.messages)
+        self.token_count = sum(self._tokens)
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __getitem__(self, index):
+        return self.messages[index]
+
+    def __repr__(self):
+        return f"Conversation({len(self.messages)} messages, ~{self.token_count} tokens)"
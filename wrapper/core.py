@@ -1,36 +1,97 @@
-from wrapper.providers.anthropic_provider import AnthropicProvider
-from wrapper.providers.azure_provider import AzureProvider
-from wrapper.providers.openai_provider import OpenAIProvider
-from wrapper.providers.ollama_provider import OllamaProvider
-from wrapper.providers.groq_provider import GroqProvider
-from wrapper.providers.bedrock_provider import BedrockProvider
+import time
 from collections import defaultdict
-from wrapper.utils import ColorLogger
+from wrapper.batch import run_batch, arun_batch, BatchReport, BatchJob, BATCH_DONE
+from wrapper.base import BaseLLM
+from wrapper.cache import BaseCache, EmbeddingCache, make_cache_key
+from wrapper.registry import get_provider, create_provider, load_provider_class
+from wrapper.retry import RetryPolicy
+from wrapper.hedge import HedgePolicy
+from wrapper.coalesce import SingleFlight
+from wrapper.metrics import Metrics
+from wrapper.types import GenerationResult
+from wrapper.conversation import Conversation
+from wrapper.ratelimit import RateLimiter, estimate_tokens
+from wrapper.utils import ColorLogger, require_numpy
 from wrapper.config import *
 
 log = ColorLogger(enable_debug=SHOW_LOGS)
 
-class Wrapper:
-    def __init__(self, provider: str, **kwargs):
-        provider = provider.lower()
 
-        if provider == "anthropic":
-            self.impl = AnthropicProvider(**kwargs)
-        elif provider == "azure":
-            self.impl = AzureProvider(**kwargs)
-        elif provider == "openai":
-            self.impl = OpenAIProvider(**kwargs)
-        elif provider == "ollama":
-            self.impl = OllamaProvider(**kwargs)
-        elif provider == "groq":  
-            self.impl = GroqProvider(**kwargs)
-        elif provider == "bedrock":
-            self.impl = BedrockProvider(**kwargs)
+def _sdk_retries_off(provider: str, kwargs: dict) -> dict:
+    """kwargs with the SDK client's own retries off, so a RetryPolicy attempt is exactly one request"""
+    if "max_retries" in kwargs or not load_provider_class(provider).SDK_RETRIES:
+        return kwargs
+    return {**kwargs, "max_retries": 0}
 
+
+class Wrapper:
+    def __init__(
+        self,
+        provider,
+        cache: BaseCache = None,
+        cache_deterministic_only: bool = False,
+        retry: RetryPolicy = None,
+        rate_limit: RateLimiter = None,
+        hedge: HedgePolicy = None,
+        metrics: Metrics = None,
+        coalesce: SingleFlight = None,
+        semantic_cache=None,
+        reuse: bool = True,
+        strategy: str = "priority",
+        **kwargs
+    ):
+        """
+        provider: provider name, or a list of names for router mode, e.g.
+            Wrapper(["groq", "openai"], strategy="latency", models={"groq": ..., "openai": ...})
+            (in router mode kwargs go to wrapper.router.Router: models, costs, timeout, cooldown, provider_kwargs, ...)
+        cache: optional response cache (MemoryCache, SQLiteCache, ...) used by generate/agenerate.
+        cache_deterministic_only: only cache calls made with temperature=0.
+        retry: RetryPolicy for 429s/5xx/connection errors, True for the defaults, None to fail fast.
+            With a policy the SDK clients' own retries are turned off, so there is one retry layer.
+        rate_limit: RateLimiter (or SQLiteRateLimiter to share across processes) that queues calls over RPM/TPM.
+        hedge: HedgePolicy that races a second request against slow ones, True for the defaults.
+        metrics: Metrics collecting latency, TTFT, tokens and retries per provider/model, True for a fresh one.
+        coalesce: SingleFlight that shares one provider call (or stream) between identical concurrent requests, True for the defaults.
+        semantic_cache: SemanticCache that answers paraphrases of earlier prompts, checked after the exact cache.
+            True for one on the default local Ollama embedding model.
+        reuse: share one provider instance (and its SDK clients) per provider + kwargs across the process.
+        strategy: router mode only, how to pick a backend (priority, latency, errors, cost, round_robin).
+        """
+        self.retry = RetryPolicy() if retry is True else retry
+        self.routed = isinstance(provider, (list, tuple))
+        if self.routed:
+            from wrapper.router import Router
+
+            if self.retry is not None:
+                per_provider = {name.lower(): opts for name, opts in (kwargs.get("provider_kwargs") or {}).items()}
+                kwargs["provider_kwargs"] = {
+                    name.lower(): _sdk_retries_off(name, per_provider.get(name.lower(), {})) for name in provider
+                }
+            self.impl = Router(provider, strategy=strategy, **kwargs)
+            provider = "router:" + ",".join(self.impl.names)
         else:
-            raise ValueError(f"Provider {provider} not supported yet")
-        
-    def generate(
+            provider = provider.lower()
+            if self.retry is not None:
+                kwargs = _sdk_retries_off(provider, kwargs)
+            self.impl = get_provider(provider, **kwargs) if reuse else create_provider(provider, **kwargs)
+        self.provider = provider
+        self.cache = cache
+        self.cache_deterministic_only = cache_deterministic_only
+        self.rate_limit = rate_limit
+        self.hedge = HedgePolicy() if hedge is True else hedge
+        self.metrics = Metrics() if metrics is True else metrics
+        self.coalesce = SingleFlight() if coalesce is True else coalesce
+        if self.routed:
+            # limits and metrics are applied per backend attempt, keyed on the provider that serves it
+            self.impl.rate_limit = self.rate_limit
+            self.impl.metrics = self.metrics
+        if semantic_cache is True:
+            from wrapper.semantic import SemanticCache
+
+            semantic_cache = SemanticCache()
+        self.semantic_cache = semantic_cache
+
+    def _build_params(
         self,
         model: str,
         prompt: str = None,
@@ -44,9 +105,10 @@ class Wrapper:
         presence_penalty: float = None,
         stream: bool = False,
         **kwargs
-    ) -> str:
-
+    ) -> dict:
         # Prepare messages
+        if isinstance(messages, Conversation):
+            messages = messages.messages
         if messages is None:
             messages = []
 
@@ -75,16 +137,538 @@ class Wrapper:
         if presence_penalty is not None:
             params["presence_penalty"] = presence_penalty
         params.update(kwargs)
+        return params
+
+    def _cache_key(self, params: dict):
+        """Cache key for these params, None when the call should not be cached"""
+        if self.cache is None:
+            return None
+        if self.cache_deterministic_only and params.get("temperature") != 0:
+            return None
+        return make_cache_key(self.provider, params)
+
+    def _semantic_split(self, params: dict):
+        """(namespace, prompt) for the semantic cache, None when it is off or can't match this call"""
+        if self.semantic_cache is None:
+            return None
+        return self.semantic_cache.split(self.provider, params)
+
+    def _limited(self, provider: str = None) -> bool:
+        # in router mode the Router throttles each backend itself
+        return self.rate_limit is not None and not (self.routed and provider in (None, self.provider))
+
+    def _throttle(self, params: dict, provider: str = None):
+        if self._limited(provider):
+            self.rate_limit.acquire(provider or self.provider, params.get("model"), estimate_tokens(params))
+
+    async def _athrottle(self, params: dict, provider: str = None):
+        if self._limited(provider):
+            await self.rate_limit.aacquire(provider or self.provider, params.get("model"), estimate_tokens(params))
+
+    def _hedge_leg(self, params: dict) -> tuple:
+        """(params, impl, provider) for the hedge request, the same call unless the policy points elsewhere"""
+        if self.hedge.provider is None or self.hedge.provider == self.provider:
+            if self.hedge.model is None:
+                return params, self.impl, self.provider
+            return {**params, "model": self.hedge.model}, self.impl, self.provider
+        impl = get_provider(self.hedge.provider)
+        return {**params, "model": self.hedge.model or params.get("model")}, impl, self.hedge.provider
+
+    def _track(self, params: dict, stream: bool = False):
+        """CallRecord for this call when metrics are on, otherwise None"""
+        if self.metrics is None or self.routed:
+            # the Router records every backend attempt under the backend's own name and model
+            return None
+        return self.metrics.track(self.provider, params.get("model"), stream)
+
+    def _cached_result(self, text: str, params: dict) -> GenerationResult:
+        return GenerationResult(text, provider=self.provider, model=params.get("model"), latency=0.0, cached=True)
+
+    def _cache_hit(self, params: dict):
+        log.debug("cache hit, skipping the provider call")
+        if self.metrics is not None:
+            record = self.metrics.track(self.provider, params.get("model"))
+            record.cached = True
+            record.finish()
+
+    def _call(self, params: dict, impl=None, provider: str = None, on_retry=None):
+        """Single provider call, rate limited per attempt and retried according to self.retry"""
+        impl = impl or self.impl
+
+        def attempt():
+            self._throttle(params, provider)
+            result = impl.complete(**params)
+            result.provider = result.provider or provider
+            return result
+
+        if self.retry is None:
+            return attempt()
+        return self.retry.call(attempt, classify=impl.classify_error, on_retry=on_retry)
+
+    async def _acall(self, params: dict, impl=None, provider: str = None, on_retry=None):
+        impl = impl or self.impl
+
+        async def attempt():
+            await self._athrottle(params, provider)
+            result = await impl.acomplete(**params)
+            result.provider = result.provider or provider
+            return result
+
+        if self.retry is None:
+            return await attempt()
+        return await self.retry.acall(attempt, classify=impl.classify_error, on_retry=on_retry)
+
+    def _race(self, params: dict, on_retry=None):
+        """_call, raced against a hedge request when hedging is on"""
+        if self.hedge is None:
+            return self._call(params, on_retry=on_retry)
+        leg = self._hedge_leg(params)
+        return self.hedge.call(
+            lambda: self._call(params, on_retry=on_retry),
+            lambda: self._call(*leg, on_retry=on_retry),
+            key=params.get("model")
+        )
+
+    async def _arace(self, params: dict, on_retry=None):
+        if self.hedge is None:
+            return await self._acall(params, on_retry=on_retry)
+        leg = self._hedge_leg(params)
+        return await self.hedge.acall(
+            lambda: self._acall(params, on_retry=on_retry),
+            lambda: self._acall(*leg, on_retry=on_retry),
+            key=params.get("model")
+        )
+
+    def _finish(self, result: GenerationResult, params: dict, start: float) -> GenerationResult:
+        result.latency = time.perf_counter() - start
+        result.provider = result.provider or self.provider
+        result.model = result.model or params.get("model")
+        return result
+
+    def _dispatch(self, params: dict) -> GenerationResult:
+        """Non-streaming call with hedging, timed into self.metrics when set"""
+        start = time.perf_counter()
+        record = self._track(params)
+        if record is None:
+            return self._finish(self._race(params), params, start)
+        with record:
+            result = self._race(params, on_retry=record.retried)
+            record.set_usage(result.usage)
+        return self._finish(result, params, start)
+
+    async def _adispatch(self, params: dict) -> GenerationResult:
+        start = time.perf_counter()
+        record = self._track(params)
+        if record is None:
+            return self._finish(await self._arace(params), params, start)
+        with record:
+            result = await self._arace(params, on_retry=record.retried)
+            record.set_usage(result.usage)
+        return self._finish(result, params, start)
+
+    def _flight_key(self, params: dict):
+        return self.coalesce.key(self.provider, params) if self.coalesce is not None else None
+
+    def _shared_dispatch(self, params: dict) -> GenerationResult:
+        """_dispatch, joined with an identical call already in flight when coalescing is on"""
+        key = self._flight_key(params)
+        if key is None:
+            return self._dispatch(params)
+        return self.coalesce.call(key, lambda: self._dispatch(params))
+
+    async def _ashared_dispatch(self, params: dict) -> GenerationResult:
+        key = self._flight_key(params)
+        if key is None:
+            return await self._adispatch(params)
+        return await self.coalesce.acall(key, lambda: self._adispatch(params))
+
+    def _retry_stream(self, params: dict, impl=None, provider: str = None, on_retry=None):
+        impl = impl or self.impl
+
+        def attempt():
+            self._throttle(params, provider)
+            yield from impl.stream(**params)
+
+        if self.retry is None:
+            return attempt()
+        return self.retry.stream(attempt, classify=impl.classify_error, on_retry=on_retry)
+
+    def _aretry_stream(self, params: dict, impl=None, provider: str = None, on_retry=None):
+        impl = impl or self.impl
+
+        async def attempt():
+            await self._athrottle(params, provider)
+            async for chunk in impl.astream(**params):
+                yield chunk
+
+        if self.retry is None:
+            return attempt()
+        return self.retry.astream(attempt, classify=impl.classify_error, on_retry=on_retry)
+
+    def _open_stream(self, params: dict):
+        """Provider stream, retried (and hedged) only until the first chunk arrives, metered when metrics are on"""
+        record = self._track(params, stream=True)
+        on_retry = record.retried if record is not None else None
+        if self.hedge is None:
+            chunks = self._retry_stream(params, on_retry=on_retry)
+        else:
+            leg = self._hedge_leg(params)
+            chunks = self.hedge.stream(
+                lambda: self._retry_stream(params, on_retry=on_retry),
+                lambda: self._retry_stream(*leg, on_retry=on_retry),
+                key=params.get("model")
+            )
+        return chunks if record is None else self.metrics.meter(chunks, record)
+
+    def _aopen_stream(self, params: dict):
+        record = self._track(params, stream=True)
+        on_retry = record.retried if record is not None else None
+        if self.hedge is None:
+            chunks = self._aretry_stream(params, on_retry=on_retry)
+        else:
+            leg = self._hedge_leg(params)
+            chunks = self.hedge.astream(
+                lambda: self._aretry_stream(params, on_retry=on_retry),
+                lambda: self._aretry_stream(*leg, on_retry=on_retry),
+                key=params.get("model")
+            )
+        return chunks if record is None else self.metrics.ameter(chunks, record)
+
+    def _shared_stream(self, params: dict):
+        """_open_stream, or a replay of an identical stream in flight when coalescing is on"""
+        key = self._flight_key(params)
+        if key is None:
+            return self._open_stream(params)
+        return self.coalesce.stream(key, lambda: self._open_stream(params))
+
+    def _ashared_stream(self, params: dict):
+        key = self._flight_key(params)
+        if key is None:
+            return self._aopen_stream(params)
+        return self.coalesce.astream(key, lambda: self._aopen_stream(params))
+
+    def generate(
+        self,
+        model: str = None,
+        prompt: str = None,
+        user: str = None,
+        system: str = None,
+        messages: list[dict] = None,
+        temperature: float = None,
+        max_tokens: float = None,
+        top_p: float = None,
+        frequency_penalty: float = None,
+        presence_penalty: float = None,
+        stream: bool = False,
+        return_result: bool = False,
+        **kwargs
+    ):
+        """
+        Returns the generated text, or a GenerationResult (text, token counts,
+        finish reason, response id, latency/TTFT) with return_result=True.
+        model can be left out in router mode, each backend then uses its entry in models.
+        """
+        params = self._build_params(
+            model, prompt, user, system, messages, temperature, max_tokens,
+            top_p, frequency_penalty, presence_penalty, stream, **kwargs
+        )
+
+        if params.pop("stream"):
+            if not return_result:
+                return self.impl._print_stream(self._shared_stream(params))
+            result = GenerationResult(provider=self.provider, model=params.get("model"))
+            result.text = self.impl._print_stream(result.collect(self._shared_stream(params)))
+            return result
+
+        key = self._cache_key(params)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._cache_hit(params)
+                return self._cached_result(cached, params) if return_result else cached
+
+        semantic = self._semantic_split(params)
+        if semantic is not None:
+            cached, vector = self.semantic_cache.lookup(*semantic)
+            if cached is not None:
+                self._cache_hit(params)
+                return self._cached_result(cached, params) if return_result else cached
+
+        # Pass everything to the provider
+        result = self._shared_dispatch(params)
+        if key is not None and result.text:
+            self.cache.set(key, result.text)
+        if semantic is not None:
+            self.semantic_cache.add(semantic[0], vector, result.text)
+        return result if return_result else result.text
+
+    async def agenerate(
+        self,
+        model: str = None,
+        prompt: str = None,
+        user: str = None,
+        system: str = None,
+        messages: list[dict] = None,
+        temperature: float = None,
+        max_tokens: float = None,
+        top_p: float = None,
+        frequency_penalty: float = None,
+        presence_penalty: float = None,
+        stream: bool = False,
+        return_result: bool = False,
+        **kwargs
+    ):
+        """Async twin of generate, uses the provider's native async client"""
+        params = self._build_params(
+            model, prompt, user, system, messages, temperature, max_tokens,
+            top_p, frequency_penalty, presence_penalty, stream, **kwargs
+        )
+        if params.pop("stream"):
+            if not return_result:
+                return await self.impl._aprint_stream(self._ashared_stream(params))
+            result = GenerationResult(provider=self.provider, model=params.get("model"))
+            result.text = await self.impl._aprint_stream(result.acollect(self._ashared_stream(params)))
+            return result
+
+        key = self._cache_key(params)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._cache_hit(params)
+                return self._cached_result(cached, params) if return_result else cached
+
+        semantic = self._semantic_split(params)
+        if semantic is not None:
+            cached, vector = await self.semantic_cache.alookup(*semantic)
+            if cached is not None:
+                self._cache_hit(params)
+                return self._cached_result(cached, params) if return_result else cached
+
+        result = await self._ashared_dispatch(params)
+        if key is not None and result.text:
+            self.cache.set(key, result.text)
+        if semantic is not None:
+            self.semantic_cache.add(semantic[0], vector, result.text)
+        return result if return_result else result.text
+
+    def stream(
+        self,
+        model: str = None,
+        prompt: str = None,
+        user: str = None,
+        system: str = None,
+        messages: list[dict] = None,
+        temperature: float = None,
+        max_tokens: float = None,
+        top_p: float = None,
+        frequency_penalty: float = None,
+        presence_penalty: float = None,
+        **kwargs
+    ):
+        """
+        Yield StreamChunk objects (text, finish_reason, usage) as the provider sends them.
+        Nothing is written to stdout, pipe the chunks wherever you want.
+        """
+        params = self._build_params(
+            model, prompt, user, system, messages, temperature, max_tokens,
+            top_p, frequency_penalty, presence_penalty, **kwargs
+        )
+        params.pop("stream")
+        return self._shared_stream(params)
+
+    def astream(
+        self,
+        model: str = None,
+        prompt: str = None,
+        user: str = None,
+        system: str = None,
+        messages: list[dict] = None,
+        temperature: float = None,
+        max_tokens: float = None,
+        top_p: float = None,
+        frequency_penalty: float = None,
+        presence_penalty: float = None,
+        **kwargs
+    ):
+        """Async iterator version of stream, use with `async for`"""
+        params = self._build_params(
+            model, prompt, user, system, messages, temperature, max_tokens,
+            top_p, frequency_penalty, presence_penalty, **kwargs
+        )
+        params.pop("stream")
+        return self._ashared_stream(params)
+
+    def chat(self, conversation: Conversation, content: str, model: str = None, **kwargs):
+        """Add a user turn to the conversation, generate a reply and add that too"""
+        state = conversation.checkpoint()
+        conversation.user(content)
+        try:
+            result = self.generate(model=model, messages=conversation, **kwargs)
+        except BaseException:
+            # a failed turn leaves the conversation as it was, turns trimmed for it included
+            conversation.rollback(state)
+            raise
+        conversation.assistant(result.text if isinstance(result, GenerationResult) else result)
+        return result
+
+    async def achat(self, conversation: Conversation, content: str, model: str = None, **kwargs):
+        state = conversation.checkpoint()
+        conversation.user(content)
+        try:
+            result = await self.agenerate(model=model, messages=conversation, **kwargs)
+        except BaseException:
+            conversation.rollback(state)
+            raise
+        conversation.assistant(result.text if isinstance(result, GenerationResult) else result)
+        return result
 
-        # Pass everything to the provider's generate
-        return self.impl.generate(**params)
+    def preload(self, model: str, **kwargs) -> bool:
+        """Load a local model ahead of the first call (Ollama), False where there is nothing to warm up"""
+        preload = getattr(self.impl, "preload", None)
+        if preload is None:
+            log.debug(f"{self.provider} has no preload, skipping")
+            return False
+        return preload(model, **kwargs)
+
+    async def apreload(self, model: str, **kwargs) -> bool:
+        apreload = getattr(self.impl, "apreload", None)
+        if apreload is None:
+            log.debug(f"{self.provider} has no preload, skipping")
+            return False
+        return await apreload(model, **kwargs)
+
+    def health(self) -> dict:
+        """Per-provider health stats in router mode, empty for a single provider"""
+        stats = getattr(self.impl, "stats", None)
+        return stats() if callable(stats) else {}
+
+    @staticmethod
+    def _batch_requests(requests: list, defaults: dict) -> list[dict]:
+        # plain strings are treated as prompts, shared kwargs are filled in per request
+        batch = []
+        for req in requests:
+            if isinstance(req, str):
+                req = {"prompt": req}
+            batch.append({**defaults, **req})
+        return batch
+
+    def generate_batch(self, requests: list, max_concurrency: int = 8, **defaults) -> BatchReport:
+        """
+        Run many generate calls concurrently on a thread pool.
+        Results keep input order and failed items carry their exception instead of aborting the batch.
+        """
+        report = run_batch(self.generate, self._batch_requests(requests, defaults), max_concurrency)
+        log.info(f"Batch done: {report}")
+        return report
+
+    async def agenerate_batch(self, requests: list, max_concurrency: int = 8, **defaults) -> BatchReport:
+        """Async version of generate_batch, bounded by a semaphore instead of threads"""
+        report = await arun_batch(self.agenerate, self._batch_requests(requests, defaults), max_concurrency)
+        log.info(f"Batch done: {report}")
+        return report
+
+    def _batch_api(self, name: str):
+        method = getattr(self.impl, name, None)
+        if method is None:
+            raise NotImplementedError(f"{self.provider} has no offline batch API")
+        return method
+
+    def _batch_job(self, job) -> BatchJob:
+        # a BatchJob, its to_dict(), or provider batch id(s) saved from an earlier run
+        if isinstance(job, BatchJob):
+            return job
+        if isinstance(job, dict):
+            return BatchJob.from_dict(job)
+        return BatchJob(self.provider, [job] if isinstance(job, str) else job)
+
+    def submit_batch(self, requests: list, ids: list = None, **defaults) -> BatchJob:
+        """
+        Queue requests on the provider's offline batch API (cheaper, finishes within the completion window).
+        requests take the same kwargs as generate, plain strings are prompts, shared kwargs fill them in.
+        ids: custom ids to key the results by, defaults to the request's position ("0", "1", ...).
+        Provider options (the provider's BATCH_OPTIONS, e.g. completion_window or metadata) go in defaults too.
+        """
+        submit = self._batch_api("submit_batch")
+        options = {key: defaults.pop(key) for key in self.impl.BATCH_OPTIONS if key in defaults}
+        batch = self._batch_requests(requests, defaults)
+        ids = [str(i) for i in ids] if ids is not None else [str(i) for i in range(len(batch))]
+        if len(ids) != len(batch) or len(set(ids)) != len(ids):
+            raise ValueError("Batch ids must be unique and one per request")
+
+        items = []
+        for custom_id, request in zip(ids, batch):
+            params = self._build_params(**request)
+            params.pop("stream")
+            items.append((custom_id, params))
+        job = BatchJob(self.provider, submit(items, **options), total=len(items))
+        log.info(f"Batch submitted: {job}")
+        return job
+
+    def batch_status(self, job) -> BatchJob:
+        """Refresh and return the job's status without waiting"""
+        job = self._batch_job(job)
+        status = self._batch_api("batch_status")
+        for batch_id in job.ids:
+            job.update(status(batch_id))
+        return job
+
+    def cancel_batch(self, job):
+        job = self._batch_job(job)
+        cancel = self._batch_api("cancel_batch")
+        for batch_id in job.ids:
+            cancel(batch_id)
+
+    def collect_batch(
+        self,
+        job,
+        poll_interval: float = BATCH_POLL_INTERVAL,
+        max_interval: float = BATCH_MAX_POLL_INTERVAL,
+        timeout: float = None,
+    ):
+        """
+        Wait for a submitted batch and yield (custom_id, GenerationResult or exception) pairs.
+        Results of each part are streamed as soon as it finishes, polling backs off from
+        poll_interval to max_interval. Raises TimeoutError after timeout seconds.
+        A part whose results can't be read is logged and skipped, see job.statuses[id]["error"].
+        """
+        job = self._batch_job(job)
+        status = self._batch_api("batch_status")
+        results = self._batch_api("batch_results")
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        pending = list(job.ids)
+        delay = poll_interval
+
+        while pending:
+            for batch_id in list(pending):
+                job.update(status(batch_id))
+                if job.statuses[batch_id]["status"] not in BATCH_DONE:
+                    continue
+                pending.remove(batch_id)
+                log.debug(f"batch {batch_id} is {job.statuses[batch_id]['status']}, reading results")
+                try:
+                    for custom_id, result in results(batch_id):
+                        if isinstance(result, GenerationResult):
+                            result.provider = result.provider or self.provider
+                        yield custom_id, result
+                except Exception as e:
+                    # one unreadable part shouldn't lose the others, the error is kept on its status
+                    log.error(f"reading results of batch {batch_id} failed: {e}")
+                    job.statuses[batch_id]["error"] = str(e)
+                delay = poll_interval
+            if not pending:
+                break
+            if deadline is not None and time.monotonic() + delay > deadline:
+                raise TimeoutError(f"Batch still running after {timeout}s: {job}")
+            log.debug(f"waiting {delay:.0f}s for {len(pending)} batches: {job}")
+            time.sleep(delay)
+            delay = min(delay * 2, max_interval)
 
     @staticmethod
     def available_models_api(provider: str, **kwargs):
         provider = provider.lower()
 
         if provider == "anthropic":
-            instance = AnthropicProvider(**kwargs)
+            instance = get_provider(provider, **kwargs)
             models = instance.list_models()
             log.info("\n Anthropic Models:\n")
             for i, m in enumerate(models, 1):
@@ -92,11 +676,11 @@ class Wrapper:
             return models
 
         elif provider == "azure":
-            instance = AzureProvider(**kwargs)
+            instance = get_provider(provider, **kwargs)
             return instance.list_models()
 
         elif provider == "openai":
-            instance = OpenAIProvider(**kwargs)
+            instance = get_provider(provider, **kwargs)
             models = instance.list_models()
             groups = defaultdict(list)
             for m in models:
@@ -119,11 +703,11 @@ class Wrapper:
             return models
         
         elif provider == "ollama":
-            instance = OllamaProvider(**kwargs)
+            instance = get_provider(provider, **kwargs)
             return instance.list_models()
         
         elif provider == "groq":  
-            instance = GroqProvider(**kwargs)
+            instance = get_provider(provider, **kwargs)
             models = instance.list_models()
             log.info("\n Groq Models:\n")
             for i, m in enumerate(models, 1):
@@ -131,7 +715,7 @@ class Wrapper:
             return models
 
         elif provider == "bedrock":
-            instance = BedrockProvider(**kwargs)
+            instance = get_provider(provider, **kwargs)
             models = instance.list_models() or []
             log.info("\n Bedrock Models:\n")
             for i, m in enumerate(models, 1):
@@ -142,11 +726,160 @@ class Wrapper:
         return []
 
 class WrapperEmbed:
-    # TODO
-    def __init__(self, provider:str, **kwargs):
+    def __init__(
+        self,
+        provider: str,
+        model: str = None,
+        cache: EmbeddingCache = None,
+        batch_size: int = None,
+        max_concurrency: int = EMBED_MAX_CONCURRENCY,
+        retry: RetryPolicy = None,
+        reuse: bool = True,
+        **kwargs
+    ):
+        """
+        provider: ollama, openai, azure or bedrock
+        model: embedding model (the deployment name on Azure), defaults to the provider's usual one
+        cache: EmbeddingCache that keeps vectors on disk across runs, True for ~/.wrapper/embeddings.db
+        batch_size: inputs per request, defaults to the provider's limit
+        max_concurrency: batch requests in flight at once
+        retry: RetryPolicy for 429s/5xx/connection errors, True for the defaults
+        """
         provider = provider.lower()
-        
-        if provider == "ollama":
-            self.impl = OllamaProvider(**kwargs)
+        if load_provider_class(provider).embed is BaseLLM.embed:
+            raise ValueError(f"Embedding provider {provider} not supported yet")
+        self.retry = RetryPolicy() if retry is True else retry
+        if self.retry is not None:
+            kwargs = _sdk_retries_off(provider, kwargs)
+        self.impl = get_provider(provider, **kwargs) if reuse else create_provider(provider, **kwargs)
+        self.provider = provider
+        self.model = model or self.impl.DEFAULT_EMBED_MODEL
+        self.cache = EmbeddingCache() if cache is True else cache
+        self.batch_size = batch_size
+        self.max_concurrency = max(1, max_concurrency)
+
+    def _prepare(self, texts: list, model: str, kwargs: dict) -> tuple:
+        """Dedupe the inputs and look them up in the cache"""
+        np = require_numpy()
+        model = model or self.model
+        if not model:
+            raise ValueError(f"No embedding model given and {self.provider} has no default")
+
+        index = {}
+        for text in texts:
+            if not isinstance(text, str):
+                raise ValueError("Embedding inputs must be strings")
+            index.setdefault(text, len(index))
+        unique = list(index)
+        inverse = None if len(unique) == len(texts) else np.fromiter((index[t] for t in texts), dtype=np.intp, count=len(texts))
+
+        keys, cached = None, {}
+        if self.cache is not None:
+            namespace = make_cache_key(self.provider, {"model": model, **kwargs})
+            keys = [EmbeddingCache.key(namespace, text) for text in unique]
+            found = self.cache.get_many(keys)
+            for i, key in enumerate(keys):
+                raw = found.get(key)
+                if raw is not None:
+                    cached[i] = np.frombuffer(raw, dtype=np.float32)
+        return model, unique, inverse, keys, cached
+
+    def _batches(self, unique: list, cached: dict, model: str) -> list:
+        """Indices of the texts still to embed, split by the provider's input and size limits"""
+        size = self.batch_size or self.impl.embed_batch_size(model)
+        batches, current, chars = [], [], 0
+        for i, text in enumerate(unique):
+            if i in cached:
+                continue
+            if current and (len(current) >= size or chars + len(text) > EMBED_MAX_BATCH_CHARS):
+                batches.append(current)
+                current, chars = [], 0
+            current.append(i)
+            chars += len(text)
+        if current:
+            batches.append(current)
+        return batches
+
+    def _assemble(self, unique: list, inverse, keys: list, cached: dict, batches: list, results: list, normalize: bool):
+        np = require_numpy()
+        dims = {len(vector) for vector in cached.values()} | {result.shape[1] for result in results}
+        if len(dims) > 1:
+            raise RuntimeError(f"Embeddings of different sizes came back: {sorted(dims)}")
+        matrix = np.empty((len(unique), dims.pop() if dims else 0), dtype=np.float32)
+        for i, vector in cached.items():
+            matrix[i] = vector
+
+        writes = []
+        for batch, result in zip(batches, results):
+            if len(result) != len(batch):
+                raise RuntimeError(f"{self.provider} returned {len(result)} embeddings for {len(batch)} inputs")
+            matrix[batch] = result
+            if keys is not None:
+                writes.extend((keys[i], row.tobytes()) for i, row in zip(batch, matrix[batch]))
+        if writes:
+            self.cache.set_many(writes)
+
+        # the cache keeps raw vectors, normalizing happens on the way out
+        if normalize:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix /= norms
+        return matrix if inverse is None else matrix[inverse]
+
+    def _call(self, texts: list, model: str, kwargs: dict):
+        attempt = lambda: self.impl.embed(texts, model, **kwargs)
+        if self.retry is None:
+            return attempt()
+        return self.retry.call(attempt, classify=self.impl.classify_error)
+
+    async def _acall(self, texts: list, model: str, kwargs: dict):
+        attempt = lambda: self.impl.aembed(texts, model, **kwargs)
+        if self.retry is None:
+            return await attempt()
+        return await self.retry.acall(attempt, classify=self.impl.classify_error)
+
+    def embed(self, texts, model: str = None, normalize: bool = False, **kwargs):
+        """
+        float32 matrix with one row per text, or one vector for a single string.
+        Repeated texts are embedded once and cached ones are not sent at all.
+        normalize: scale rows to unit length so a dot product is the cosine similarity
+        """
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        model, unique, inverse, keys, cached = self._prepare(texts, model, kwargs)
+        batches = self._batches(unique, cached, model)
+
+        def run(batch):
+            return self._call([unique[i] for i in batch], model, kwargs)
+
+        if len(batches) > 1 and self.max_concurrency > 1:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches)), thread_name_prefix="wrapper-embed") as pool:
+                results = list(pool.map(run, batches))
         else:
-            raise ValueError(f"Embedding provider {provider} not supported yet")
\ No newline at end of file
+            results = [run(batch) for batch in batches]
+        log.debug(f"embedded {len(texts)} texts: {len(unique)} unique, {len(cached)} cached, {len(batches)} requests")
+
+        matrix = self._assemble(unique, inverse, keys, cached, batches, results, normalize)
+        return matrix[0] if single else matrix
+
+    async def aembed(self, texts, model: str = None, normalize: bool = False, **kwargs):
+        """Async version of embed, batches run concurrently on the event loop"""
+        import asyncio
+
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        model, unique, inverse, keys, cached = self._prepare(texts, model, kwargs)
+        batches = self._batches(unique, cached, model)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(batch):
+            async with semaphore:
+                return await self._acall([unique[i] for i in batch], model, kwargs)
+
+        results = await asyncio.gather(*(run(batch) for batch in batches))
+        log.debug(f"embedded {len(texts)} texts: {len(unique)} unique, {len(cached)} cached, {len(batches)} requests")
+
+        matrix = self._assemble(unique, inverse, keys, cached, batches, results, normalize)
+        return matrix[0] if single else matrix
@@ -0,0 +1,259 @@
+import time
+import threading
+from collections import deque
+from wrapper.utils import ColorLogger
+from wrapper.config import SHOW_LOGS, HEDGE_MAX_WORKERS
+
+log = ColorLogger(enable_debug=SHOW_LOGS)
+
+# marks an empty stream when racing for the first chunk
+_END = object()
+
+
+def _close_when_idle(gen):
+    # a generator can't be closed while another thread is inside next(), so wait for it to return
+    return lambda _future: gen.close()
+
+
+class HedgePolicy:
+    """
+    Fire a duplicate request when the first one is slower than usual and keep whichever answers first.
+
+    delay:       seconds to wait before hedging, also used until enough samples were collected
+    percentile:  learn the delay from observed latencies instead, e.g. 0.95 only hedges the slowest 5%
+    min_samples / window: samples needed before the learned delay is trusted, and how many are kept
+    provider / model: send the hedge to another provider (and model) instead of repeating the same call
+
+    For streams the race is for the first chunk, after that the winner is committed.
+    Async losers are cancelled, sync losers can't be interrupted so their result is dropped.
+    """
+
+    def __init__(
+        self,
+        delay: float = 1.0,
+        percentile: float = None,
+        min_samples: int = 20,
+        window: int = 500,
+        provider: str = None,
+        model: str = None,
+    ):
+        if percentile is not None and not 0 < percentile < 1:
+            raise ValueError("percentile must be between 0 and 1, e.g. 0.95")
+        self.delay = delay
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.window = window
+        self.provider = provider.lower() if provider else None
+        self.model = model
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _pool(self):
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS, thread_name_prefix="wrapper-hedge")
+        return self._executor
+
+    def observe(self, key, latency: float):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(latency)
+
+    def delay_for(self, key) -> float:
+        """Seconds to wait before hedging, the learned percentile once there are enough samples"""
+        if self.percentile is None:
+            return self.delay
+        samples = self._samples.get(key)
+        if samples is None or len(samples) < self.min_samples:
+            return self.delay
+        ordered = sorted(samples)
+        return ordered[int(self.percentile * (len(ordered) - 1))]
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "delays": {f"{kind}:{key}": self.delay_for((kind, key)) for kind, key in list(self._samples)},
+        }
+
+    def _hedging(self, key):
+        self._count("hedged")
+        log.debug(f"hedge: {key[1]} slower than {self.delay_for(key):.2f}s, sending a second request")
+
+    def call(self, primary, backup, key=None):
+        """Run primary(), start backup() if it hasn't finished after the hedge delay, return the first success"""
+        from concurrent.futures import wait, FIRST_COMPLETED, TimeoutError as FutureTimeout
+
+        key = ("call", key)
+        self._count("calls")
+        start = time.perf_counter()
+        first = self._pool().submit(primary)
+        try:
+            result = first.result(timeout=self.delay_for(key))
+        except FutureTimeout:
+            pass
+        else:
+            self.observe(key, time.perf_counter() - start)
+            return result
+
+        self._hedging(key)
+        second = self._pool().submit(backup)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                for loser in pending:
+                    loser.cancel()
+                if future is second:
+                    self._count("hedge_wins")
+                self.observe(key, time.perf_counter() - start)
+                return future.result()
+        raise error
+
+    async def acall(self, aprimary, abackup, key=None):
+        import asyncio
+
+        key = ("call", key)
+        self._count("calls")
+        start = time.perf_counter()
+        first = asyncio.ensure_future(aprimary())
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.delay_for(key))
+            if done:
+                self.observe(key, time.perf_counter() - start)
+                return first.result()
+
+            self._hedging(key)
+            second = asyncio.ensure_future(abackup())
+            tasks.append(second)
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if task is second:
+                        self._count("hedge_wins")
+                    self.observe(key, time.perf_counter() - start)
+                    return task.result()
+            raise error
+        finally:
+            # the loser (or both, if the caller was cancelled) stops here
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stream(self, make_primary, make_backup, key=None):
+        """Race two streams for the first chunk, then keep yielding from the winner only"""
+        from concurrent.futures import wait, FIRST_COMPLETED
+
+        key = ("stream", key)
+        self._count("calls")
+        start = time.perf_counter()
+        pool = self._pool()
+        primary = make_primary()
+        legs = {pool.submit(next, primary, _END): primary}
+        done, _ = wait(legs, timeout=self.delay_for(key))
+        if not done:
+            self._hedging(key)
+            backup = make_backup()
+            legs[pool.submit(next, backup, _END)] = backup
+
+        winner, first, error = None, None, None
+        pending = set(legs)
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                winner, first = future, future.result()
+                break
+        if winner is None:
+            raise error
+
+        for future, gen in legs.items():
+            if future is not winner:
+                future.add_done_callback(_close_when_idle(gen))
+        if legs[winner] is not primary:
+            self._count("hedge_wins")
+        self.observe(key, time.perf_counter() - start)
+
+        if first is _END:
+            return
+        yield first
+        yield from legs[winner]
+
+    async def astream(self, make_primary, make_backup, key=None):
+        import asyncio
+
+        async def first_chunk(gen):
+            try:
+                return await gen.__anext__()
+            except StopAsyncIteration:
+                return _END
+
+        key = ("stream", key)
+        self._count("calls")
+        start = time.perf_counter()
+        primary = make_primary()
+        legs = {asyncio.ensure_future(first_chunk(primary)): primary}
+        winner, first = None, None
+        try:
+            done, _ = await asyncio.wait(legs, timeout=self.delay_for(key))
+            if not done:
+                self._hedging(key)
+                backup = make_backup()
+                legs[asyncio.ensure_future(first_chunk(backup))] = backup
+
+            pending = set(legs)
+            error = None
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    winner, first = task, task.result()
+                    break
+            if winner is None:
+                raise error
+        finally:
+            for task, gen in legs.items():
+                if task is winner:
+                    continue
+                if not task.done():
+                    task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                await gen.aclose()
+
+        if legs[winner] is not primary:
+            self._count("hedge_wins")
+        self.observe(key, time.perf_counter() - start)
+
+        if first is _END:
+            return
+        yield first
+        async for chunk in legs[winner]:
+            yield chunk
@@ -0,0 +1,281 @@
+import time
+import threading
+from collections import deque
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+THROUGHPUT_BUCKETS = (1, 5, 10, 25, 50, 100, 200, 500, 1000)
+
+
+class CallRecord:
+    """Timings and usage of one call, filled in by the core dispatch and handed to Metrics"""
+    __slots__ = (
+        "provider", "model", "stream", "started", "latency", "ttft",
+        "prompt_tokens", "completion_tokens", "cache_read_tokens", "cache_write_tokens",
+        "retries", "error", "cached", "_sink",
+    )
+
+    def __init__(self, provider: str, model: str, stream: bool = False, sink=None):
+        self.provider = provider
+        self.model = model
+        self.stream = stream
+        self.started = time.perf_counter()
+        self.latency = None
+        self.ttft = None
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.cache_read_tokens = None
+        self.cache_write_tokens = None
+        self.retries = 0
+        self.error = None
+        self.cached = False
+        self._sink = sink
+
+    def retried(self, attempt: int, error: Exception):
+        """on_retry hook for RetryPolicy"""
+        self.retries += 1
+
+    def first_token(self):
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.started
+
+    def set_usage(self, usage: dict):
+        if usage:
+            self.prompt_tokens = usage.get("prompt_tokens", self.prompt_tokens)
+            self.completion_tokens = usage.get("completion_tokens", self.completion_tokens)
+            self.cache_read_tokens = usage.get("cache_read_tokens", self.cache_read_tokens)
+            self.cache_write_tokens = usage.get("cache_write_tokens", self.cache_write_tokens)
+
+    def finish(self, error: Exception = None):
+        self.latency = time.perf_counter() - self.started
+        self.error = error
+        if self._sink is not None:
+            self._sink.record(self)
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Completion tokens over generation time (after the first token for streams)"""
+        if not self.completion_tokens or self.latency is None:
+            return None
+        elapsed = self.latency - (self.ttft or 0.0) if self.stream else self.latency
+        return self.completion_tokens / elapsed if elapsed > 0 else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish(exc)
+        return False
+
+    def __repr__(self):
+        ttft = f"{self.ttft:.3f}s" if self.ttft is not None else None
+        latency = f"{self.latency:.3f}s" if self.latency is not None else None
+        return (
+            f"CallRecord({self.provider}/{self.model}, latency={latency}, ttft={ttft}, "
+            f"tokens={self.prompt_tokens}/{self.completion_tokens}, retries={self.retries})"
+        )
+
+
+class Histogram:
+    """Cumulative buckets for Prometheus plus a window of recent values for percentiles"""
+
+    def __init__(self, buckets: tuple, window: int = 1000):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        self.recent.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def percentile(self, p: float) -> float:
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[int(p * (len(ordered) - 1))]
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": self.max if self.count else None,
+        }
+
+
+class _Series:
+    """Everything tracked for one provider + model"""
+
+    def __init__(self, window: int):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cache_read_tokens = 0
+        self.cache_write_tokens = 0
+        self.latency = Histogram(LATENCY_BUCKETS, window)
+        self.ttft = Histogram(LATENCY_BUCKETS, window)
+        self.tokens_per_second = Histogram(THROUGHPUT_BUCKETS, window)
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """
+    In-process latency/usage metrics per provider and model.
+
+    callbacks: functions called with every finished CallRecord, e.g. to ship them to your own backend
+    window:    recent values kept per histogram for the p50/p95/p99 in snapshot()
+    """
+
+    def __init__(self, callbacks: list = None, window: int = 1000):
+        self.callbacks = list(callbacks or [])
+        self.window = window
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def add_callback(self, fn):
+        self.callbacks.append(fn)
+
+    def track(self, provider: str, model: str, stream: bool = False) -> CallRecord:
+        return CallRecord(provider, model, stream, sink=self)
+
+    def record(self, rec: CallRecord):
+        key = (rec.provider, rec.model)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(self.window)
+            if rec.cached:
+                series.cache_hits += 1
+            else:
+                series.calls += 1
+                series.retries += rec.retries
+                if rec.error is not None:
+                    series.errors += 1
+                else:
+                    series.latency.observe(rec.latency)
+                    if rec.ttft is not None:
+                        series.ttft.observe(rec.ttft)
+                    series.prompt_tokens += rec.prompt_tokens or 0
+                    series.completion_tokens += rec.completion_tokens or 0
+                    series.cache_read_tokens += rec.cache_read_tokens or 0
+                    series.cache_write_tokens += rec.cache_write_tokens or 0
+                    tps = rec.tokens_per_second
+                    if tps is not None:
+                        series.tokens_per_second.observe(tps)
+        for fn in self.callbacks:
+            fn(rec)
+
+    def meter(self, chunks, rec: CallRecord, restart: bool = True):
+        """
+        Pass a StreamChunk iterator through, noting the first token, usage and the end of the stream.
+        restart=False keeps rec's clock, for a stream whose first chunk was already waited for.
+        """
+        error = None
+        # the clock starts when iteration does, not when the generator was created
+        if restart:
+            rec.started = time.perf_counter()
+        try:
+            for chunk in chunks:
+                if chunk.text:
+                    rec.first_token()
+                rec.set_usage(chunk.usage)
+                yield chunk
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # also runs when the consumer stops early
+            rec.finish(error)
+
+    async def ameter(self, chunks, rec: CallRecord, restart: bool = True):
+        error = None
+        if restart:
+            rec.started = time.perf_counter()
+        try:
+            async for chunk in chunks:
+                if chunk.text:
+                    rec.first_token()
+                rec.set_usage(chunk.usage)
+                yield chunk
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            rec.finish(error)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self) -> dict:
+        """Counters and latency/TTFT/tokens-per-second summaries keyed by "provider:model" """
+        with self._lock:
+            return {
+                f"{provider}:{model}": {
+                    "calls": s.calls,
+                    "errors": s.errors,
+                    "retries": s.retries,
+                    "cache_hits": s.cache_hits,
+                    "prompt_tokens": s.prompt_tokens,
+                    "completion_tokens": s.completion_tokens,
+                    "cache_read_tokens": s.cache_read_tokens,
+                    "cache_write_tokens": s.cache_write_tokens,
+                    "latency": s.latency.snapshot(),
+                    "ttft": s.ttft.snapshot(),
+                    "tokens_per_second": s.tokens_per_second.snapshot(),
+                }
+                for (provider, model), s in self._series.items()
+            }
+
+    def to_prometheus(self, prefix: str = "wrapper") -> str:
+        """Prometheus text exposition format, serve it from your /metrics endpoint"""
+        counters = (
+            ("requests_total", "calls", "Provider calls"),
+            ("errors_total", "errors", "Provider calls that failed"),
+            ("retries_total", "retries", "Retried attempts"),
+            ("cache_hits_total", "cache_hits", "Calls answered from the response cache"),
+            ("prompt_tokens_total", "prompt_tokens", "Prompt tokens reported by providers"),
+            ("completion_tokens_total", "completion_tokens", "Completion tokens reported by providers"),
+            ("cache_read_tokens_total", "cache_read_tokens", "Prompt tokens read from the provider's prompt cache"),
+            ("cache_write_tokens_total", "cache_write_tokens", "Prompt tokens written to the provider's prompt cache"),
+        )
+        histograms = (
+            ("request_latency_seconds", "latency", "End to end call latency"),
+            ("time_to_first_token_seconds", "ttft", "Time to first streamed token"),
+            ("tokens_per_second", "tokens_per_second", "Completion tokens per second"),
+        )
+        lines = []
+        with self._lock:
+            series = list(self._series.items())
+            for name, field, help_text in counters:
+                lines.append(f"# HELP {prefix}_{name} {help_text}")
+                lines.append(f"# TYPE {prefix}_{name} counter")
+                for (provider, model), s in series:
+                    lines.append(f'{prefix}_{name}{{provider="{_label(provider)}",model="{_label(model)}"}} {getattr(s, field)}')
+            for name, field, help_text in histograms:
+                lines.append(f"# HELP {prefix}_{name} {help_text}")
+                lines.append(f"# TYPE {prefix}_{name} histogram")
+                for (provider, model), s in series:
+                    hist = getattr(s, field)
+                    labels = f'provider="{_label(provider)}",model="{_label(model)}"'
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        lines.append(f'{prefix}_{name}_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f'{prefix}_{name}_bucket{{{labels},le="+Inf"}} {hist.count}')
+                    lines.append(f"{prefix}_{name}_sum{{{labels}}} {hist.sum}")
+                    lines.append(f"{prefix}_{name}_count{{{labels}}} {hist.count}")
+        return "\n".join(lines) + "\n"
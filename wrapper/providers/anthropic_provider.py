@@ -1,39 +1,108 @@
-import sys
-import re
+import json
 import requests
-from anthropic import Anthropic, AuthenticationError, APITimeoutError, APIError
+from anthropic import Anthropic, AsyncAnthropic, AuthenticationError, APITimeoutError, APIError
 from wrapper.base import BaseLLM
-from wrapper.utils import get_or_request_key, ColorLogger
+from wrapper.types import StreamChunk, GenerationResult, anthropic_usage
+from wrapper.session import get_session
+from wrapper.utils import get_or_request_key, sanitize_text, sanitize_messages, split_system, mark_cacheable, ColorLogger
 from wrapper.config import *
 
 log = ColorLogger(enable_debug=SHOW_LOGS)
 
 class AnthropicProvider(BaseLLM):
-    def __init__(self):
+    # Message Batches limits per batch, bigger jobs are split
+    BATCH_MAX_REQUESTS = 100_000
+    BATCH_MAX_BYTES = 256 * 1024 * 1024
+    SDK_RETRIES = True
+
+    def __init__(self, prompt_cache=None, max_retries: int = None):
+        """
+        prompt_cache: True (or a TTL like "1h") marks the system prompt and the conversation so far as
+            cacheable, repeated prefixes are then billed and processed as cache reads. Can also be passed per call.
+        max_retries: retries done by the Anthropic client itself, None keeps the SDK default.
+        """
         # Auto fetch API key from env or ask user
         self.api_key = get_or_request_key("ANTHROPIC_API_KEY", "Please enter your Anthropic API Key")
-        self.client = Anthropic(api_key=self.api_key, timeout=30.0)  # Added timeout
+        self.client_options = {} if max_retries is None else {"max_retries": max_retries}
+        self.client = Anthropic(api_key=self.api_key, timeout=30.0, **self.client_options)  # Added timeout
         self.default_system_prompt = "You are a helpful AI assistant."
+        self.session = get_session("anthropic")
         self.base_url = "https://api.anthropic.com/v1"
+        self.prompt_cache = PROMPT_CACHE if prompt_cache is None else prompt_cache
+
+    @property
+    def async_client(self) -> AsyncAnthropic:
+        # one client per event loop, created on first async call so sync-only users never pay for it
+        return self._loop_client(lambda: AsyncAnthropic(api_key=self.api_key, timeout=30.0, **self.client_options))
+
+    def _prepare_messages(self, model: str, prompt: str = None, messages: list[dict] = None, prompt_cache=None) -> tuple:
+        """Validate, sanitize and split the conversation into (system, messages), with cache breakpoints if asked"""
+        if not model or not isinstance(model, str):
+            raise ValueError("Model name must be a non-empty string")
 
-    def _sanitize_input(self, text: str) -> str:
-        """Sanitize user input to prevent potential issues"""
-        if not isinstance(text, str):
-            return str(text)
-        # Remove potentially harmful characters while preserving functionality
-        sanitized = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)
-        return sanitized.strip()
-
-    def _validate_messages(self, messages: list) -> bool:
-        """Validate message structure"""
-        if not isinstance(messages, list):
-            return False
-        for msg in messages:
-            if not isinstance(msg, dict) or 'role' not in msg or 'content' not in msg:
-                return False
-            if msg['role'] not in ['system', 'user', 'assistant']:
-                return False
-        return True
+        if prompt:
+            prompt = sanitize_text(prompt)
+
+        if messages:
+            # shared fast path: clean messages are not copied, CleanMessages only scans new turns
+            final_messages = sanitize_messages(messages)
+        else:
+            system_default = {"role": "system", "content": self.default_system_prompt}
+            user_msg = {"role": "user", "content": prompt or "Hello"}
+            final_messages = [system_default, user_msg]
+
+        # cached per CleanMessages/Conversation, so only new turns are split
+        system_content, user_messages = split_system(final_messages)
+        system_content = system_content or self.default_system_prompt
+        if prompt_cache is None:
+            prompt_cache = self.prompt_cache
+        if prompt_cache:
+            ttl = prompt_cache if isinstance(prompt_cache, str) else None
+            return mark_cacheable(system_content, user_messages, ttl)
+        return system_content, user_messages
+
+    def _handle_error(self, e: Exception):
+        """Map SDK exceptions to RuntimeError with a readable message"""
+        if isinstance(e, AuthenticationError):
+            log.error(f"Authentication failed: {str(e)}")
+            raise RuntimeError("Invalid API key. Please check .env file.") from e
+        if isinstance(e, APITimeoutError):
+            log.error(f"API request timed out: {str(e)}")
+            raise RuntimeError("Request timed out. Please try again.") from e
+        if isinstance(e, APIError):
+            log.error(f"Anthropic API error: {str(e)}")
+            raise RuntimeError(f"API error: {str(e)}") from e
+        log.error(f"Unexpected error: {str(e)}")
+        raise RuntimeError(f"Unexpected error occurred: {str(e)}") from e
+
+    @staticmethod
+    def _chunk_from_event(event, usage: dict = None) -> tuple:
+        """Translate an Anthropic stream event into (StreamChunk or None, usage so far)"""
+        etype = getattr(event, "type", None)
+        if etype == "message_start":
+            return None, anthropic_usage(event.message.usage)
+        if etype == "content_block_delta":
+            delta_content = getattr(event.delta, "text", "")
+            return (StreamChunk(delta_content) if delta_content else None), usage
+        if etype == "message_delta":
+            # prompt and cache counts come with message_start, the output count with message_delta
+            usage = dict(usage or anthropic_usage({}))
+            usage["completion_tokens"] = event.usage.output_tokens
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            return StreamChunk(finish_reason=event.delta.stop_reason, usage=usage), usage
+        return None, usage
+
+    @staticmethod
+    def _result(response) -> GenerationResult:
+        text = "".join(block.text for block in response.content if getattr(block, "type", None) == "text")
+        result = GenerationResult(
+            text.strip(),
+            model=response.model,
+            finish_reason=response.stop_reason,
+            response_id=response.id,
+        )
+        result.set_usage(anthropic_usage(response.usage))
+        return result
 
     def generate(
         self, 
@@ -46,78 +115,215 @@ class AnthropicProvider(BaseLLM):
         stream: bool = False, 
         **kwargs
     ) -> str:
-        if not model or not isinstance(model, str):
-            raise ValueError("Model name must be a non-empty string")
+        if stream:
+            return self._print_stream(self.stream(model, prompt, messages, temperature, max_tokens, top_p, **kwargs))
 
-        if prompt:
-            prompt = self._sanitize_input(prompt)
+        return self.complete(model, prompt, messages, temperature, max_tokens, top_p, **kwargs).text
 
-        if messages:
-            if not self._validate_messages(messages):
-                raise ValueError("Invalid message format")
-            final_messages = []
-            for msg in messages:
-                sanitized_msg = {
-                    'role': msg['role'],
-                    'content': self._sanitize_input(msg['content'])
-                }
-                final_messages.append(sanitized_msg)
-        else:
-            system_default = {"role": "system", "content": self.default_system_prompt}
-            user_msg = {"role": "user", "content": prompt or "Hello"}
-            final_messages = [system_default, user_msg]
+    async def agenerate(
+        self, 
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7, 
+        max_tokens: int = 1024, 
+        top_p: float = 0.1, 
+        stream: bool = False, 
+        **kwargs
+    ) -> str:
+        if stream:
+            return await self._aprint_stream(self.astream(model, prompt, messages, temperature, max_tokens, top_p, **kwargs))
 
-        system_content = ""
-        user_messages = []
+        result = await self.acomplete(model, prompt, messages, temperature, max_tokens, top_p, **kwargs)
+        return result.text
 
-        for msg in final_messages:
-            if msg["role"] == "system":
-                system_content = msg["content"]
-            else:
-                user_messages.append(msg)
+    def complete(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        top_p: float = 0.1,
+        **kwargs
+    ) -> GenerationResult:
+        """Non-streaming call that keeps usage, stop reason and the message id"""
+        kwargs.pop("stream", None)
+        system_content, user_messages = self._prepare_messages(model, prompt, messages, kwargs.pop("prompt_cache", None))
         try:
-            if not stream:
-                response = self.client.messages.create(
-                    model=model,
-                    max_tokens=max_tokens,
-                    temperature=temperature,
-                    top_p=top_p,
-                    system=system_content or self.default_system_prompt,
-                    messages=user_messages,
-                    **kwargs
-                )
-                return response.content[0].text.strip()
-            else:
-                output = []
-                with self.client.messages.stream(
-                    model=model,
-                    max_tokens=max_tokens,
-                    temperature=temperature,
-                    top_p=top_p,
-                    system=system_content or self.default_system_prompt,
-                    messages=user_messages,
-                    **kwargs
-                ) as stream_resp:
-                    for event in stream_resp:
-                        if hasattr(event, "type") and event.type == "content_block_delta":
-                            delta_content = getattr(event, "delta", {}).get("text", "")
-                            if delta_content:
-                                sys.stdout.write(delta_content)
-                                sys.stdout.flush()
-                                output.append(delta_content)
-                return "".join(output).strip()
-        except AuthenticationError as e:
-            log.error(f"Authentication failed: {str(e)}")
-            raise RuntimeError("Invalid API key. Please check .env file.")
-        except APITimeoutError as e:
-            log.error(f"API request timed out: {str(e)}")
-            raise RuntimeError("Request timed out. Please try again.")
-        except APIError as e:
-            log.error(f"Anthropic API error: {str(e)}")
-            raise RuntimeError(f"API error: {str(e)}")
+            response = self.client.messages.create(
+                model=model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                top_p=top_p,
+                system=system_content,
+                messages=user_messages,
+                **kwargs
+            )
+            return self._result(response)
+        except Exception as e:
+            self._handle_error(e)
+
+    async def acomplete(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        top_p: float = 0.1,
+        **kwargs
+    ) -> GenerationResult:
+        kwargs.pop("stream", None)
+        system_content, user_messages = self._prepare_messages(model, prompt, messages, kwargs.pop("prompt_cache", None))
+        try:
+            response = await self.async_client.messages.create(
+                model=model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                top_p=top_p,
+                system=system_content,
+                messages=user_messages,
+                **kwargs
+            )
+            return self._result(response)
         except Exception as e:
-            log.error(f"Unexpected error: {str(e)}")
-            raise RuntimeError(f"Unexpected error occurred: {str(e)}")
+            self._handle_error(e)
+
+    def stream(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        top_p: float = 0.1,
+        **kwargs
+    ):
+        """Yield StreamChunks as deltas arrive, the message_delta one carries usage"""
+        system_content, user_messages = self._prepare_messages(model, prompt, messages, kwargs.pop("prompt_cache", None))
+        usage = None
+        try:
+            with self.client.messages.stream(
+                model=model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                top_p=top_p,
+                system=system_content,
+                messages=user_messages,
+                **kwargs
+            ) as stream_resp:
+                for event in stream_resp:
+                    chunk, usage = self._chunk_from_event(event, usage)
+                    if chunk is not None:
+                        yield chunk
+        except Exception as e:
+            self._handle_error(e)
+
+    async def astream(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        top_p: float = 0.1,
+        **kwargs
+    ):
+        system_content, user_messages = self._prepare_messages(model, prompt, messages, kwargs.pop("prompt_cache", None))
+        usage = None
+        try:
+            async with self.async_client.messages.stream(
+                model=model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                top_p=top_p,
+                system=system_content,
+                messages=user_messages,
+                **kwargs
+            ) as stream_resp:
+                async for event in stream_resp:
+                    chunk, usage = self._chunk_from_event(event, usage)
+                    if chunk is not None:
+                        yield chunk
+        except Exception as e:
+            self._handle_error(e)
+
+    def _batch_params(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        top_p: float = 0.1,
+        **kwargs
+    ) -> dict:
+        """messages.create params for one Message Batches request, same defaults as complete"""
+        kwargs.pop("stream", None)
+        system_content, user_messages = self._prepare_messages(model, prompt, messages, kwargs.pop("prompt_cache", None))
+        return {
+            "model": model,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "top_p": top_p,
+            "system": system_content,
+            "messages": list(user_messages),
+            **kwargs
+        }
+
+    def submit_batch(self, items: list) -> list[str]:
+        """Send (custom_id, params) pairs to the Message Batches API, returns the batch ids"""
+        ids, requests_, size = [], [], 0
+        for custom_id, params in items:
+            request = {"custom_id": custom_id, "params": self._batch_params(**params)}
+            request_size = len(json.dumps(request))
+            if requests_ and (len(requests_) >= self.BATCH_MAX_REQUESTS or size + request_size > self.BATCH_MAX_BYTES):
+                ids.append(self._create_batch(requests_))
+                requests_, size = [], 0
+            requests_.append(request)
+            size += request_size
+        if requests_:
+            ids.append(self._create_batch(requests_))
+        return ids
+
+    def _create_batch(self, requests_: list) -> str:
+        try:
+            batch = self.client.messages.batches.create(requests=requests_)
+        except Exception as e:
+            self._handle_error(e)
+        log.debug(f"message batch {batch.id} submitted with {len(requests_)} requests")
+        return batch.id
+
+    def batch_status(self, batch_id: str) -> dict:
+        batch = self.client.messages.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        if batch.processing_status == "ended":
+            status = "cancelled" if batch.cancel_initiated_at else "completed"
+        else:
+            status = batch.processing_status
+        return {
+            "id": batch.id,
+            "status": status,
+            "total": counts.processing + counts.succeeded + counts.errored + counts.canceled + counts.expired,
+            "completed": counts.succeeded,
+            "failed": counts.errored + counts.canceled + counts.expired,
+        }
+
+    def cancel_batch(self, batch_id: str):
+        self.client.messages.batches.cancel(batch_id)
+
+    def batch_results(self, batch_id: str):
+        """Yield (custom_id, GenerationResult or exception), the results file is decoded line by line"""
+        for entry in self.client.messages.batches.results(batch_id):
+            result = entry.result
+            if result.type == "succeeded":
+                yield entry.custom_id, self._result(result.message)
+            elif result.type == "errored":
+                error = result.error.error
+                yield entry.custom_id, RuntimeError(f"Batch request {entry.custom_id} failed: {error.type}: {error.message}")
+            else:
+                yield entry.custom_id, RuntimeError(f"Batch request {entry.custom_id} was {result.type}")
 
     def list_models(self, **kwargs) -> list[str]:
         """Dynamically fetch available models from Anthropic API"""
@@ -129,7 +335,7 @@ class AnthropicProvider(BaseLLM):
         }
 
         try:
-            response = requests.get(url, headers=headers, timeout=30)
+            response = self.session.get(url, headers=headers, timeout=30)
             response.raise_for_status()
             models_data = response.json().get("data", [])
 
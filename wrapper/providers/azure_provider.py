@@ -1,15 +1,23 @@
-import sys
-import re
 import requests
-from openai import AzureOpenAI, AuthenticationError, APITimeoutError, APIError
+from openai import AzureOpenAI, AsyncAzureOpenAI, AuthenticationError, APITimeoutError, APIError
 from wrapper.base import BaseLLM
-from wrapper.utils import get_or_request_key, ColorLogger
+from wrapper.providers.openai_batch import OpenAIBatchMixin
+from wrapper.types import StreamChunk, GenerationResult
+from wrapper.session import get_session
+from wrapper.utils import get_or_request_key, sanitize_text, sanitize_messages, decode_embeddings, ColorLogger
 from wrapper.config import *
 
 log = ColorLogger(enable_debug=SHOW_LOGS)
 
-class AzureProvider(BaseLLM):
-    def __init__(self):
+class AzureProvider(OpenAIBatchMixin, BaseLLM):
+    EMBED_BATCH_SIZE = 2048  # older API versions allow 16, pass batch_size to WrapperEmbed for those
+    # batches run on a Global Batch deployment, model in each request is that deployment's name
+    BATCH_URL = "/chat/completions"
+    BATCH_MAX_REQUESTS = 100_000
+    SDK_RETRIES = True
+
+    def __init__(self, max_retries: int = None):
+        """max_retries: retries done by the Azure OpenAI client itself, None keeps the SDK default"""
         # Auto fetch API keys and endpoint from env or ask user
         self.api_key = get_or_request_key("AZURE_OPENAI_API_KEY", "Please enter your Azure OpenAI API Key")
         self.endpoint = get_or_request_key("AZURE_OPENAI_ENDPOINT", "Please enter your Azure OpenAI Endpoint (e.g., https://your-resource.openai.azure.com)")
@@ -20,32 +28,58 @@ class AzureProvider(BaseLLM):
             self.endpoint = f"https://{self.endpoint}"
         self.endpoint = self.endpoint.rstrip('/')
 
+        self.client_options = {} if max_retries is None else {"max_retries": max_retries}
         self.client = AzureOpenAI(
             api_key=self.api_key,
             azure_endpoint=self.endpoint,
             api_version=self.api_version,
-            timeout=30.0
+            timeout=30.0,
+            **self.client_options
         )
         self.default_system_prompt = "You are a helpful AI assistant."
+        self.session = get_session("azure")
+
+    @property
+    def async_client(self) -> AsyncAzureOpenAI:
+        # one client per event loop, created on first async call so sync-only users never pay for it
+        return self._loop_client(lambda: AsyncAzureOpenAI(
+            api_key=self.api_key,
+            azure_endpoint=self.endpoint,
+            api_version=self.api_version,
+            timeout=30.0,
+            **self.client_options
+        ))
+
+    def _prepare_messages(self, model: str, prompt: str = None, messages: list[dict] = None) -> list[dict]:
+        """Validate and sanitize the conversation before it is sent"""
+        if not model or not isinstance(model, str):
+            raise ValueError("Model name must be a non-empty string")
+
+        if prompt:
+            prompt = sanitize_text(prompt)
 
-    def _sanitize_input(self, text: str) -> str:
-        """Sanitize user input to prevent potential issues"""
-        if not isinstance(text, str):
-            return str(text)
-        # Remove potentially harmful characters while preserving functionality
-        sanitized = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)
-        return sanitized.strip()
-
-    def _validate_messages(self, messages: list) -> bool:
-        """Validate message structure"""
-        if not isinstance(messages, list):
-            return False
-        for msg in messages:
-            if not isinstance(msg, dict) or 'role' not in msg or 'content' not in msg:
-                return False
-            if msg['role'] not in ['system', 'user', 'assistant']:
-                return False
-        return True
+        if messages:
+            # shared fast path: clean messages are not copied, CleanMessages only scans new turns
+            final_messages = sanitize_messages(messages)
+        else:
+            system_default = {"role": "system", "content": self.default_system_prompt}
+            user_msg = {"role": "user", "content": prompt or "Hello"}
+            final_messages = [system_default, user_msg]
+        return final_messages
+
+    def _handle_error(self, e: Exception):
+        """Map SDK exceptions to RuntimeError with a readable message"""
+        if isinstance(e, AuthenticationError):
+            log.error(f"Authentication failed: {str(e)}")
+            raise RuntimeError("Invalid API key or endpoint. Please check .env file.") from e
+        if isinstance(e, APITimeoutError):
+            log.error(f"API request timed out: {str(e)}")
+            raise RuntimeError("Request timed out. Please try again.") from e
+        if isinstance(e, APIError):
+            log.error(f"Azure OpenAI API error: {str(e)}")
+            raise RuntimeError(f"API error: {str(e)}") from e
+        log.error(f"Unexpected error: {str(e)}")
+        raise RuntimeError(f"Unexpected error occurred: {str(e)}") from e
 
     def generate(
         self, 
@@ -58,69 +92,172 @@ class AzureProvider(BaseLLM):
         stream: bool = False, 
         **kwargs
     ) -> str:
-        if not model or not isinstance(model, str):
-            raise ValueError("Model name must be a non-empty string")
+        if stream:
+            return self._print_stream(self.stream(model, prompt, messages, temperature, max_tokens, top_p, **kwargs))
 
-        if prompt:
-            prompt = self._sanitize_input(prompt)
+        return self.complete(model, prompt, messages, temperature, max_tokens, top_p, **kwargs).text
 
-        if messages:
-            if not self._validate_messages(messages):
-                raise ValueError("Invalid message format")
-            final_messages = []
-            for msg in messages:
-                sanitized_msg = {
-                    'role': msg['role'],
-                    'content': self._sanitize_input(msg['content'])
-                }
-                final_messages.append(sanitized_msg)
-        else:
-            system_default = {"role": "system", "content": self.default_system_prompt}
-            user_msg = {"role": "user", "content": prompt or "Hello"}
-            final_messages = [system_default, user_msg]
+    async def agenerate(
+        self, 
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7, 
+        max_tokens: int = 1024, 
+        top_p: float = 0.1, 
+        stream: bool = False, 
+        **kwargs
+    ) -> str:
+        if stream:
+            return await self._aprint_stream(self.astream(model, prompt, messages, temperature, max_tokens, top_p, **kwargs))
+
+        result = await self.acomplete(model, prompt, messages, temperature, max_tokens, top_p, **kwargs)
+        return result.text
 
+    def _batch_body(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        top_p: float = 0.1,
+        **kwargs
+    ) -> dict:
+        """Request body for one Batch API line, same defaults as complete"""
+        kwargs.pop("stream", None)
+        return {
+            "model": model,
+            "messages": list(self._prepare_messages(model, prompt, messages)),
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "top_p": top_p,
+            **kwargs
+        }
+
+    def complete(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        top_p: float = 0.1,
+        **kwargs
+    ) -> GenerationResult:
+        """Non-streaming call that keeps usage, finish reason and the response id"""
+        kwargs.pop("stream", None)
+        final_messages = self._prepare_messages(model, prompt, messages)
         try:
-            if not stream:
-                response = self.client.chat.completions.create(
-                    model=model,
-                    messages=final_messages,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                    top_p=top_p,
-                    **kwargs
-                )
-                return response.choices[0].message.content.strip()
-            else:
-                output = []
-                stream_response = self.client.chat.completions.create(
-                    model=model,
-                    messages=final_messages,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                    top_p=top_p,
-                    stream=True,
-                    **kwargs
-                )
+            response = self.client.chat.completions.create(
+                model=model,
+                messages=final_messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                top_p=top_p,
+                **kwargs
+            )
+            return GenerationResult.from_openai(response)
+        except Exception as e:
+            self._handle_error(e)
+
+    async def acomplete(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        top_p: float = 0.1,
+        **kwargs
+    ) -> GenerationResult:
+        kwargs.pop("stream", None)
+        final_messages = self._prepare_messages(model, prompt, messages)
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=model,
+                messages=final_messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                top_p=top_p,
+                **kwargs
+            )
+            return GenerationResult.from_openai(response)
+        except Exception as e:
+            self._handle_error(e)
+
+    def stream(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        top_p: float = 0.1,
+        **kwargs
+    ):
+        """Yield StreamChunks as deltas arrive, the last one carries usage"""
+        kwargs.setdefault("stream_options", {"include_usage": True})
+        final_messages = self._prepare_messages(model, prompt, messages)
+        try:
+            stream_response = self.client.chat.completions.create(
+                model=model,
+                messages=final_messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                top_p=top_p,
+                stream=True,
+                **kwargs
+            )
+            with stream_response:
                 for chunk in stream_response:
-                    if chunk.choices[0].delta.content is not None:
-                        content = chunk.choices[0].delta.content
-                        sys.stdout.write(content)
-                        sys.stdout.flush()
-                        output.append(content)
-                return "".join(output).strip()
-
-        except AuthenticationError as e:
-            log.error(f"Authentication failed: {str(e)}")
-            raise RuntimeError("Invalid API key or endpoint. Please check .env file.")
-        except APITimeoutError as e:
-            log.error(f"API request timed out: {str(e)}")
-            raise RuntimeError("Request timed out. Please try again.")
-        except APIError as e:
-            log.error(f"Azure OpenAI API error: {str(e)}")
-            raise RuntimeError(f"API error: {str(e)}")
+                    yield StreamChunk.from_openai(chunk)
+        except Exception as e:
+            self._handle_error(e)
+
+    async def astream(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        top_p: float = 0.1,
+        **kwargs
+    ):
+        kwargs.setdefault("stream_options", {"include_usage": True})
+        final_messages = self._prepare_messages(model, prompt, messages)
+        try:
+            stream_response = await self.async_client.chat.completions.create(
+                model=model,
+                messages=final_messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                top_p=top_p,
+                stream=True,
+                **kwargs
+            )
+            # closing releases the connection when the consumer stops early
+            async with stream_response:
+                async for chunk in stream_response:
+                    yield StreamChunk.from_openai(chunk)
+        except Exception as e:
+            self._handle_error(e)
+
+    def embed(self, texts: list[str], model: str, **kwargs):
+        """model is the embedding deployment name, vectors come back base64 encoded float32"""
+        try:
+            response = self.client.embeddings.create(model=model, input=texts, encoding_format="base64", **kwargs)
+        except Exception as e:
+            self._handle_error(e)
+        return decode_embeddings(response.data)
+
+    async def aembed(self, texts: list[str], model: str, **kwargs):
+        try:
+            response = await self.async_client.embeddings.create(model=model, input=texts, encoding_format="base64", **kwargs)
         except Exception as e:
-            log.error(f"Unexpected error: {str(e)}")
-            raise RuntimeError(f"Unexpected error occurred: {str(e)}")
+            self._handle_error(e)
+        return decode_embeddings(response.data)
 
     def list_models(self, **kwargs) -> list[str]:
         """Dynamically fetch available models from Azure OpenAI API"""
@@ -134,7 +271,7 @@ class AzureProvider(BaseLLM):
         }
 
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=30)
+            response = self.session.get(url, headers=headers, params=params, timeout=30)
             response.raise_for_status()
             models_data = response.json().get("data", [])
 
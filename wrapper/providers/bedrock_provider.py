@@ -1,26 +1,59 @@
 import json
-import sys
 import os
+import time
+import uuid
 import boto3
 from botocore.exceptions import ClientError
-from wrapper.utils import ColorLogger, load_dotenv
+from wrapper.utils import ColorLogger, load_dotenv, split_system, mark_cacheable, require_numpy
 from wrapper.base import BaseLLM
-from wrapper.config import SHOW_LOGS
+from wrapper.retry import RETRYABLE_STATUS, parse_retry_after
+from wrapper.types import StreamChunk, GenerationResult, anthropic_usage, converse_usage
+from wrapper.config import SHOW_LOGS, PROMPT_CACHE
 
 log = ColorLogger(enable_debug=SHOW_LOGS)
 
 load_dotenv()
 
+# throttling / capacity error codes Bedrock returns in ClientError
+RETRYABLE_CODES = {
+    "ThrottlingException", "TooManyRequestsException", "ServiceUnavailableException",
+    "InternalServerException", "ModelNotReadyException", "ModelTimeoutException",
+}
+
+# batch inference job states mapped to the ones BatchJob understands
+BATCH_STATES = {
+    "Completed": "completed", "PartiallyCompleted": "completed", "Failed": "failed",
+    "Stopped": "cancelled", "Expired": "expired", "Stopping": "cancelling",
+}
+
 class BedrockProvider(BaseLLM):
-    def __init__(self):
+    """
+    Amazon Bedrock through the Converse API. boto3 has no asyncio client, so the async
+    methods are BaseLLM's, which run the blocking calls in the default executor.
+    """
+
+    DEFAULT_EMBED_MODEL = "amazon.titan-embed-text-v2:0"
+    # records per batch inference job (default service quota), bigger jobs are split
+    BATCH_MAX_REQUESTS = 50_000
+    # jobs with fewer records are rejected when they start, after the input was uploaded
+    BATCH_MIN_REQUESTS = 100
+    BATCH_OPTIONS = ("role_arn", "s3_uri", "job_name", "timeout_hours")
+
+    def __init__(self, prompt_cache=None):
         """
         Initialize BedrockProvider using environment variables only.
         No interactive prompting. Safe for builds, Uvicorn, and CI/CD.
+        prompt_cache: True (or a TTL like "1h") marks the system prompt and conversation as cacheable (Claude and Nova models).
         """
+        self.prompt_cache = PROMPT_CACHE if prompt_cache is None else prompt_cache
         self.region = os.environ.get("AWS_REGION")
         self.aws_access_key_id = os.environ.get("AWS_ACCESS_KEY_ID")
         self.aws_secret_access_key = os.environ.get("AWS_SECRET_ACCESS_KEY")
         self.aws_session_token = os.environ.get("AWS_SESSION_TOKEN")
+        # batch inference reads its input from and writes results to S3 with this service role
+        self.batch_role_arn = os.environ.get("BEDROCK_BATCH_ROLE_ARN")
+        self.batch_s3_uri = os.environ.get("BEDROCK_BATCH_S3_URI")
+        self._s3 = None
 
         self.client = boto3.client(
             "bedrock-runtime",
@@ -38,34 +71,29 @@ class BedrockProvider(BaseLLM):
             aws_session_token=self.aws_session_token,
         )
 
-    def generate(
+    def _build_body(
         self,
-        model: str,
         prompt: str = None,
         messages: list[dict] = None,
         temperature: float = 0.7,
         max_tokens: int = 200,
         top_p: float = 0.9,
-        stream: bool = False,
+        prompt_cache=None,
         **kwargs
     ) -> str:
-        """
-        Generate a response from Bedrock model.
-        Supports both prompt-based and messages-based inputs.
-        """
-        system_prompt = None
-        final_messages = []
-
+        """Native Anthropic Messages body for invoke_model, used for batch inference records (Claude models)"""
         if messages:
-            for m in messages:
-                if m["role"] == "system":
-                    system_prompt = m["content"]
-                else:
-                    final_messages.append(m)
+            system_prompt, final_messages = split_system(messages)
         else:
             system_prompt = "You are a helpful AI assistant."
             final_messages = [{"role": "user", "content": prompt}]
 
+        if prompt_cache is None:
+            prompt_cache = self.prompt_cache
+        if prompt_cache:
+            ttl = prompt_cache if isinstance(prompt_cache, str) else None
+            system_prompt, final_messages = mark_cacheable(system_prompt, final_messages, ttl)
+
         body_dict = {
             "messages": final_messages,
             "temperature": temperature,
@@ -78,33 +106,294 @@ class BedrockProvider(BaseLLM):
         if system_prompt:
             body_dict["system"] = system_prompt
 
-        body = json.dumps(body_dict)
+        return json.dumps(body_dict)
 
-        if not stream:
-            resp = self.client.invoke_model(
-                modelId=model,
-                body=body,
-                accept="application/json",
-                contentType="application/json"
-            )
-            response_body = json.loads(resp["body"].read().decode("utf-8"))
-            return response_body["content"][0]["text"].strip()
+    def generate(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 200,
+        top_p: float = 0.9,
+        stream: bool = False,
+        **kwargs
+    ) -> str:
+        """
+        Generate a response from Bedrock model.
+        Supports both prompt-based and messages-based inputs.
+        """
+        if stream:
+            return self._print_stream(self.stream(model, prompt, messages, temperature, max_tokens, top_p, **kwargs))
+
+        return self.complete(model, prompt, messages, temperature, max_tokens, top_p, **kwargs).text
+
+    def _converse_request(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 200,
+        top_p: float = 0.9,
+        prompt_cache=None,
+        **kwargs
+    ) -> dict:
+        """
+        converse/converse_stream arguments. Converse takes the same request shape for every
+        model family (Claude, Llama, Mistral, Titan, Nova, ...), so nothing here is model specific.
+        Unknown kwargs go to additionalModelRequestFields, e.g. top_k for Claude.
+        """
+        kwargs.pop("stream", None)
+        if messages:
+            system_prompt, turns = split_system(messages)
         else:
-            output = []
-            stream_resp = self.client.invoke_model_with_response_stream(
-                modelId=model,
-                body=body,
-                accept="application/json",
-                contentType="application/json"
+            system_prompt = "You are a helpful AI assistant."
+            turns = [{"role": "user", "content": prompt}]
+
+        final_messages = [
+            {"role": m["role"], "content": [{"text": m["content"]}] if isinstance(m["content"], str) else list(m["content"])}
+            for m in turns
+        ]
+        system = [{"text": system_prompt}] if system_prompt else []
+
+        if prompt_cache is None:
+            prompt_cache = self.prompt_cache
+        if prompt_cache:
+            # cachePoint blocks mark the end of the cached prefix (Claude and Nova models)
+            point = {"cachePoint": {"type": "default"}}
+            if isinstance(prompt_cache, str):
+                point["cachePoint"]["ttl"] = prompt_cache
+            if system:
+                system.append(point)
+            if final_messages and final_messages[-1]["content"]:
+                final_messages[-1]["content"].append(point)
+
+        inference = {"maxTokens": max_tokens, "temperature": temperature, "topP": top_p}
+        stop = kwargs.pop("stop", None) or kwargs.pop("stop_sequences", None)
+        if stop:
+            inference["stopSequences"] = [stop] if isinstance(stop, str) else list(stop)
+
+        request = {"modelId": model, "messages": final_messages, "inferenceConfig": inference}
+        if system:
+            request["system"] = system
+        if kwargs:
+            request["additionalModelRequestFields"] = kwargs
+        return request
+
+    def complete(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 200,
+        top_p: float = 0.9,
+        **kwargs
+    ) -> GenerationResult:
+        """Non-streaming Converse call that keeps usage, stop reason and the request id"""
+        resp = self.client.converse(**self._converse_request(model, prompt, messages, temperature, max_tokens, top_p, **kwargs))
+        content = resp.get("output", {}).get("message", {}).get("content", [])
+        result = GenerationResult(
+            "".join(block.get("text", "") for block in content).strip(),
+            model=model,
+            finish_reason=resp.get("stopReason"),
+            response_id=resp.get("ResponseMetadata", {}).get("RequestId"),
+        )
+        if resp.get("usage"):
+            result.set_usage(converse_usage(resp["usage"]))
+        return result
+
+    @staticmethod
+    def _result(response_body: dict, model: str) -> GenerationResult:
+        result = GenerationResult(
+            "".join(block.get("text", "") for block in response_body.get("content", [])).strip(),
+            model=response_body.get("model", model),
+            finish_reason=response_body.get("stop_reason"),
+            response_id=response_body.get("id"),
+        )
+        if response_body.get("usage"):
+            result.set_usage(anthropic_usage(response_body["usage"]))
+        return result
+
+    def stream(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 200,
+        top_p: float = 0.9,
+        **kwargs
+    ):
+        """
+        Yield StreamChunks from converse_stream. botocore decodes the event stream as it
+        arrives, so events are already dicts. The last chunk has the stop reason and usage.
+        """
+        resp = self.client.converse_stream(**self._converse_request(model, prompt, messages, temperature, max_tokens, top_p, **kwargs))
+        finish_reason = None
+        for event in resp["stream"]:
+            if "contentBlockDelta" in event:
+                delta = event["contentBlockDelta"]["delta"].get("text")
+                if delta:
+                    yield StreamChunk(delta)
+            elif "messageStop" in event:
+                finish_reason = event["messageStop"].get("stopReason")
+            elif "metadata" in event:
+                # sent after messageStop
+                usage = event["metadata"].get("usage")
+                yield StreamChunk(finish_reason=finish_reason, usage=converse_usage(usage) if usage else None)
+                finish_reason = None
+        if finish_reason is not None:
+            yield StreamChunk(finish_reason=finish_reason)
+
+    @property
+    def s3(self):
+        if self._s3 is None:
+            self._s3 = boto3.client(
+                "s3",
+                region_name=self.region,
+                aws_access_key_id=self.aws_access_key_id,
+                aws_secret_access_key=self.aws_secret_access_key,
+                aws_session_token=self.aws_session_token,
             )
-            for event in stream_resp["body"]:
-                chunk = json.loads(event["chunk"]["bytes"].decode("utf-8"))
-                if chunk.get("type") == "content_block_delta":
-                    delta = chunk["delta"]["text"]
-                    sys.stdout.write(delta)
-                    sys.stdout.flush()
-                    output.append(delta)
-            return "".join(output).strip()
+        return self._s3
+
+    @staticmethod
+    def _split_s3_uri(uri: str) -> tuple:
+        # no str.removeprefix, it needs 3.9
+        uri = uri[len("s3://"):] if uri.startswith("s3://") else uri
+        bucket, _, prefix = uri.partition("/")
+        return bucket, prefix.strip("/")
+
+    def submit_batch(
+        self,
+        items: list,
+        role_arn: str = None,
+        s3_uri: str = None,
+        job_name: str = None,
+        timeout_hours: int = None,
+    ) -> list[str]:
+        """
+        Run (custom_id, params) pairs as batch inference jobs, returns the job ARNs.
+        A job runs a single model, so requests are grouped by model. Input and output go under
+        s3_uri/job_name/. Bedrock wants at least 100 records per job, and records use the
+        Anthropic request format, so only Claude models (anthropic.* and their inference profiles)
+        can be batched. Both are checked before anything is uploaded.
+        """
+        role_arn = role_arn or self.batch_role_arn
+        s3_uri = s3_uri or self.batch_s3_uri
+        if not role_arn or not s3_uri:
+            raise ValueError("Bedrock batch inference needs BEDROCK_BATCH_ROLE_ARN and BEDROCK_BATCH_S3_URI (or role_arn/s3_uri)")
+        bucket, prefix = self._split_s3_uri(s3_uri)
+        job_name = job_name or f"wrapper-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+        by_model = {}
+        for custom_id, params in items:
+            params = dict(params)
+            model = params.pop("model")
+            if "anthropic." not in model:
+                raise ValueError(f"Bedrock batches are built for Claude models only, got {model}")
+            # _build_body already returns JSON, so the record is assembled without re-encoding it
+            line = f'{{"recordId":{json.dumps(custom_id)},"modelInput":{self._build_body(**params)}}}\n'
+            by_model.setdefault(model, []).append(line.encode("utf-8"))
+
+        chunks = []
+        for model, lines in by_model.items():
+            if len(lines) < self.BATCH_MIN_REQUESTS:
+                raise ValueError(
+                    f"Bedrock batch jobs need at least {self.BATCH_MIN_REQUESTS} records, got {len(lines)} for {model}"
+                )
+            # even splits, so the last job of a big model doesn't fall under the minimum
+            jobs = -(-len(lines) // self.BATCH_MAX_REQUESTS)
+            size = -(-len(lines) // jobs)
+            chunks += [(model, lines[start:start + size]) for start in range(0, len(lines), size)]
+        arns = []
+        for i, (model, lines) in enumerate(chunks):
+            name = f"{job_name}-{i}" if len(chunks) > 1 else job_name
+            folder = "/".join(filter(None, (prefix, name)))
+            self.s3.put_object(Bucket=bucket, Key=f"{folder}/input.jsonl", Body=b"".join(lines))
+            job = {
+                "jobName": name,
+                "roleArn": role_arn,
+                "modelId": model,
+                "inputDataConfig": {"s3InputDataConfig": {"s3Uri": f"s3://{bucket}/{folder}/input.jsonl", "s3InputFormat": "JSONL"}},
+                "outputDataConfig": {"s3OutputDataConfig": {"s3Uri": f"s3://{bucket}/{folder}/output/"}},
+            }
+            if timeout_hours:
+                job["timeoutDurationInHours"] = timeout_hours
+            arns.append(self.bedrock_client.create_model_invocation_job(**job)["jobArn"])
+            log.debug(f"batch inference job {name} submitted for {model} with {len(lines)} records")
+        return arns
+
+    def batch_status(self, batch_id: str) -> dict:
+        job = self.bedrock_client.get_model_invocation_job(jobIdentifier=batch_id)
+        return {
+            "id": batch_id,
+            "status": BATCH_STATES.get(job["status"], "in_progress"),
+            "total": job.get("totalRecordCount"),
+            "completed": job.get("successRecordCount") or 0,
+            "failed": job.get("errorRecordCount") or 0,
+        }
+
+    def cancel_batch(self, batch_id: str):
+        self.bedrock_client.stop_model_invocation_job(jobIdentifier=batch_id)
+
+    def batch_results(self, batch_id: str):
+        """Yield (custom_id, GenerationResult or exception) from the job's .out files, read line by line from S3"""
+        job = self.bedrock_client.get_model_invocation_job(jobIdentifier=batch_id)
+        if job["status"] == "Failed":
+            raise RuntimeError(f"Batch job {batch_id} failed: {job.get('message') or 'no details'}")
+        model = job["modelId"]
+        bucket, prefix = self._split_s3_uri(job["outputDataConfig"]["s3OutputDataConfig"]["s3Uri"])
+        # results land in <output>/<job id>/<input file>.out next to a manifest
+        prefix = "/".join(filter(None, (prefix, batch_id.rsplit("/", 1)[-1]))) + "/"
+        for page in self.s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                if not obj["Key"].endswith(".jsonl.out"):
+                    continue
+                body = self.s3.get_object(Bucket=bucket, Key=obj["Key"])["Body"]
+                for line in body.iter_lines():
+                    if not line:
+                        continue
+                    record = json.loads(line)
+                    custom_id = record.get("recordId")
+                    if record.get("error") or "modelOutput" not in record:
+                        yield custom_id, RuntimeError(f"Batch request {custom_id} failed: {record.get('error')}")
+                    else:
+                        yield custom_id, self._result(record["modelOutput"], model)
+
+    def embed_batch_size(self, model: str) -> int:
+        # Cohere takes up to 96 texts per call, Titan only one (WrapperEmbed runs those concurrently)
+        return 96 if "cohere" in model else 1
+
+    def embed(self, texts: list[str], model: str, **kwargs):
+        """Titan and Cohere embedding models, returned as a float32 matrix"""
+        np = require_numpy()
+        if "cohere" in model:
+            body = {"texts": texts, "input_type": kwargs.pop("input_type", "search_document"), "embedding_types": ["float"], **kwargs}
+            resp = self.client.invoke_model(modelId=model, body=json.dumps(body), accept="application/json", contentType="application/json")
+            embeddings = json.loads(resp["body"].read())["embeddings"]
+            # with embedding_types the vectors are keyed by type
+            if isinstance(embeddings, dict):
+                embeddings = embeddings["float"]
+            return np.asarray(embeddings, dtype=np.float32)
+
+        vectors = []
+        for text in texts:
+            body = json.dumps({"inputText": text, **kwargs})
+            resp = self.client.invoke_model(modelId=model, body=body, accept="application/json", contentType="application/json")
+            vectors.append(json.loads(resp["body"].read())["embedding"])
+        return np.asarray(vectors, dtype=np.float32)
+
+    def classify_error(self, exc: Exception) -> tuple:
+        """Bedrock reports throttling through ClientError codes rather than exception types"""
+        if isinstance(exc, ClientError):
+            code = exc.response.get("Error", {}).get("Code", "")
+            meta = exc.response.get("ResponseMetadata", {})
+            retry_after = parse_retry_after(meta.get("HTTPHeaders", {}).get("retry-after"))
+            return code in RETRYABLE_CODES or meta.get("HTTPStatusCode") in RETRYABLE_STATUS, retry_after
+        return super().classify_error(exc)
 
     def list_models(self, by_provider: str = None, by_output_modality: str = None, **kwargs):
         """
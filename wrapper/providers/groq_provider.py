@@ -1,63 +1,155 @@
 # TODO Add meaningful Logs using ColorLogger
 
 from wrapper.base import BaseLLM
+from wrapper.types import StreamChunk, GenerationResult
 from wrapper.utils import get_or_request_key, ColorLogger
-from groq import Groq
-import sys
+from groq import Groq, AsyncGroq
 
 class GroqProvider(BaseLLM):
-    def __init__(self):
+    SDK_RETRIES = True
+
+    def __init__(self, max_retries: int = None):
         self.api_key = get_or_request_key("GROQ_API_KEY", "Please enter your Groq API Key")
-        self.client = Groq(api_key=self.api_key)
-    
+        self.client_options = {} if max_retries is None else {"max_retries": max_retries}
+        self.client = Groq(api_key=self.api_key, **self.client_options)
+
+    @property
+    def async_client(self) -> AsyncGroq:
+        # one client per event loop, created on first async call so sync-only users never pay for it
+        return self._loop_client(lambda: AsyncGroq(api_key=self.api_key, **self.client_options))
+
+    def _build_messages(self, prompt: str = None, messages: list[dict] = None) -> list[dict]:
+        if messages:
+            return messages
+        # Default system + user
+        system_default = {"role": "system", "content": "You are a helpful AI assistant."}
+        user_msg = {"role": "user", "content": prompt}
+        return [system_default, user_msg]
+
     def generate(
-        self, 
+        self,
         model: str,
         prompt: str = None,
         messages: list[dict] = None,
-        temperature: float = 0.7, 
-        max_tokens: int = 200, 
-        top_p: float = 0.1, 
-        stream: bool = False, 
+        temperature: float = 0.7,
+        max_tokens: int = 200,
+        top_p: float = 0.1,
+        stream: bool = False,
         **kwargs
     ) -> str:
-        if messages:
-            final_messages = messages
-        else:
-            # Default system + user
-            system_default = {"role": "system", "content": "You are a helpful AI assistant."}
-            user_msg = {"role": "user", "content": prompt}
-            final_messages = [system_default, user_msg]
-            
-        if not stream:
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=final_messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                top_p=top_p,
-                **kwargs
-            )
-            return response.choices[0].message.content.strip()
-        else:
-            output = []
-            stream_resp = self.client.chat.completions.create(
-                model=model,
-                messages=final_messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                top_p=top_p,
-                stream=True, 
-                **kwargs
-            )
+        if stream:
+            return self._print_stream(self.stream(model, prompt, messages, temperature, max_tokens, top_p, **kwargs))
+
+        return self.complete(model, prompt, messages, temperature, max_tokens, top_p, **kwargs).text
+
+    async def agenerate(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 200,
+        top_p: float = 0.1,
+        stream: bool = False,
+        **kwargs
+    ) -> str:
+        if stream:
+            return await self._aprint_stream(self.astream(model, prompt, messages, temperature, max_tokens, top_p, **kwargs))
+
+        result = await self.acomplete(model, prompt, messages, temperature, max_tokens, top_p, **kwargs)
+        return result.text
+
+    def complete(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 200,
+        top_p: float = 0.1,
+        **kwargs
+    ) -> GenerationResult:
+        """Non-streaming call that keeps usage, finish reason and the response id"""
+        kwargs.pop("stream", None)
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=self._build_messages(prompt, messages),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            top_p=top_p,
+            **kwargs
+        )
+        return GenerationResult.from_openai(response)
+
+    async def acomplete(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 200,
+        top_p: float = 0.1,
+        **kwargs
+    ) -> GenerationResult:
+        kwargs.pop("stream", None)
+        response = await self.async_client.chat.completions.create(
+            model=model,
+            messages=self._build_messages(prompt, messages),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            top_p=top_p,
+            **kwargs
+        )
+        return GenerationResult.from_openai(response)
+
+    def stream(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 200,
+        top_p: float = 0.1,
+        **kwargs
+    ):
+        """Yield StreamChunks as deltas arrive, Groq reports usage on the last one"""
+        stream_resp = self.client.chat.completions.create(
+            model=model,
+            messages=self._build_messages(prompt, messages),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            top_p=top_p,
+            stream=True,
+            **kwargs
+        )
+        with stream_resp:
             for chunk in stream_resp:
-                delta = chunk.choices[0].delta.content
-                if delta:
-                    sys.stdout.write(delta)
-                    sys.stdout.flush()
-                    output.append(delta)
-            return "".join(output).strip()
-        
+                yield StreamChunk.from_openai(chunk)
+
+    async def astream(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 200,
+        top_p: float = 0.1,
+        **kwargs
+    ):
+        stream_resp = await self.async_client.chat.completions.create(
+            model=model,
+            messages=self._build_messages(prompt, messages),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            top_p=top_p,
+            stream=True,
+            **kwargs
+        )
+        # closing releases the connection when the consumer stops early
+        async with stream_resp:
+            async for chunk in stream_resp:
+                yield StreamChunk.from_openai(chunk)
+
     def list_models(self):
         models = self.client.models.list()
-        return [m.id for m in models.data]
\ No newline at end of file
+        return [m.id for m in models.data]
@@ -1,7 +1,9 @@
-import sys
 import requests
+import httpx
 from wrapper.base import BaseLLM
-from wrapper.utils import set_key, get_key_silent, ColorLogger
+from wrapper.types import StreamChunk, GenerationResult
+from wrapper.session import get_session
+from wrapper.utils import set_key, get_key_silent, require_numpy, ColorLogger
 from pathlib import Path
 from dotenv import load_dotenv
 import json
@@ -9,10 +11,28 @@ from wrapper.config import *
 
 log = ColorLogger(enable_debug=SHOW_LOGS)
 
+# sampling params Ollama only reads from "options", mapped to its names
+OPTION_NAMES = {
+    "temperature": "temperature",
+    "top_p": "top_p",
+    "max_tokens": "num_predict",
+    "frequency_penalty": "frequency_penalty",
+    "presence_penalty": "presence_penalty",
+    "seed": "seed",
+    "stop": "stop",
+}
+
+
 class OllamaProvider(BaseLLM):
     DEFAULT_PORT = 11434  # fixed port
+    EMBED_BATCH_SIZE = 512
+    DEFAULT_EMBED_MODEL = "nomic-embed-text"
 
-    def __init__(self):
+    def __init__(self, pool_size: int = None, keep_alive=None):
+        """
+        keep_alive: how long Ollama keeps the model loaded after a call, e.g. "30m", 3600 or -1 for
+            forever (Ollama's default is 5 minutes). Can also be passed per call.
+        """
         # Use consistent location in user's home directory
         env_file = Path.home() / ".wrapper" / ".env"
         env_file.parent.mkdir(exist_ok=True)
@@ -64,14 +84,20 @@ class OllamaProvider(BaseLLM):
             log.debug(f"aight defaultin to localhost party: {self.base_url}")
 
         log.debug("no api key but fk it we ball, might crash later idk" if not self.api_key else "we got everything, lets cook")
+        self.pool_size = pool_size or HTTP_POOL_SIZE
+        self.session = get_session("ollama", self.pool_size)
+        self.keep_alive = OLLAMA_KEEP_ALIVE if keep_alive is None else keep_alive
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
 
     def list_models(self, **kwargs):
         url = f"{self.base_url}/api/tags"   
-        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
 
         log.debug("lemme check what models u got installed...")
         try:
-            response = requests.get(url, headers=headers)
+            response = self.session.get(url, headers=self.headers)
             response.raise_for_status()
             models_raw = response.json().get("models", [])
 
@@ -92,94 +118,268 @@ class OllamaProvider(BaseLLM):
             log.error(f"Failed to retrieve models: {e}")
             log.debug("model fetching went boom 💥")
 
-    def generate(self, messages: list = None, prompt: str = None, stream: bool = False, **kwargs) -> str:
+    def _load_payload(self, model: str, keep_alive) -> dict:
+        # a generate call without a prompt only loads (or with keep_alive=0 unloads) the model
+        keep_alive = self.keep_alive if keep_alive is None else keep_alive
+        payload = {"model": model, "stream": False}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        return payload
+
+    def preload(self, model: str, keep_alive=None) -> bool:
+        """Load the model into memory now so the first real call doesn't pay for it"""
+        log.debug(f"warmin up {model}...")
+        try:
+            response = self.session.post(
+                f"{self.base_url}/api/generate",
+                json=self._load_payload(model, keep_alive),
+                headers=self.headers,
+                timeout=300,
+            )
+            response.raise_for_status()
+        except requests.RequestException as e:
+            log.error(f"Failed to preload {model}: {e}")
+            return False
+        return True
+
+    async def apreload(self, model: str, keep_alive=None) -> bool:
+        try:
+            response = await self.async_client.post(
+                f"{self.base_url}/api/generate",
+                json=self._load_payload(model, keep_alive),
+                headers=self.headers,
+                timeout=300,
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            log.error(f"Failed to preload {model}: {e}")
+            return False
+        return True
+
+    def unload(self, model: str) -> bool:
+        """Free the model's memory right away instead of waiting for keep_alive to run out"""
+        return self.preload(model, keep_alive=0)
+
+    def running_models(self) -> list[dict]:
+        """Models currently loaded in memory (/api/ps), with their expires_at"""
+        try:
+            response = self.session.get(f"{self.base_url}/api/ps", headers=self.headers, timeout=10)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            log.error(f"Failed to list running models: {e}")
+            return []
+        return response.json().get("models", [])
+
+    def _embed_payload(self, texts: list[str], model: str, kwargs: dict) -> dict:
+        payload = {"model": model, "input": texts, **kwargs}
+        keep_alive = payload.pop("keep_alive", self.keep_alive)
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        return payload
+
+    def embed(self, texts: list[str], model: str, **kwargs):
+        """One /api/embed call for the whole list, returned as a float32 matrix"""
+        np = require_numpy()
+        try:
+            response = self.session.post(
+                f"{self.base_url}/api/embed",
+                json=self._embed_payload(texts, model, kwargs),
+                headers=self.headers,
+                timeout=300,
+            )
+            response.raise_for_status()
+        except requests.HTTPError as e:
+            log.error(f"ollama threw hands: {e.response.text if hasattr(e, 'response') else e}")
+            raise RuntimeError(f"Ollama request failed: {e}") from e
+        except requests.RequestException as e:
+            log.error(f"connection ded. is ollama even alive?? {e}")
+            raise RuntimeError(f"Could not reach Ollama at {self.base_url}: {e}") from e
+        return np.asarray(response.json()["embeddings"], dtype=np.float32)
+
+    async def aembed(self, texts: list[str], model: str, **kwargs):
+        np = require_numpy()
+        try:
+            response = await self.async_client.post(
+                f"{self.base_url}/api/embed",
+                json=self._embed_payload(texts, model, kwargs),
+                headers=self.headers,
+                timeout=300,
+            )
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            log.error(f"ollama threw hands: {e.response.text}")
+            raise RuntimeError(f"Ollama request failed: {e}") from e
+        except httpx.HTTPError as e:
+            log.error(f"connection ded. is ollama even alive?? {e}")
+            raise RuntimeError(f"Could not reach Ollama at {self.base_url}: {e}") from e
+        return np.asarray(response.json()["embeddings"], dtype=np.float32)
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        # one client per event loop, created on first async call so sync-only users never pay for it
+        return self._loop_client(lambda: httpx.AsyncClient(
+            timeout=60,
+            limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+        ))
+
+    def _build_payload(self, messages: list = None, prompt: str = None, **kwargs):
+        """
+        (endpoint, payload) for a call, None if there is nothing to send.
+        Messages go to /api/chat with their roles so Ollama can reuse the KV cache of
+        earlier turns, a bare prompt goes to /api/generate.
+        """
         model = kwargs.pop("model", None)
 
         if not model:
             log.error("ayo wheres the model name at?? cant do shit without it")
-            return ""
+            return None
 
         log.debug(f"cookin with model: {model} 👨‍🍳")
-        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
 
-        # Handle messages vs prompt
+        options = {OPTION_NAMES[k]: kwargs.pop(k) for k in list(kwargs) if k in OPTION_NAMES}
+        options.update(kwargs.pop("options", None) or {})
+        keep_alive = kwargs.pop("keep_alive", self.keep_alive)
+
         if messages:
             log.debug(f"processin {len(messages)} messages... this better be good")
-            system_msg = "\n".join(
-                m["content"] for m in messages if m.get("role") == "system"
-            )
-            user_msg = "\n".join(
-                m["content"] for m in messages if m.get("role") == "user"
-            )
-            
-            if system_msg and user_msg:
-                final_prompt = f"{system_msg}\n\n{user_msg}"
-                log.debug("got both system n user msgs, perfectenschlag")
-            elif user_msg:
-                final_prompt = user_msg
-                log.debug("just user msg, keepin it simple")
-            else:
-                final_prompt = system_msg or ""
-                log.debug("only system msg?? weird but ok")
-                
+            endpoint = "/api/chat"
+            payload = {"model": model, "messages": messages, "stream": True, **kwargs}
         elif prompt:
             log.debug("raw prompt mode activated ezpz")
-            final_prompt = prompt
+            endpoint = "/api/generate"
+            payload = {"model": model, "prompt": prompt, "stream": True, **kwargs}
         else:
             log.error("bruh u gave me literally nothing to work with")
-            return ""
+            return None
 
-        log.debug(f"final prompt length: {len(final_prompt)} chars... sendin it")
-        payload = {"model": model, "prompt": final_prompt, "stream": False, **kwargs}
+        if options:
+            payload["options"] = options
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        return endpoint, payload
 
+    def _chunk_from_line(self, line: str):
+        """Parse one NDJSON line into a StreamChunk, None for empty or garbage lines"""
+        if not line:
+            return None
         try:
-            log.debug(f"hittin up {self.base_url}/api/generate...")
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json=payload,
-                headers=headers,
-                timeout=60
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            log.debug(f"line was garbagio: {line[:40]}...")
+            return None
+        # /api/generate streams "response", /api/chat streams "message": {"content": ...}
+        piece = data.get("response") or (data.get("message") or {}).get("content", "")
+        if data.get("done"):
+            prompt_tokens = data.get("prompt_eval_count", 0)
+            completion_tokens = data.get("eval_count", 0)
+            return StreamChunk(
+                piece,
+                finish_reason=data.get("done_reason", "stop"),
+                usage={
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                }
             )
-            response.raise_for_status()
-            log.debug("puh! got 200 back, ollama didnt ghost us")
-
-            # Ollama returns newline-delimited JSON even with stream=false
-            collected = []
-            line_count = 0
-            for line in response.text.strip().split('\n'):
-                if line:
-                    line_count += 1
-                    try:
-                        data = json.loads(line)
-                        piece = data.get("response", "")
-                        if piece:
-                            collected.append(piece)
-                            if stream:
-                                print(piece, end="", flush=True)
-                    except json.JSONDecodeError as e:
-                        log.debug(f"line {line_count} was garbagio: {line[:40]}...")
-                        continue
-
-            log.debug(f"parsed {line_count} lines from response")
-            result = "".join(collected).strip()
-            
-            if result:
-                log.debug(f"dih! got {len(result)} chars back, looks solid")
-            else:
-                log.warning("ollama returned jack shit 😭")
-                log.debug("response was emptier than my will to live")
-                
-            return result
+        return StreamChunk(piece) if piece else None
+
+    def _join(self, chunks, model: str = None) -> GenerationResult:
+        result = GenerationResult.from_chunks(chunks, model)
+        if result.text:
+            log.debug(f"dih! got {len(result.text)} chars back, looks solid")
+        else:
+            log.warning("ollama returned jack shit 😭")
+            log.debug("response was emptier than my will to live")
+        return result
+
+    def generate(self, messages: list = None, prompt: str = None, stream: bool = False, **kwargs) -> str:
+        if stream:
+            return self._print_stream(self.stream(messages, prompt, **kwargs))
+        return self.complete(messages, prompt, **kwargs).text
+
+    async def agenerate(self, messages: list = None, prompt: str = None, stream: bool = False, **kwargs) -> str:
+        if stream:
+            return await self._aprint_stream(self.astream(messages, prompt, **kwargs))
+        result = await self.acomplete(messages, prompt, **kwargs)
+        return result.text
+
+    def complete(self, messages: list = None, prompt: str = None, **kwargs) -> GenerationResult:
+        """Streamed under the hood, the final NDJSON line carries the token counts"""
+        return self._join(self.stream(messages, prompt, **kwargs), kwargs.get("model"))
+
+    async def acomplete(self, messages: list = None, prompt: str = None, **kwargs) -> GenerationResult:
+        return self._join([chunk async for chunk in self.astream(messages, prompt, **kwargs)], kwargs.get("model"))
+
+    def stream(self, messages: list = None, prompt: str = None, **kwargs):
+        """Yield StreamChunks as Ollama flushes each NDJSON line, nothing is buffered"""
+        kwargs.pop("stream", None)
+        request = self._build_payload(messages, prompt, **kwargs)
+        if request is None:
+            return
+        endpoint, payload = request
+
+        try:
+            log.debug(f"hittin up {self.base_url}{endpoint}...")
+            with self.session.post(
+                f"{self.base_url}{endpoint}",
+                json=payload,
+                headers=self.headers,
+                timeout=60,
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                log.debug("puh! got 200 back, ollama didnt ghost us")
+                for line in response.iter_lines(decode_unicode=True):
+                    chunk = self._chunk_from_line(line)
+                    if chunk is not None:
+                        yield chunk
 
         except requests.HTTPError as e:
             log.error(f"ollama threw hands: {e.response.text if hasattr(e, 'response') else e}")
             log.debug("http error, probably model doesnt exist or sumthin")
-            return ""
+            raise RuntimeError(f"Ollama request failed: {e}") from e
         except requests.RequestException as e:
             log.error(f"connection ded. is ollama even alive?? {e}")
             log.debug("cant reach ollama, did u forget to run `ollama serve` lmaoo")
-            return ""
+            raise RuntimeError(f"Could not reach Ollama at {self.base_url}: {e}") from e
+        except Exception as e:
+            log.error(f"something catastrophic happened: {e}")
+            log.debug("idk what broke but it broke hard 🔥")
+            raise RuntimeError(f"Unexpected error occurred: {e}") from e
+
+    async def astream(self, messages: list = None, prompt: str = None, **kwargs):
+        kwargs.pop("stream", None)
+        request = self._build_payload(messages, prompt, **kwargs)
+        if request is None:
+            return
+        endpoint, payload = request
+
+        try:
+            log.debug(f"hittin up {self.base_url}{endpoint} (async)...")
+            async with self.async_client.stream(
+                "POST",
+                f"{self.base_url}{endpoint}",
+                json=payload,
+                headers=self.headers
+            ) as response:
+                if response.is_error:
+                    await response.aread()
+                response.raise_for_status()
+                log.debug("puh! got 200 back, ollama didnt ghost us")
+                async for line in response.aiter_lines():
+                    chunk = self._chunk_from_line(line)
+                    if chunk is not None:
+                        yield chunk
+
+        except httpx.HTTPStatusError as e:
+            log.error(f"ollama threw hands: {e.response.text}")
+            log.debug("http error, probably model doesnt exist or sumthin")
+            raise RuntimeError(f"Ollama request failed: {e}") from e
+        except httpx.HTTPError as e:
+            log.error(f"connection ded. is ollama even alive?? {e}")
+            log.debug("cant reach ollama, did u forget to run `ollama serve` lmaoo")
+            raise RuntimeError(f"Could not reach Ollama at {self.base_url}: {e}") from e
         except Exception as e:
             log.error(f"something catastrophic happened: {e}")
             log.debug("idk what broke but it broke hard 🔥")
-            return ""
\ No newline at end of file
+            raise RuntimeError(f"Unexpected error occurred: {e}") from e
@@ -0,0 +1,88 @@
+import json
+from wrapper.types import GenerationResult
+from wrapper.utils import ColorLogger
+from wrapper.config import SHOW_LOGS
+
+log = ColorLogger(enable_debug=SHOW_LOGS)
+
+
+class OpenAIBatchMixin:
+    """
+    Batch API support shared by the OpenAI-compatible providers (OpenAI, Azure).
+    Needs self.client and self._batch_body(**params) returning the chat completion body for one request.
+    """
+    BATCH_URL = "/v1/chat/completions"
+    # per input file limits, bigger jobs are split over several batches
+    BATCH_MAX_REQUESTS = 50_000
+    BATCH_MAX_BYTES = 190 * 1024 * 1024
+    BATCH_OPTIONS = ("completion_window", "metadata")
+
+    def _create_batch(self, lines: list, completion_window: str, metadata: dict) -> str:
+        upload = self.client.files.create(file=("batch.jsonl", b"".join(lines)), purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=upload.id,
+            endpoint=self.BATCH_URL,
+            completion_window=completion_window,
+            metadata=metadata,
+        )
+        log.debug(f"batch {batch.id} submitted with {len(lines)} requests")
+        return batch.id
+
+    def submit_batch(self, items: list, completion_window: str = "24h", metadata: dict = None) -> list[str]:
+        """Upload (custom_id, params) pairs as JSONL and start the batch, returns the provider batch ids"""
+        ids, lines, size = [], [], 0
+        for custom_id, params in items:
+            record = {"custom_id": custom_id, "method": "POST", "url": self.BATCH_URL, "body": self._batch_body(**params)}
+            line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+            if lines and (len(lines) >= self.BATCH_MAX_REQUESTS or size + len(line) > self.BATCH_MAX_BYTES):
+                ids.append(self._create_batch(lines, completion_window, metadata))
+                lines, size = [], 0
+            lines.append(line)
+            size += len(line)
+        if lines:
+            ids.append(self._create_batch(lines, completion_window, metadata))
+        return ids
+
+    def batch_status(self, batch_id: str) -> dict:
+        batch = self.client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        return {
+            "id": batch.id,
+            "status": batch.status,
+            "total": counts.total if counts else None,
+            "completed": counts.completed if counts else 0,
+            "failed": counts.failed if counts else 0,
+        }
+
+    def cancel_batch(self, batch_id: str):
+        self.client.batches.cancel(batch_id)
+
+    @staticmethod
+    def _batch_result(record: dict) -> tuple:
+        """(custom_id, GenerationResult or the error) for one line of an output/error file"""
+        from openai.types.chat import ChatCompletion
+
+        custom_id = record.get("custom_id")
+        response = record.get("response") or {}
+        body = response.get("body") or {}
+        if record.get("error") or response.get("status_code", 200) >= 400:
+            error = record.get("error") or body.get("error") or body
+            return custom_id, RuntimeError(f"Batch request {custom_id} failed: {error}")
+        result = GenerationResult.from_openai(ChatCompletion.model_validate(body))
+        result.response_id = result.response_id or response.get("request_id")
+        return custom_id, result
+
+    def batch_results(self, batch_id: str):
+        """Yield (custom_id, GenerationResult or exception) from a finished batch, streamed line by line"""
+        batch = self.client.batches.retrieve(batch_id)
+        if batch.status == "failed" and not batch.output_file_id:
+            errors = [e.message for e in (batch.errors.data if batch.errors else [])]
+            raise RuntimeError(f"Batch {batch_id} failed: {'; '.join(filter(None, errors)) or 'no details'}")
+
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            with self.client.files.with_streaming_response.content(file_id) as response:
+                for line in response.iter_lines():
+                    if line:
+                        yield self._batch_result(json.loads(line))
@@ -1,65 +1,193 @@
-import sys
-from openai import OpenAI, AuthenticationError
+from openai import OpenAI, AsyncOpenAI, AuthenticationError
 from wrapper.base import BaseLLM
-from wrapper.utils import get_or_request_key, ColorLogger
+from wrapper.providers.openai_batch import OpenAIBatchMixin
+from wrapper.types import StreamChunk, GenerationResult
+from wrapper.utils import get_or_request_key, decode_embeddings, ColorLogger
 from wrapper.config import *
 
 log = ColorLogger(enable_debug=SHOW_LOGS)
 
-class OpenAIProvider(BaseLLM):
-    def __init__(self):
+class OpenAIProvider(OpenAIBatchMixin, BaseLLM):
+    EMBED_BATCH_SIZE = 2048  # API limit on inputs per request
+    DEFAULT_EMBED_MODEL = "text-embedding-3-small"
+    SDK_RETRIES = True
+
+    def __init__(self, max_retries: int = None):
+        """max_retries: retries done by the OpenAI client itself, None keeps the SDK default"""
         # auto fetch API key from env or ask user
         self.api_key = get_or_request_key("OPENAI_API_KEY", "Please enter your OpenAI API Key")
-        self.client = OpenAI(api_key=self.api_key)
+        self.client_options = {} if max_retries is None else {"max_retries": max_retries}
+        self.client = OpenAI(api_key=self.api_key, **self.client_options)
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        # one client per event loop, created on first async call so sync-only users never pay for it
+        return self._loop_client(lambda: AsyncOpenAI(api_key=self.api_key, **self.client_options))
+
+    def _build_messages(self, prompt: str = None, messages: list[dict] = None) -> list[dict]:
+        # Decide between messages and prompt
+        if messages:
+            return messages
+        # Default system + user
+        system_default = {"role": "system", "content": "You are a helpful AI assistant."}
+        user_msg = {"role": "user", "content": prompt}
+        return [system_default, user_msg]
 
     def generate(
-        self, 
+        self,
         model: str,
         prompt: str = None,
         messages: list[dict] = None,
-        temperature: float = 0.7, 
-        max_tokens: int = 200, 
-        top_p: float = 0.1, 
-        stream: bool = False, 
+        temperature: float = 0.7,
+        max_tokens: int = 200,
+        top_p: float = 0.1,
+        stream: bool = False,
         **kwargs
     ) -> str:
-        # Decide between messages and prompt
-        if messages:
-            final_messages = messages
-        else:
-            # Default system + user
-            system_default = {"role": "system", "content": "You are a helpful AI assistant."}
-            user_msg = {"role": "user", "content": prompt}
-            final_messages = [system_default, user_msg]
-
-        if not stream:
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=final_messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                top_p=top_p,
-                **kwargs
-            )
-            return response.choices[0].message.content.strip()
-        else:
-            output = []
-            with self.client.chat.completions.stream(
-                model=model,
-                messages=final_messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                top_p=top_p,
-                **kwargs
-            ) as stream_resp:
-                for event in stream_resp:
-                    if hasattr(event, "type") and event.type == "content.delta":
-                        delta_content = getattr(event, "delta", "")
-                        if delta_content:
-                            sys.stdout.write(delta_content)
-                            sys.stdout.flush()
-                            output.append(delta_content)
-            return "".join(output).strip()
+        if stream:
+            return self._print_stream(self.stream(model, prompt, messages, temperature, max_tokens, top_p, **kwargs))
+
+        return self.complete(model, prompt, messages, temperature, max_tokens, top_p, **kwargs).text
+
+    async def agenerate(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 200,
+        top_p: float = 0.1,
+        stream: bool = False,
+        **kwargs
+    ) -> str:
+        if stream:
+            return await self._aprint_stream(self.astream(model, prompt, messages, temperature, max_tokens, top_p, **kwargs))
+
+        result = await self.acomplete(model, prompt, messages, temperature, max_tokens, top_p, **kwargs)
+        return result.text
+
+    def _batch_body(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 200,
+        top_p: float = 0.1,
+        **kwargs
+    ) -> dict:
+        """Request body for one Batch API line, same defaults as complete"""
+        kwargs.pop("stream", None)
+        return {
+            "model": model,
+            "messages": list(self._build_messages(prompt, messages)),
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "top_p": top_p,
+            **kwargs
+        }
+
+    def complete(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 200,
+        top_p: float = 0.1,
+        **kwargs
+    ) -> GenerationResult:
+        """Non-streaming call that keeps usage, finish reason and the response id"""
+        kwargs.pop("stream", None)
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=self._build_messages(prompt, messages),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            top_p=top_p,
+            **kwargs
+        )
+        return GenerationResult.from_openai(response)
+
+    async def acomplete(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 200,
+        top_p: float = 0.1,
+        **kwargs
+    ) -> GenerationResult:
+        kwargs.pop("stream", None)
+        response = await self.async_client.chat.completions.create(
+            model=model,
+            messages=self._build_messages(prompt, messages),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            top_p=top_p,
+            **kwargs
+        )
+        return GenerationResult.from_openai(response)
+
+    def stream(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 200,
+        top_p: float = 0.1,
+        **kwargs
+    ):
+        """Yield StreamChunks as deltas arrive, the last one carries usage"""
+        kwargs.setdefault("stream_options", {"include_usage": True})
+        stream_resp = self.client.chat.completions.create(
+            model=model,
+            messages=self._build_messages(prompt, messages),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            top_p=top_p,
+            stream=True,
+            **kwargs
+        )
+        with stream_resp:
+            for chunk in stream_resp:
+                yield StreamChunk.from_openai(chunk)
+
+    async def astream(
+        self,
+        model: str,
+        prompt: str = None,
+        messages: list[dict] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 200,
+        top_p: float = 0.1,
+        **kwargs
+    ):
+        kwargs.setdefault("stream_options", {"include_usage": True})
+        stream_resp = await self.async_client.chat.completions.create(
+            model=model,
+            messages=self._build_messages(prompt, messages),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            top_p=top_p,
+            stream=True,
+            **kwargs
+        )
+        # closing releases the connection when the consumer stops early
+        async with stream_resp:
+            async for chunk in stream_resp:
+                yield StreamChunk.from_openai(chunk)
+
+    def embed(self, texts: list[str], model: str, **kwargs):
+        """Vectors are requested base64 encoded and decoded straight into float32, no Python floats in between"""
+        response = self.client.embeddings.create(model=model, input=texts, encoding_format="base64", **kwargs)
+        return decode_embeddings(response.data)
+
+    async def aembed(self, texts: list[str], model: str, **kwargs):
+        response = await self.async_client.embeddings.create(model=model, input=texts, encoding_format="base64", **kwargs)
+        return decode_embeddings(response.data)
 
     def list_models(self) -> list[str]:
         try:
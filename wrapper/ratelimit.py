@@ -0,0 +1,155 @@
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from wrapper.utils import ColorLogger
+from wrapper.config import SHOW_LOGS
+
+log = ColorLogger(enable_debug=SHOW_LOGS)
+
+# fallback completion budget when the call doesn't set max_tokens
+DEFAULT_COMPLETION_TOKENS = 256
+
+
+def estimate_tokens(params: dict) -> int:
+    """Rough token cost of a request: ~4 chars per prompt token plus the completion budget"""
+    chars = 0
+    for msg in params.get("messages") or []:
+        content = msg.get("content", "")
+        chars += len(content) if isinstance(content, str) else len(str(content))
+    if params.get("prompt"):
+        chars += len(params["prompt"])
+    return chars // 4 + int(params.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+
+class TokenBucket:
+    """
+    Classic token bucket that hands out reservations: a caller takes its tokens
+    immediately (the balance may go negative) and is told how long to wait,
+    so queued callers are served in arrival order.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class RateLimiter:
+    """
+    Client-side RPM/TPM limits per provider and model.
+    Calls over budget are delayed (queued) instead of being sent and bounced with a 429.
+
+    limits:    per-model overrides, e.g. {"gpt-4o": {"rpm": 500, "tpm": 30000}}
+    per_model: one budget per model, False shares one per provider. The shared budget uses the
+               lowest rpm/tpm of the defaults and every override, so it holds for any model.
+    """
+
+    def __init__(self, rpm: float = None, tpm: float = None, limits: dict = None, per_model: bool = True):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.limits = limits or {}
+        self.per_model = per_model
+        self.waited = 0.0
+        self.throttled = 0
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _limits_for(self, model: str) -> tuple:
+        if not self.per_model:
+            return self._lowest("rpm"), self._lowest("tpm")
+        override = self.limits.get(model, {})
+        return override.get("rpm", self.rpm), override.get("tpm", self.tpm)
+
+    def _lowest(self, name: str):
+        values = [v for v in [getattr(self, name)] + [o.get(name) for o in self.limits.values()] if v]
+        return min(values) if values else None
+
+    def _reserve(self, key: str, rate: float, capacity: float, amount: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.setdefault(key, TokenBucket(rate, capacity))
+        return bucket.reserve(amount)
+
+    def reserve(self, provider: str, model: str, tokens: int = 0) -> float:
+        """Take budget for one call, returns how many seconds the caller has to wait"""
+        rpm, tpm = self._limits_for(model)
+        scope = f"{provider}:{model}" if self.per_model else provider
+        wait = 0.0
+        if rpm:
+            wait = max(wait, self._reserve(f"{scope}:rpm", rpm / 60.0, rpm, 1))
+        if tpm and tokens:
+            # a single call larger than the whole minute budget still goes through, just late
+            wait = max(wait, self._reserve(f"{scope}:tpm", tpm / 60.0, tpm, min(tokens, tpm)))
+        if wait > 0:
+            with self._lock:
+                self.throttled += 1
+                self.waited += wait
+            log.debug(f"rate limit: holding {scope} for {wait:.2f}s")
+        return wait
+
+    def acquire(self, provider: str, model: str, tokens: int = 0):
+        wait = self.reserve(provider, model, tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, provider: str, model: str, tokens: int = 0):
+        import asyncio
+
+        wait = self.reserve(provider, model, tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def stats(self) -> dict:
+        return {"throttled": self.throttled, "waited_seconds": self.waited}
+
+
+class SQLiteRateLimiter(RateLimiter):
+    """
+    Same limits, but bucket state lives in a SQLite file so every process
+    on the host draws from one shared budget.
+    """
+
+    def __init__(self, path: str = None, rpm: float = None, tpm: float = None, limits: dict = None, per_model: bool = True):
+        super().__init__(rpm=rpm, tpm=tpm, limits=limits, per_model=per_model)
+        path = Path(path) if path else Path.home() / ".wrapper" / "ratelimit.db"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = str(path)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _reserve(self, key: str, rate: float, capacity: float, amount: float) -> float:
+        conn = self._conn()
+        # wall clock since monotonic clocks aren't comparable across processes
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+            tokens -= amount
+            conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return 0.0 if tokens >= 0 else -tokens / rate
@@ -0,0 +1,77 @@
+import threading
+import importlib
+
+# name -> (module, class, pip extra). Modules are imported on first use so
+# `import wrapper` never pulls in boto3/openai/anthropic/groq.
+PROVIDERS = {
+    "anthropic": ("wrapper.providers.anthropic_provider", "AnthropicProvider", "anthropic"),
+    "azure": ("wrapper.providers.azure_provider", "AzureProvider", "azure"),
+    "openai": ("wrapper.providers.openai_provider", "OpenAIProvider", "openai"),
+    "ollama": ("wrapper.providers.ollama_provider", "OllamaProvider", "ollama"),
+    "groq": ("wrapper.providers.groq_provider", "GroqProvider", "groq"),
+    "bedrock": ("wrapper.providers.bedrock_provider", "BedrockProvider", "bedrock"),
+}
+
+_instances = {}
+_lock = threading.Lock()
+
+
+def _registry_key(name: str, kwargs: dict):
+    """Hashable key for (name, config), None when a config value can't be hashed"""
+    key = (name, tuple(sorted(kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def load_provider_class(name: str):
+    """Import and return the provider class, the SDK is only loaded here"""
+    name = name.lower()
+    if name not in PROVIDERS:
+        raise ValueError(f"Provider {name} not supported yet")
+    module_name, class_name, extra = PROVIDERS[name]
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError as e:
+        raise ImportError(
+            f"Provider '{name}' needs an optional dependency ({e.name}). "
+            f"Install it with: pip install \"wrapper[{extra}]\""
+        ) from e
+    return getattr(module, class_name)
+
+
+def create_provider(name: str, **kwargs):
+    """Build a fresh provider instance, bypassing the registry"""
+    return load_provider_class(name)(**kwargs)
+
+
+def get_provider(name: str, **kwargs):
+    """
+    Process-wide provider instance for (name, config).
+    The first call pays for .env lookup and SDK client setup, later ones get the same object.
+    Configs with unhashable values get a fresh instance every time.
+    """
+    name = name.lower()
+    key = _registry_key(name, kwargs)
+    if key is None:
+        # unhashable config (a dict, a list, ...), can't be matched safely so it isn't shared
+        return create_provider(name, **kwargs)
+
+    instance = _instances.get(key)
+    if instance is not None:
+        return instance
+
+    with _lock:
+        instance = _instances.get(key)
+        if instance is None:
+            instance = create_provider(name, **kwargs)
+            _instances[key] = instance
+    return instance
+
+
+def clear_registry():
+    """Forget every cached provider, next get_provider builds new ones"""
+    with _lock:
+        _instances.clear()
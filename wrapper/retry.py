@@ -0,0 +1,197 @@
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from wrapper.utils import ColorLogger
+from wrapper.config import SHOW_LOGS
+
+log = ColorLogger(enable_debug=SHOW_LOGS)
+
+# 429 rate limited, 408 request timeout, 409 lock conflicts, 5xx server side,
+# 529 is Anthropic's "overloaded"
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+# transport level failures across openai/anthropic/groq, requests, httpx and botocore
+RETRYABLE_EXCEPTIONS = {
+    "APIConnectionError", "APITimeoutError",
+    "ConnectionError", "Timeout", "ConnectTimeout", "ReadTimeout", "ChunkedEncodingError",
+    "ConnectError", "ReadError", "WriteError", "RemoteProtocolError", "PoolTimeout", "WriteTimeout",
+    "EndpointConnectionError", "ConnectTimeoutError", "ReadTimeoutError", "ConnectionClosedError",
+}
+
+
+def parse_retry_after(value) -> float:
+    """Retry-After is either seconds or an HTTP date"""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _status_and_headers(exc):
+    """Pull an HTTP status and headers off SDK / requests / httpx exceptions"""
+    status = getattr(exc, "status_code", None)
+    response = getattr(exc, "response", None)
+    headers = None
+    if response is not None and not isinstance(response, dict):
+        status = status or getattr(response, "status_code", None)
+        headers = getattr(response, "headers", None)
+    return status, headers
+
+
+def _error_chain(exc):
+    # providers wrap SDK errors with `raise RuntimeError(...) from e`, so the original is in __cause__.
+    # __context__ isn't followed: an error raised while handling a 429 is not a 429 itself
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        exc = exc.__cause__
+
+
+def classify_error(exc: Exception) -> tuple:
+    """
+    Decide whether a failed call is worth retrying.
+    Returns (retryable, retry_after_seconds or None).
+    """
+    for err in _error_chain(exc):
+        status, headers = _status_and_headers(err)
+        if status is not None:
+            retry_after = None
+            if headers is not None:
+                retry_after = parse_retry_after(headers.get("retry-after"))
+                if retry_after is None and headers.get("retry-after-ms"):
+                    retry_after = parse_retry_after(headers.get("retry-after-ms"))
+                    retry_after = retry_after / 1000 if retry_after is not None else None
+            return status in RETRYABLE_STATUS, retry_after
+        if type(err).__name__ in RETRYABLE_EXCEPTIONS:
+            return True, None
+    return False, None
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter.
+    Retry-After from the provider wins over the computed delay (capped at max_delay).
+    """
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 30.0, jitter: bool = True):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.calls = 0
+        self.retries = 0
+        self.gave_up = 0
+        self._lock = threading.Lock()
+
+    def delay(self, attempt: int, retry_after: float = None) -> float:
+        backoff = min(self.max_delay, self.base_delay * (2 ** attempt))
+        if self.jitter:
+            backoff = random.uniform(0, backoff)
+        if retry_after is not None:
+            return min(self.max_delay, max(retry_after, backoff))
+        return backoff
+
+    def _count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "retries": self.retries, "gave_up": self.gave_up}
+
+    def _next_delay(self, exc: Exception, attempt: int, classify) -> float:
+        """Delay before the next attempt, or None to re-raise"""
+        retryable, retry_after = classify(exc)
+        if not retryable:
+            return None
+        if attempt >= self.max_retries:
+            self._count("gave_up")
+            return None
+        self._count("retries")
+        wait = self.delay(attempt, retry_after)
+        log.warning(f"retrying in {wait:.2f}s (attempt {attempt + 1}/{self.max_retries}): {exc}")
+        return wait
+
+    def call(self, fn, classify=classify_error, on_retry=None):
+        """Run fn() until it succeeds, fails with a non-retryable error or retries run out"""
+        self._count("calls")
+        attempt = 0
+        while True:
+            try:
+                return fn()
+            except Exception as e:
+                wait = self._next_delay(e, attempt, classify)
+                if wait is None:
+                    raise
+                if on_retry is not None:
+                    on_retry(attempt + 1, e)
+                time.sleep(wait)
+                attempt += 1
+
+    async def acall(self, afn, classify=classify_error, on_retry=None):
+        import asyncio
+
+        self._count("calls")
+        attempt = 0
+        while True:
+            try:
+                return await afn()
+            except Exception as e:
+                wait = self._next_delay(e, attempt, classify)
+                if wait is None:
+                    raise
+                if on_retry is not None:
+                    on_retry(attempt + 1, e)
+                await asyncio.sleep(wait)
+                attempt += 1
+
+    def stream(self, make_stream, classify=classify_error, on_retry=None):
+        """
+        Retry a stream only while nothing has been yielded yet,
+        once text went out a mid-stream error is raised to the caller.
+        """
+        self._count("calls")
+        attempt = 0
+        while True:
+            started = False
+            try:
+                for chunk in make_stream():
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                wait = None if started else self._next_delay(e, attempt, classify)
+                if wait is None:
+                    raise
+                if on_retry is not None:
+                    on_retry(attempt + 1, e)
+                time.sleep(wait)
+                attempt += 1
+
+    async def astream(self, make_stream, classify=classify_error, on_retry=None):
+        import asyncio
+
+        self._count("calls")
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async for chunk in make_stream():
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                wait = None if started else self._next_delay(e, attempt, classify)
+                if wait is None:
+                    raise
+                if on_retry is not None:
+                    on_retry(attempt + 1, e)
+                await asyncio.sleep(wait)
+                attempt += 1
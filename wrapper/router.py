@@ -0,0 +1,340 @@
+import time
+import asyncio
+import itertools
+import threading
+from wrapper.base import BaseLLM
+from wrapper.types import GenerationResult
+from wrapper.registry import get_provider
+from wrapper.ratelimit import estimate_tokens
+from wrapper.retry import _error_chain
+from wrapper.hedge import _END, _close_when_idle
+from wrapper.utils import ColorLogger
+from wrapper.config import SHOW_LOGS
+
+log = ColorLogger(enable_debug=SHOW_LOGS)
+
+STRATEGIES = ("priority", "latency", "errors", "cost", "round_robin")
+
+# bad arguments from the caller, not a sign that the backend is unhealthy
+CALLER_ERRORS = (ValueError, TypeError)
+
+
+async def _prepend(first, chunks):
+    yield first
+    async for chunk in chunks:
+        yield chunk
+
+
+class ProviderStats:
+    """Live health of one backend: EWMA latency and error rate plus a failure cooldown"""
+
+    def __init__(self, alpha: float = 0.3):
+        self.alpha = alpha
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.latency = None
+        self.error_rate = 0.0
+        self.cooldown_until = 0.0
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def success(self, latency: float):
+        with self._lock:
+            self.calls += 1
+            self.consecutive_failures = 0
+            self.latency = latency if self.latency is None else self.alpha * latency + (1 - self.alpha) * self.latency
+            self.error_rate = (1 - self.alpha) * self.error_rate
+
+    def failure(self, error: Exception, max_failures: int, cooldown: float):
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.error_rate = self.alpha + (1 - self.alpha) * self.error_rate
+            self.last_error = repr(error)
+            if self.consecutive_failures >= max_failures:
+                self.cooldown_until = time.monotonic() + cooldown
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "error_rate": round(self.error_rate, 4),
+            "latency": self.latency,
+            "healthy": self.healthy,
+            "last_error": self.last_error,
+        }
+
+
+class Router(BaseLLM):
+    """
+    Spreads calls over several providers and fails over when one errors or times out.
+
+    strategy:  priority (list order), latency (lowest EWMA), errors (lowest error rate),
+               cost (cheapest per `costs`), round_robin
+    models:    model name per provider, e.g. {"groq": "llama-3.3-70b-versatile", "openai": "gpt-4o-mini"}
+    costs:     relative price per provider, only used by the cost strategy
+    timeout:   seconds before an attempt is abandoned and the next provider is tried
+    max_failures / cooldown: consecutive failures that bench a provider, and for how long
+    provider_kwargs: constructor kwargs per provider, e.g. {"bedrock": {"prompt_cache": True}}
+
+    rate_limit and metrics (set by Wrapper) are applied per attempt, keyed on the backend and its model.
+
+    Caller errors (ValueError, TypeError) are raised right away, they'd fail on every backend.
+    """
+
+    def __init__(
+        self,
+        providers: list,
+        strategy: str = "priority",
+        models: dict = None,
+        costs: dict = None,
+        timeout: float = None,
+        max_failures: int = 3,
+        cooldown: float = 30.0,
+        provider_kwargs: dict = None,
+    ):
+        if not providers:
+            raise ValueError("Router needs at least one provider")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown routing strategy '{strategy}', pick one of {', '.join(STRATEGIES)}")
+        self.names = [p.lower() for p in providers]
+        provider_kwargs = {name.lower(): kwargs for name, kwargs in (provider_kwargs or {}).items()}
+        self.providers = {name: get_provider(name, **provider_kwargs.get(name, {})) for name in self.names}
+        self.strategy = strategy
+        self.models = models or {}
+        self.costs = costs or {}
+        self.timeout = timeout
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.health = {name: ProviderStats() for name in self.names}
+        self._rr = itertools.count()
+        self._executor = None
+        self._lock = threading.Lock()
+        self.rate_limit = None
+        self.metrics = None
+
+    def _order(self) -> list:
+        """Providers to try for the next call, benched ones go last as a final resort"""
+        names = list(self.names)
+        if self.strategy == "round_robin":
+            shift = next(self._rr) % len(names)
+            names = names[shift:] + names[:shift]
+        elif self.strategy == "latency":
+            # unmeasured providers sort first so every backend gets sampled
+            names.sort(key=lambda n: self.health[n].latency or 0.0)
+        elif self.strategy == "errors":
+            names.sort(key=lambda n: self.health[n].error_rate)
+        elif self.strategy == "cost":
+            names.sort(key=lambda n: (self.costs.get(n, float("inf")), self.health[n].latency or 0.0))
+        healthy = [n for n in names if self.health[n].healthy]
+        return healthy + [n for n in names if n not in healthy]
+
+    def _model_for(self, name: str, model):
+        if isinstance(model, dict):
+            return model.get(name) or self.models.get(name)
+        return self.models.get(name, model)
+
+    def _failed(self, name: str, error: Exception):
+        # remembered so classify_error can use the rules of the provider that actually failed
+        try:
+            error.router_provider = name
+        except AttributeError:
+            pass
+        self.health[name].failure(error, self.max_failures, self.cooldown)
+        log.warning(f"router: {name} failed ({error!r}), failing over")
+
+    def _throttle(self, name: str, model, kwargs: dict):
+        if self.rate_limit is not None:
+            self.rate_limit.acquire(name, model, estimate_tokens(kwargs))
+
+    async def _athrottle(self, name: str, model, kwargs: dict):
+        if self.rate_limit is not None:
+            await self.rate_limit.aacquire(name, model, estimate_tokens(kwargs))
+
+    def _track(self, name: str, model, stream: bool = False):
+        return self.metrics.track(name, model, stream) if self.metrics is not None else None
+
+    @staticmethod
+    def _done(record, result: GenerationResult = None, error: Exception = None):
+        if record is not None:
+            if result is not None:
+                record.set_usage(result.usage)
+            record.finish(error)
+
+    def _pool(self):
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(thread_name_prefix="wrapper-router")
+        return self._executor
+
+    def _run(self, fn, **kwargs):
+        if self.timeout is None:
+            return fn(**kwargs)
+        # the abandoned call keeps running in its thread, we just stop waiting for it
+        return self._pool().submit(fn, **kwargs).result(timeout=self.timeout)
+
+    def _first_chunk(self, chunks):
+        """next(chunks, _END), bounded by timeout like _run"""
+        if self.timeout is None:
+            return next(chunks, _END)
+        future = self._pool().submit(next, chunks, _END)
+        try:
+            return future.result(timeout=self.timeout)
+        except Exception:
+            # a generator can't be closed while next() runs in the worker, close it once that returns
+            future.add_done_callback(_close_when_idle(chunks))
+            raise
+
+    def classify_error(self, exc: Exception) -> tuple:
+        # "All providers failed" chains the last backend error, which _failed tagged with its provider
+        for err in _error_chain(exc):
+            name = getattr(err, "router_provider", None)
+            if name in self.providers:
+                return self.providers[name].classify_error(err)
+        return super().classify_error(exc)
+
+    def stats(self) -> dict:
+        return {name: self.health[name].snapshot() for name in self.names}
+
+    def generate(self, model=None, stream: bool = False, **kwargs) -> str:
+        if stream:
+            return self._print_stream(self.stream(model, **kwargs))
+        return self.complete(model, **kwargs).text
+
+    async def agenerate(self, model=None, stream: bool = False, **kwargs) -> str:
+        if stream:
+            return await self._aprint_stream(self.astream(model, **kwargs))
+        result = await self.acomplete(model, **kwargs)
+        return result.text
+
+    def complete(self, model=None, **kwargs) -> GenerationResult:
+        """Result from the first provider that answers, its name is set on result.provider"""
+        kwargs.pop("stream", None)
+        last_error = None
+        for name in self._order():
+            backend_model = self._model_for(name, model)
+            self._throttle(name, backend_model, kwargs)
+            record = self._track(name, backend_model)
+            start = time.perf_counter()
+            try:
+                result = self._run(self.providers[name].complete, model=backend_model, **kwargs)
+            except CALLER_ERRORS as e:
+                self._done(record, error=e)
+                raise
+            except Exception as e:
+                self._done(record, error=e)
+                self._failed(name, e)
+                last_error = e
+                continue
+            self.health[name].success(time.perf_counter() - start)
+            self._done(record, result)
+            result.provider = name
+            return result
+        raise RuntimeError(f"All providers failed, last error: {last_error}") from last_error
+
+    async def acomplete(self, model=None, **kwargs) -> GenerationResult:
+        kwargs.pop("stream", None)
+        last_error = None
+        for name in self._order():
+            backend_model = self._model_for(name, model)
+            await self._athrottle(name, backend_model, kwargs)
+            record = self._track(name, backend_model)
+            start = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(
+                    self.providers[name].acomplete(model=backend_model, **kwargs),
+                    self.timeout
+                )
+            except CALLER_ERRORS as e:
+                self._done(record, error=e)
+                raise
+            except Exception as e:
+                self._done(record, error=e)
+                self._failed(name, e)
+                last_error = e
+                continue
+            self.health[name].success(time.perf_counter() - start)
+            self._done(record, result)
+            result.provider = name
+            return result
+        raise RuntimeError(f"All providers failed, last error: {last_error}") from last_error
+
+    def stream(self, model=None, **kwargs):
+        """Fails over until a provider produces its first chunk, after that the stream is committed"""
+        last_error = None
+        for name in self._order():
+            backend_model = self._model_for(name, model)
+            self._throttle(name, backend_model, kwargs)
+            record = self._track(name, backend_model, stream=True)
+            start = time.perf_counter()
+            chunks = self.providers[name].stream(model=backend_model, **kwargs)
+            try:
+                # only the wait for the first chunk is bounded by timeout
+                first = self._first_chunk(chunks)
+            except CALLER_ERRORS as e:
+                self._done(record, error=e)
+                raise
+            except Exception as e:
+                self._done(record, error=e)
+                self._failed(name, e)
+                last_error = e
+                continue
+            self.health[name].success(time.perf_counter() - start)
+            if first is _END:
+                self._done(record)
+                return
+            rest = itertools.chain((first,), chunks)
+            if record is not None:
+                rest = self.metrics.meter(rest, record, restart=False)
+            try:
+                yield from rest
+            finally:
+                chunks.close()
+            return
+        raise RuntimeError(f"All providers failed, last error: {last_error}") from last_error
+
+    async def astream(self, model=None, **kwargs):
+        last_error = None
+        for name in self._order():
+            backend_model = self._model_for(name, model)
+            await self._athrottle(name, backend_model, kwargs)
+            record = self._track(name, backend_model, stream=True)
+            start = time.perf_counter()
+            chunks = self.providers[name].astream(model=backend_model, **kwargs)
+            try:
+                # only the wait for the first chunk is bounded by timeout
+                first = await asyncio.wait_for(chunks.__anext__(), self.timeout)
+            except StopAsyncIteration:
+                self.health[name].success(time.perf_counter() - start)
+                self._done(record)
+                return
+            except CALLER_ERRORS as e:
+                self._done(record, error=e)
+                raise
+            except Exception as e:
+                self._done(record, error=e)
+                await chunks.aclose()
+                self._failed(name, e)
+                last_error = e
+                continue
+            self.health[name].success(time.perf_counter() - start)
+            rest = _prepend(first, chunks)
+            if record is not None:
+                rest = self.metrics.ameter(rest, record, restart=False)
+            try:
+                async for chunk in rest:
+                    yield chunk
+            finally:
+                await rest.aclose()
+                await chunks.aclose()
+            return
+        raise RuntimeError(f"All providers failed, last error: {last_error}") from last_error
@@ -0,0 +1,204 @@
+import time
+import threading
+from wrapper.cache import make_cache_key
+from wrapper.core import WrapperEmbed
+from wrapper.metrics import Histogram, LATENCY_BUCKETS
+from wrapper.utils import ColorLogger, require_numpy
+from wrapper.config import SHOW_LOGS, SEMANTIC_CACHE_MODEL, SEMANTIC_CACHE_THRESHOLD
+
+log = ColorLogger(enable_debug=SHOW_LOGS)
+
+
+class SemanticCache:
+    """
+    Answers paraphrased prompts from earlier responses. The last user message is embedded and
+    compared (cosine) with stored prompts that share the rest of the request: provider, model,
+    sampling params, system prompt and earlier turns.
+
+    The index is a flat float32 matrix, one matrix-vector product per lookup. That is exact and
+    takes about a millisecond per 10k entries, so it stays well under the embedding call.
+
+    embedder:  WrapperEmbed used for prompts, defaults to Ollama with SEMANTIC_CACHE_MODEL
+    threshold: cosine similarity needed for a hit, raise it if unrelated prompts start matching
+    max_size:  entries kept, the least recently used one is evicted first
+    ttl:       seconds an entry stays valid, None keeps entries until evicted
+
+    A failing embedding call is logged and treated as a miss, generate still goes to the provider.
+    """
+
+    def __init__(
+        self,
+        embedder: WrapperEmbed = None,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_size: int = 10_000,
+        ttl: float = None,
+    ):
+        self.embedder = embedder or WrapperEmbed("ollama", model=SEMANTIC_CACHE_MODEL)
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.lookup_latency = Histogram(LATENCY_BUCKETS)
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        np = require_numpy()
+        self._size = 0
+        self._vectors = None  # (capacity, dim), allocated on the first add
+        self._namespaces = np.empty(0, dtype=np.int64)
+        self._created = np.empty(0)
+        self._accessed = np.empty(0)
+        self._answers = []
+
+    def split(self, provider: str, params: dict):
+        """(namespace, prompt) for a call that can be matched, None otherwise"""
+        messages = params.get("messages") or []
+        if not messages or messages[-1].get("role") != "user":
+            return None
+        prompt = messages[-1].get("content")
+        if not isinstance(prompt, str) or not prompt.strip():
+            return None
+        # everything but the last question has to be identical, so it goes into the namespace
+        digest = make_cache_key(provider, {**params, "messages": list(messages[:-1])}).rsplit(":", 1)[1]
+        return int(digest[:15], 16), prompt
+
+    def _match(self, namespace: int, vector):
+        np = require_numpy()
+        with self._lock:
+            n = self._size
+            if n == 0 or self._vectors.shape[1] != vector.shape[0]:
+                return None, None
+            valid = self._namespaces[:n] == namespace
+            if self.ttl is not None:
+                valid &= self._created[:n] >= time.time() - self.ttl
+            if not valid.any():
+                return None, None
+            scores = np.where(valid, self._vectors[:n] @ vector, -np.inf)
+            row = int(scores.argmax())
+            if scores[row] < self.threshold:
+                return None, float(scores[row])
+            self._accessed[row] = time.monotonic()
+            return self._answers[row], float(scores[row])
+
+    def _record(self, answer, score, start: float):
+        with self._lock:
+            self.lookup_latency.observe(time.perf_counter() - start)
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if answer is not None:
+            log.debug(f"semantic cache hit, similarity {score:.3f}")
+
+    def lookup(self, namespace: int, prompt: str) -> tuple:
+        """(cached answer or None, prompt vector to pass to add() on a miss)"""
+        start = time.perf_counter()
+        try:
+            vector = self.embedder.embed(prompt, normalize=True)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            log.warning(f"semantic cache: embedding failed, skipping lookup: {e}")
+            return None, None
+        answer, score = self._match(namespace, vector)
+        self._record(answer, score, start)
+        return answer, vector
+
+    async def alookup(self, namespace: int, prompt: str) -> tuple:
+        start = time.perf_counter()
+        try:
+            vector = await self.embedder.aembed(prompt, normalize=True)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            log.warning(f"semantic cache: embedding failed, skipping lookup: {e}")
+            return None, None
+        answer, score = self._match(namespace, vector)
+        self._record(answer, score, start)
+        return answer, vector
+
+    def _keep(self, rows):
+        """Compact the index down to the given rows"""
+        n = len(rows)
+        self._vectors[:n] = self._vectors[rows]
+        self._namespaces[:n] = self._namespaces[rows]
+        self._created[:n] = self._created[rows]
+        self._accessed[:n] = self._accessed[rows]
+        self._answers = [self._answers[i] for i in rows]
+        self._size = n
+
+    def _move(self, src: int, dst: int):
+        self._vectors[dst] = self._vectors[src]
+        self._namespaces[dst] = self._namespaces[src]
+        self._created[dst] = self._created[src]
+        self._accessed[dst] = self._accessed[src]
+        self._answers[dst] = self._answers[src]
+        self._answers.pop()
+        self._size -= 1
+
+    def _grow(self, dim: int):
+        np = require_numpy()
+        capacity = min(self.max_size, max(64, 2 * self._size))
+        vectors = np.empty((capacity, dim), dtype=np.float32)
+        if self._vectors is not None:
+            vectors[:self._size] = self._vectors[:self._size]
+        self._vectors = vectors
+        for name in ("_namespaces", "_created", "_accessed"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def add(self, namespace: int, vector, answer: str):
+        """Store an answer under the prompt vector returned by lookup"""
+        if vector is None or not answer:
+            return
+        np = require_numpy()
+        with self._lock:
+            if self._vectors is not None and self._vectors.shape[1] != vector.shape[0]:
+                # the embedding model changed, old vectors can't be compared anymore
+                self._reset()
+            n = self._size
+            if self.ttl is not None and n:
+                fresh = self._created[:n] >= time.time() - self.ttl
+                if not fresh.all():
+                    self._keep(np.flatnonzero(fresh))
+            if self._size >= self.max_size:
+                # evict the least recently used entry, the last row takes its place
+                self._move(self._size - 1, int(self._accessed[:self._size].argmin()))
+            if self._vectors is None or self._size >= len(self._vectors):
+                self._grow(vector.shape[0])
+
+            row = self._size
+            self._vectors[row] = vector
+            self._namespaces[row] = namespace
+            self._created[row] = time.time()
+            self._accessed[row] = time.monotonic()
+            self._answers.append(answer)
+            self._size += 1
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": self.hit_rate,
+            "size": len(self),
+            "lookup_latency": self.lookup_latency.snapshot(),
+        }
+
+    def clear(self):
+        """Drop every entry and give the index memory back"""
+        with self._lock:
+            self._reset()
+
+    def __len__(self):
+        return self._size
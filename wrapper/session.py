@@ -0,0 +1,47 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from wrapper.config import HTTP_POOL_SIZE, HTTP_MAX_RETRIES
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def get_session(name: str, pool_size: int = None, max_retries: int = None) -> requests.Session:
+    """
+    Shared keep-alive requests.Session per provider, so repeated calls reuse TCP/TLS connections.
+    Connection errors and 502/503/504 on idempotent methods are retried by the adapter,
+    POSTs (generations) are only retried when the connection could not be opened.
+    """
+    pool_size = pool_size or HTTP_POOL_SIZE
+    max_retries = HTTP_MAX_RETRIES if max_retries is None else max_retries
+    key = (name, pool_size, max_retries)
+
+    session = _sessions.get(key)
+    if session is not None:
+        return session
+
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            retry = Retry(
+                total=max_retries,
+                backoff_factor=0.3,
+                status_forcelist=(502, 503, 504),
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[key] = session
+    return session
+
+
+def close_sessions():
+    """Close every pooled session, mostly useful in tests and at shutdown"""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,219 @@
+import time
+
+
+class StreamChunk:
+    """One streamed piece of a generation, same shape for every provider"""
+    __slots__ = ("text", "finish_reason", "usage")
+
+    def __init__(self, text: str = "", finish_reason: str = None, usage: dict = None):
+        self.text = text
+        self.finish_reason = finish_reason
+        self.usage = usage
+
+    @classmethod
+    def from_openai(cls, chunk):
+        """Build from an OpenAI-style chat.completion.chunk (OpenAI, Azure, Groq)"""
+        text, finish_reason = "", None
+        if chunk.choices:
+            choice = chunk.choices[0]
+            text = getattr(choice.delta, "content", None) or ""
+            finish_reason = choice.finish_reason
+
+        # OpenAI sends usage on a trailing chunk, Groq tucks it under x_groq
+        usage = getattr(chunk, "usage", None)
+        if usage is None and getattr(chunk, "x_groq", None) is not None:
+            usage = getattr(chunk.x_groq, "usage", None)
+        if usage is not None:
+            usage = _openai_usage(usage)
+        return cls(text, finish_reason, usage)
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return f"StreamChunk(text={self.text!r}, finish_reason={self.finish_reason!r}, usage={self.usage!r})"
+
+
+def _openai_usage(usage) -> dict:
+    result = {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+    }
+    # automatic prompt caching, reported as a part of prompt_tokens
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) if details is not None else None
+    if cached is not None:
+        result["cache_read_tokens"] = cached
+    return result
+
+
+ANTHROPIC_USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")
+
+
+def anthropic_usage(usage) -> dict:
+    """
+    Anthropic/Bedrock usage (SDK object or dict) in the common shape.
+    Anthropic counts cache reads/writes separately from input_tokens, here prompt_tokens
+    includes them like OpenAI's does, with the split in cache_read_tokens/cache_write_tokens.
+    """
+    if not isinstance(usage, dict):
+        usage = {name: getattr(usage, name, None) for name in ANTHROPIC_USAGE_FIELDS}
+    cache_read = usage.get("cache_read_input_tokens") or 0
+    cache_write = usage.get("cache_creation_input_tokens") or 0
+    prompt_tokens = (usage.get("input_tokens") or 0) + cache_read + cache_write
+    completion_tokens = usage.get("output_tokens") or 0
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "cache_read_tokens": cache_read,
+        "cache_write_tokens": cache_write,
+    }
+
+
+def converse_usage(usage: dict) -> dict:
+    """Bedrock Converse usage in the common shape, cache reads/writes are folded into prompt_tokens the same way"""
+    cache_read = usage.get("cacheReadInputTokens") or 0
+    cache_write = usage.get("cacheWriteInputTokens") or 0
+    prompt_tokens = (usage.get("inputTokens") or 0) + cache_read + cache_write
+    completion_tokens = usage.get("outputTokens") or 0
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "cache_read_tokens": cache_read,
+        "cache_write_tokens": cache_write,
+    }
+
+
+class GenerationResult:
+    """Text plus what the provider reported about it, returned by generate(..., return_result=True)"""
+    __slots__ = (
+        "text", "provider", "model", "finish_reason", "prompt_tokens", "completion_tokens",
+        "cache_read_tokens", "cache_write_tokens", "response_id", "latency", "ttft", "cached",
+    )
+
+    def __init__(
+        self,
+        text: str = "",
+        provider: str = None,
+        model: str = None,
+        finish_reason: str = None,
+        prompt_tokens: int = None,
+        completion_tokens: int = None,
+        cache_read_tokens: int = None,
+        cache_write_tokens: int = None,
+        response_id: str = None,
+        latency: float = None,
+        ttft: float = None,
+        cached: bool = False,
+    ):
+        self.text = text
+        self.provider = provider
+        self.model = model
+        self.finish_reason = finish_reason
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.cache_read_tokens = cache_read_tokens
+        self.cache_write_tokens = cache_write_tokens
+        self.response_id = response_id
+        self.latency = latency
+        self.ttft = ttft
+        self.cached = cached
+
+    @property
+    def total_tokens(self) -> int:
+        if self.prompt_tokens is None and self.completion_tokens is None:
+            return None
+        return (self.prompt_tokens or 0) + (self.completion_tokens or 0)
+
+    @property
+    def usage(self) -> dict:
+        """Same shape as StreamChunk.usage, None when the provider reported nothing"""
+        if self.total_tokens is None:
+            return None
+        usage = {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+        }
+        if self.cache_read_tokens is not None:
+            usage["cache_read_tokens"] = self.cache_read_tokens
+        if self.cache_write_tokens is not None:
+            usage["cache_write_tokens"] = self.cache_write_tokens
+        return usage
+
+    @property
+    def tokens_per_second(self) -> float:
+        if not self.completion_tokens or not self.latency:
+            return None
+        return self.completion_tokens / self.latency
+
+    def set_usage(self, usage: dict):
+        if usage:
+            self.prompt_tokens = usage.get("prompt_tokens", self.prompt_tokens)
+            self.completion_tokens = usage.get("completion_tokens", self.completion_tokens)
+            self.cache_read_tokens = usage.get("cache_read_tokens", self.cache_read_tokens)
+            self.cache_write_tokens = usage.get("cache_write_tokens", self.cache_write_tokens)
+
+    @classmethod
+    def from_openai(cls, response):
+        """Build from an OpenAI-style chat.completion (OpenAI, Azure, Groq)"""
+        choice = response.choices[0]
+        usage = getattr(response, "usage", None)
+        result = cls(
+            (choice.message.content or "").strip(),
+            model=getattr(response, "model", None),
+            finish_reason=choice.finish_reason,
+            response_id=getattr(response, "id", None),
+        )
+        if usage is not None:
+            result.set_usage(_openai_usage(usage))
+        return result
+
+    @classmethod
+    def from_chunks(cls, chunks, model: str = None):
+        """Fold a finished StreamChunk iterable into one result"""
+        result = cls(model=model)
+        pieces = []
+        for chunk in chunks:
+            pieces.append(chunk.text)
+            result.finish_reason = chunk.finish_reason or result.finish_reason
+            result.set_usage(chunk.usage)
+        result.text = "".join(pieces).strip()
+        return result
+
+    def collect(self, chunks):
+        """Pass chunks through while recording finish reason, usage, TTFT and latency on this result"""
+        start = time.perf_counter()
+        for chunk in chunks:
+            if chunk.text and self.ttft is None:
+                self.ttft = time.perf_counter() - start
+            self.finish_reason = chunk.finish_reason or self.finish_reason
+            self.set_usage(chunk.usage)
+            yield chunk
+        self.latency = time.perf_counter() - start
+
+    async def acollect(self, chunks):
+        start = time.perf_counter()
+        async for chunk in chunks:
+            if chunk.text and self.ttft is None:
+                self.ttft = time.perf_counter() - start
+            self.finish_reason = chunk.finish_reason or self.finish_reason
+            self.set_usage(chunk.usage)
+            yield chunk
+        self.latency = time.perf_counter() - start
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        latency = f"{self.latency:.3f}s" if self.latency is not None else None
+        return (
+            f"GenerationResult(text={self.text[:40]!r}, provider={self.provider!r}, model={self.model!r}, "
+            f"finish_reason={self.finish_reason!r}, tokens={self.prompt_tokens}/{self.completion_tokens}, latency={latency})"
+        )
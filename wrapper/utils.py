@@ -1,4 +1,5 @@
 import os
+import re
 import sys
 from pathlib import Path
 from dotenv import load_dotenv, find_dotenv
@@ -24,12 +25,26 @@ def set_key(env_file: str, key: str, value: str):
         f.writelines(lines)
 
 
+# working directory -> .env found there, misses aren't kept so a .env created later is picked up
+_dotenv_paths = {}
+
+
+def _load_dotenv_once(cwd: str) -> str:
+    """find_dotenv walks the filesystem, so locate and load .env once per working directory"""
+    dotenv_path = _dotenv_paths.get(cwd)
+    if dotenv_path is None:
+        # search from cwd, the default starts from the calling module's directory
+        dotenv_path = find_dotenv(usecwd=True)
+        if dotenv_path:
+            load_dotenv(dotenv_path)
+            _dotenv_paths[cwd] = dotenv_path
+    return dotenv_path
+
+
 def get_or_request_key(env_var_name: str, prompt_message: str) -> str:
     """Fetch key from env, prompt if missing."""
-    dotenv_path = find_dotenv()
-    if dotenv_path:
-        load_dotenv(dotenv_path)
-    else:
+    dotenv_path = _load_dotenv_once(os.getcwd())
+    if not dotenv_path:
         Path(".env").touch()
         load_dotenv()
     key = os.getenv(env_var_name)
@@ -48,11 +63,190 @@ def get_or_request_key(env_var_name: str, prompt_message: str) -> str:
 
 def get_key_silent(env_var_name: str):
     """Return env key if exists, else None. No prompts."""
-    dotenv_path = find_dotenv()
-    if dotenv_path:
-        load_dotenv(dotenv_path)
+    _load_dotenv_once(os.getcwd())
     return os.getenv(env_var_name)
 
+
+# C0 controls except \t \n \r, DEL and C1 controls
+_CONTROL_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]")
+_ASCII_CONTROL = str.maketrans(dict.fromkeys([*range(0x00, 0x09), 0x0b, 0x0c, *range(0x0e, 0x20), 0x7f]))
+VALID_ROLES = frozenset(("system", "user", "assistant"))
+
+
+def sanitize_text(text) -> str:
+    """Drop control characters and trim, returns the same string when there is nothing to strip"""
+    if not isinstance(text, str):
+        return str(text)
+    if text.isascii():
+        # isascii() is O(1) and str.translate has an ASCII fast path, ~5x quicker than a regex scan
+        cleaned = text.translate(_ASCII_CONTROL)
+        if len(cleaned) != len(text):
+            text = cleaned
+    elif _CONTROL_CHARS.search(text) is not None:
+        text = _CONTROL_CHARS.sub("", text)
+    return text.strip()
+
+
+class CleanMessages(list):
+    """
+    A conversation that has already been validated and sanitized.
+    Providers only scan messages appended since the last call, so keep
+    passing the same object turn after turn instead of rebuilding the list.
+    Removing, inserting or replacing messages resets that state. Editing a message
+    dict in place is not noticed, use mark_dirty() after doing that.
+    """
+
+    def __init__(self, messages=()):
+        super().__init__(messages)
+        self.clean = 0
+        self._split = None
+
+    def mark_dirty(self):
+        self.clean = 0
+        self._split = None
+
+    def __setitem__(self, index, value):
+        # sanitize_messages replaces not yet scanned messages, anything earlier invalidates the scan
+        if isinstance(index, slice):
+            self.mark_dirty()
+        else:
+            i = index + len(self) if index < 0 else index
+            seen = self._split[2] if self._split is not None else 0
+            if i < self.clean or i < seen:
+                self.mark_dirty()
+        super().__setitem__(index, value)
+
+    def __delitem__(self, index):
+        self.mark_dirty()
+        super().__delitem__(index)
+
+    def pop(self, index=-1):
+        self.mark_dirty()
+        return super().pop(index)
+
+    def remove(self, value):
+        self.mark_dirty()
+        super().remove(value)
+
+    def insert(self, index, value):
+        self.mark_dirty()
+        super().insert(index, value)
+
+    def clear(self):
+        self.mark_dirty()
+        super().clear()
+
+    def sort(self, *args, **kwargs):
+        self.mark_dirty()
+        super().sort(*args, **kwargs)
+
+    def reverse(self):
+        self.mark_dirty()
+        super().reverse()
+
+
+def _clean_message(msg):
+    """Sanitized message, the same dict when it was already clean"""
+    if not isinstance(msg, dict) or "role" not in msg or "content" not in msg:
+        raise ValueError("Invalid message format")
+    if msg["role"] not in VALID_ROLES:
+        raise ValueError("Invalid message format")
+    content = sanitize_text(msg["content"])
+    if content is msg["content"] and len(msg) == 2:
+        return msg
+    return {"role": msg["role"], "content": content}
+
+
+def sanitize_messages(messages: list) -> CleanMessages:
+    """
+    Validate and sanitize a conversation, raises ValueError on a malformed message.
+    Only role and content are kept. Clean messages are reused rather than copied.
+    """
+    if isinstance(messages, CleanMessages):
+        # new messages get cleaned in place, the prefix was checked on an earlier turn
+        for i in range(messages.clean, len(messages)):
+            messages[i] = _clean_message(messages[i])
+        messages.clean = len(messages)
+        return messages
+    if not isinstance(messages, list):
+        raise ValueError("Invalid message format")
+    clean = CleanMessages(_clean_message(msg) for msg in messages)
+    clean.clean = len(clean)
+    return clean
+
+
+def split_system(messages: list) -> tuple:
+    """
+    (system text, non-system messages) for providers that take the system prompt separately.
+    Several system messages are joined with newlines. For CleanMessages the split is
+    cached and extended with new messages only, so don't mutate the returned list.
+    """
+    if not isinstance(messages, CleanMessages):
+        system = [m["content"] for m in messages if m["role"] == "system"]
+        return "\n".join(system), [m for m in messages if m["role"] != "system"]
+
+    if messages._split is None:
+        messages._split = ([], [], 0)
+    system, turns, seen = messages._split
+    for msg in messages[seen:]:
+        if msg["role"] == "system":
+            system.append(msg["content"])
+        else:
+            turns.append(msg)
+    messages._split = (system, turns, len(messages))
+    return "\n".join(system), turns
+
+
+def mark_cacheable(system: str, turns: list, ttl: str = None) -> tuple:
+    """
+    Anthropic-format (system, messages) with prompt cache breakpoints on the system prompt
+    and on the newest message, so the next turn reads the whole shared prefix from cache.
+    The input list and dicts are not modified, they may be the cached split of a conversation.
+    """
+    control = {"type": "ephemeral"}
+    if ttl:
+        control["ttl"] = ttl
+    if system:
+        system = [{"type": "text", "text": system, "cache_control": control}]
+    if not turns:
+        return system, turns
+
+    last = turns[-1]
+    content = last["content"]
+    if isinstance(content, str):
+        if not content:
+            # the API rejects cache_control on empty text
+            return system, turns
+        content = [{"type": "text", "text": content, "cache_control": control}]
+    elif content:
+        content = content[:-1] + [{**content[-1], "cache_control": control}]
+    return system, turns[:-1] + [{**last, "content": content}]
+
+
+def require_numpy():
+    """numpy is only needed for embeddings, imported on first use"""
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError('Embeddings need numpy. Install it with: pip install "wrapper[embed]"') from e
+    return numpy
+
+
+def decode_embeddings(data: list):
+    """
+    float32 matrix from an OpenAI-style embeddings response requested with encoding_format="base64",
+    the raw bytes go straight into numpy. Servers that ignore the format and send floats work too.
+    """
+    np = require_numpy()
+    data = sorted(data, key=lambda item: item.index)
+    if data and not isinstance(data[0].embedding, str):
+        return np.asarray([item.embedding for item in data], dtype=np.float32)
+    import base64
+
+    raw = b"".join(base64.b64decode(item.embedding) for item in data)
+    return np.frombuffer(raw, dtype="<f4").reshape(len(data), -1)
+
+
 class ColorLogger:
     COLORS = {
         "RESET": "\033[0m",